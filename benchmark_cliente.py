@@ -0,0 +1,125 @@
+"""
+ARQUIVO: benchmark_cliente.py
+FUNÇÃO: Medir o desempenho das funções de desenho do cliente sem rede e sem janela real.
+DESCRIÇÃO: Roda as telas de cliente.py (desenhar_carta_estilizada, desenhar_mao_oponente,
+tela_jogo, tela_lobby) com o driver de vídeo "dummy" do SDL sobre estados sintéticos
+(mesa de 2 e 4 jogadores, mãos com 30+ cartas, lobby com 500 salas) e reporta
+frames por segundo e memória alocada por frame.
+
+USO:
+    python3 benchmark_cliente.py                  # todos os cenários
+    python3 benchmark_cliente.py --frames 500 --cenario jogo_4
+"""
+
+import os
+# O driver precisa ser escolhido antes de o pygame abrir a janela (no import do cliente)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse   # Leitura dos argumentos de linha de comando
+import time       # Cronometragem dos frames
+import tracemalloc # Medição da memória alocada durante cada frame
+
+import cliente
+from protocolo import EstadoJogo
+
+# --- FIXTURES (ESTADOS SINTÉTICOS) ---
+def criar_mesa(num_jogadores, cartas_por_mao=7):
+    """Cria um EstadoJogo já iniciado, com 'num_jogadores' e mãos do tamanho pedido."""
+    estado = EstadoJogo(semente=0) # Mesmas cartas em todas as execuções
+    for i in range(num_jogadores):
+        pid = ('10.0.0.%d' % (i + 1), 50000 + i)
+        estado.adicionar_jogador(pid)
+    estado.preparar_mesa() # Baralho, 7 cartas para cada um e a primeira carta da mesa
+    for pid in estado.jogadores_conectados:
+        for _ in range(cartas_por_mao - 7):
+            estado.comprar_carta(pid)
+    estado.host_id = estado.jogadores_conectados[0]
+    estado.jogo_iniciado = True
+    return estado
+
+def criar_lobby(num_salas):
+    """Cria uma lista de salas no mesmo formato da resposta de MSG_LISTAR_SALAS."""
+    return [{'nome': f'Sala {i}', 'jogadores': i % 4 + 1,
+             'status': 'Jogando' if i % 3 == 0 else 'Aguardando'} for i in range(num_salas)]
+
+def preparar_jogo(estado):
+    """Coloca o cliente 'dentro' da mesa como o primeiro jogador."""
+    cliente.estado_local = estado
+    cliente.meu_id = estado.jogadores_conectados[0]
+    cliente.em_sala = True
+
+def preparar_lobby(salas):
+    cliente.estado_local = None
+    cliente.meu_id = None
+    cliente.em_sala = False
+    cliente.lista_salas = salas
+
+def frame_cartas():
+    """Desenha uma fileira de 20 cartas (frente) direto com desenhar_carta_estilizada."""
+    cliente.win.fill(cliente.VERDE_MESA)
+    estado = cliente.estado_local
+    for i, carta in enumerate(estado.maos[cliente.meu_id][:20]):
+        cliente.desenhar_carta_estilizada(20 + i * 45, 300, carta)
+
+def frame_oponentes():
+    """Desenha as três mãos de oponente (30 cartas cada) com desenhar_mao_oponente."""
+    cliente.win.fill(cliente.VERDE_MESA)
+    for posicao in ('TOPO', 'ESQUERDA', 'DIREITA'):
+        cliente.desenhar_mao_oponente(posicao, 30, 'P', posicao == 'TOPO')
+
+# Nome -> (função que prepara o cenário, função que desenha um frame)
+CENARIOS = {
+    'cartas':         (lambda: preparar_jogo(criar_mesa(2, 20)), frame_cartas),
+    'oponentes':      (lambda: preparar_jogo(criar_mesa(4)), frame_oponentes),
+    'jogo_2':         (lambda: preparar_jogo(criar_mesa(2)), cliente.tela_jogo),
+    'jogo_4':         (lambda: preparar_jogo(criar_mesa(4)), cliente.tela_jogo),
+    'jogo_4_mao_30':  (lambda: preparar_jogo(criar_mesa(4, 30)), cliente.tela_jogo),
+    'lobby_500':      (lambda: preparar_lobby(criar_lobby(500)), cliente.tela_lobby),
+}
+
+def medir(nome, frames):
+    """Executa 'frames' frames do cenário e retorna (frames/s, ms/frame, KB alocados/frame)."""
+    preparar, desenhar = CENARIOS[nome]
+    preparar()
+
+    # Aquecimento (caches de fontes, superfícies, etc.)
+    for _ in range(10):
+        desenhar()
+        cliente.pygame.display.update()
+
+    # 1. Tempo (sem tracemalloc, que deixa tudo mais lento)
+    inicio = time.perf_counter()
+    for _ in range(frames):
+        desenhar()
+        cliente.pygame.display.update()
+    total = time.perf_counter() - inicio
+
+    # 2. Memória: pico de alocação Python dentro de cada frame
+    amostras = min(frames, 100)
+    tracemalloc.start()
+    alocado = 0
+    for _ in range(amostras):
+        atual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        desenhar()
+        cliente.pygame.display.update()
+        _, pico = tracemalloc.get_traced_memory()
+        alocado += pico - atual
+    tracemalloc.stop()
+
+    return frames / total, total * 1000 / frames, alocado / amostras / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de renderização do cliente UNO (headless).")
+    parser.add_argument('--frames', type=int, default=300, help="frames medidos por cenário")
+    parser.add_argument('--cenario', choices=sorted(CENARIOS), action='append',
+                        help="cenário a executar (pode repetir); padrão: todos")
+    args = parser.parse_args()
+
+    print(f"{'cenário':<16}{'frames/s':>10}{'ms/frame':>10}{'KB/frame':>10}")
+    for nome in args.cenario or CENARIOS:
+        fps, ms, kb = medir(nome, args.frames)
+        print(f"{nome:<16}{fps:>10.1f}{ms:>10.3f}{kb:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+ARQUIVO: bots.py
+FUNÇÃO: Jogadores controlados pelo computador (bots).
+DESCRIÇÃO: Os bots escolhem suas jogadas diretamente sobre o EstadoJogo, no mesmo processo do
+servidor (sem socket e sem serialização). Cada bot usa uma estratégia (classe com o método
+escolher) e novas estratégias podem ser registradas em ESTRATEGIAS.
+"""
+
+import random # Gerador das escolhas de cada bot
+
+from protocolo import MSG_GRITAR_UNO
+
+PREFIXO_BOT = 'BOT' # IDs de bots são tuplas ('BOT', n), no mesmo formato (host, porta) dos humanos
+
+def eh_bot(id_jogador):
+    """Verifica se o ID pertence a um bot."""
+    return id_jogador[0] == PREFIXO_BOT
+
+def cartas_jogaveis(estado, id_jogador):
+    """Índices das cartas jogáveis da mão (verifica primeiro, em O(1), se existe alguma)."""
+    if not estado.tem_jogada(id_jogador):
+        return []
+    return [i for i, carta in enumerate(estado.maos[id_jogador]) if estado.pode_jogar(carta)]
+
+class EstrategiaBot:
+    """
+    Estratégia base. Subclasses implementam escolher(), que recebe o estado e o ID do bot
+    (que é o jogador da vez) e retorna a ação no mesmo formato enviado pelos clientes.
+    """
+    nome = 'base'
+    denuncia_uno = True # Grita UNO para punir quem esqueceu de gritar
+
+    def __init__(self, semente=None):
+        self.semente = semente
+        self._rng = None
+
+    @property
+    def rng(self):
+        """
+        Gerador próprio (não o 'random' global), para que as escolhas sejam reproduzíveis.
+        Criado só na primeira jogada: semear o Mersenne Twister custa ~8 µs, e um servidor que
+        restaura milhares de salas (Servidor.restaurar_salas) cria os bots de todas de uma vez.
+        """
+        if self._rng is None:
+            self._rng = random.Random(self.semente)
+        return self._rng
+
+    def escolher(self, estado, id_jogador):
+        raise NotImplementedError
+
+    def acao_jogar(self, estado, id_jogador, indice):
+        """Monta a ação JOGAR, escolhendo a cor mais frequente da mão para cartas pretas."""
+        acao = {'tipo': 'JOGAR', 'indice': indice}
+        if estado.maos[id_jogador][indice].cor == 'PRETO':
+            acao['cor_escolhida'] = estado.cor_preferida(id_jogador)
+        return acao
+
+class EstrategiaAleatoria(EstrategiaBot):
+    """Joga qualquer carta válida; sem carta válida, compra (e joga se puder)."""
+    nome = 'aleatoria'
+    denuncia_uno = False
+
+    def escolher(self, estado, id_jogador):
+        jogaveis = cartas_jogaveis(estado, id_jogador)
+        if not jogaveis:
+            return {'tipo': 'COMPRAR', 'jogar': True}
+        return self.acao_jogar(estado, id_jogador, self.rng.choice(jogaveis))
+
+class EstrategiaGulosa(EstrategiaBot):
+    """
+    Prefere cartas de ação (+2, Pular, Inverter), depois números e guarda as pretas
+    (Coringa/+4) para quando não houver outra opção.
+    """
+    nome = 'gulosa'
+    PRIORIDADE = {'+2': 0, 'PULAR': 1, 'INVERTER': 2, 'CORINGA': 4, '+4': 5}
+
+    def escolher(self, estado, id_jogador):
+        jogaveis = cartas_jogaveis(estado, id_jogador)
+        if not jogaveis:
+            return {'tipo': 'COMPRAR', 'jogar': True}
+        mao = estado.maos[id_jogador]
+        melhor = min(jogaveis, key=lambda i: self.PRIORIDADE.get(mao[i].valor, 3))
+        return self.acao_jogar(estado, id_jogador, melhor)
+
+# Nome -> classe da estratégia. Para adicionar uma nova: ESTRATEGIAS['minha'] = MinhaEstrategia
+ESTRATEGIAS = {
+    EstrategiaAleatoria.nome: EstrategiaAleatoria,
+    EstrategiaGulosa.nome: EstrategiaGulosa,
+}
+ESTRATEGIA_PADRAO = EstrategiaGulosa.nome
+
+def criar_estrategia(nome=None, semente=None):
+    """Instancia a estratégia pelo nome (ou a padrão, se o nome for desconhecido)."""
+    return ESTRATEGIAS.get(nome, ESTRATEGIAS[ESTRATEGIA_PADRAO])(semente)
+
+def executar_turno_bot(estado, id_bot, estrategia):
+    """
+    Executa o turno completo de um bot sobre o estado: denuncia quem esqueceu o UNO (se a
+    estratégia quiser), faz a jogada e grita UNO se ficou com uma carta.
+    Retorna a lista das ações que mudaram o estado (vazia se nada mudou), para o registro da sala.
+    """
+    aplicadas = []
+    def aplicar(acao):
+        if estado.aplicar_evento(id_bot, acao):
+            aplicadas.append(acao)
+
+    if estrategia.denuncia_uno:
+        for pid in estado.jogadores_conectados:
+            if pid != id_bot and len(estado.maos[pid]) == 1 and pid not in estado.uno_safe:
+                aplicar({'tipo': MSG_GRITAR_UNO})
+                break
+
+    if estado.jogadores_conectados[estado.jogador_atual] == id_bot:
+        aplicar(estrategia.escolher(estado, id_bot))
+
+    # Um bot nunca esquece de gritar UNO
+    if id_bot in estado.maos and len(estado.maos[id_bot]) == 1 and id_bot not in estado.uno_safe:
+        aplicar({'tipo': MSG_GRITAR_UNO})
+    return aplicadas
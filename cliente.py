@@ -7,37 +7,34 @@ renderização das telas (Lobby, Sala de Espera, Jogo), tratamento de eventos (c
 e sincronização de estado via rede.
 """
 
+import time      # Funções de tempo (delay, controle de FPS, medição da inicialização)
+INICIO_CLIENTE = time.perf_counter() # Marco zero da medição do tempo de inicialização
+
 import pygame    # Biblioteca para criação de jogos (gráficos, eventos, som)
 import socket    # Biblioteca para comunicação de rede (TCP/IP)
 import pickle    # Biblioteca para serialização de objetos (enviar dados complexos pela rede)
-import threading # Biblioteca para rodar processos em paralelo (escutar o servidor sem travar o jogo)
+import selectors # Multiplexação de I/O (verifica se há dados no socket sem bloquear o jogo)
 import math      # Funções matemáticas (usado para desenhar setas e cálculos geométricos)
-import time      # Funções de tempo (delay, controle de FPS)
 import sys       # Funções do sistema (encerrar o programa)
+import os        # Caminhos do cache de fontes
+import errno     # Códigos de erro da conexão não-bloqueante
+import argparse  # Argumentos de linha de comando (IP do servidor, medição de inicialização)
+import copy      # Cópia profunda do estado (para prever jogadas localmente)
+import json      # Formato do arquivo de trace de frames (uma linha JSON por frame)
+import getpass   # Nome padrão do jogador (usuário do sistema)
+from collections import deque # Janela deslizante com os tempos dos últimos frames
 # Importa as constantes e classes compartilhadas do protocolo
-from protocolo import EstadoJogo, MSG_CRIAR_SALA, MSG_ENTRAR_SALA, MSG_LISTAR_SALAS, MSG_INICIAR_JOGO, MSG_GRITAR_UNO, MSG_SAIR_SALA, MSG_ERRO
+from protocolo import EstadoJogo, MSG_CRIAR_SALA, MSG_ENTRAR_SALA, MSG_LISTAR_SALAS, MSG_INICIAR_JOGO, MSG_GRITAR_UNO, MSG_SAIR_SALA, MSG_ERRO, MSG_CONFIGURAR_SALA, MSG_ADICIONAR_BOT, MSG_RECONECTAR, MSG_REVANCHE, MSG_REDIRECIONAR, MSG_ASSISTIR_SALA, MSG_VISAO, MSG_CONFIRMAR
+from protocolo import BufferMensagens, empacotar
+from bots import eh_bot # Formato dos IDs de bot (definido só em bots.py)
 
 # --- CONFIGURAÇÃO DE REDE ---
-# Cria o socket do cliente usando IPv4 (AF_INET) e TCP (SOCK_STREAM)
-client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-print("=== Configuração de Conexão ===")
-# Solicita o IP do servidor ao usuário. Se vazio, usa localhost.
-server_ip = input("Digite o IP do servidor (pressione Enter para localhost): ").strip()
-if not server_ip:
-    server_ip = 'localhost'
-
-try:
-    # Tenta conectar ao servidor na porta 5555
-    client.connect((server_ip, 5555))
-except Exception as e:
-    print(f"Não foi possível conectar ao servidor em {server_ip}:5555")
-    print(f"Erro: {e}")
-    exit() # Encerra o programa se não conseguir conectar
+PORTA_SERVIDOR = 5555
+TEMPO_LIMITE_CONEXAO = 10.0 # Segundos até desistir de uma tentativa de conexão
 
 # --- CONFIGURAÇÃO PYGAME ---
+# A janela é aberta antes de qualquer outra coisa (fontes, rede) para aparecer o quanto antes
 pygame.display.init() # Inicializa o módulo de display do Pygame
-pygame.font.init()    # Inicializa o módulo de fontes do Pygame
 
 # Definição das dimensões da janela
 LARGURA_TELA = 1000
@@ -46,6 +43,11 @@ ALTURA_TELA = 700
 win = pygame.display.set_mode((LARGURA_TELA, ALTURA_TELA))
 pygame.display.set_caption("UNO Multiplayer - Lobby") # Define o título da janela
 
+# Marcos da inicialização (ms desde INICIO_CLIENTE), exibidos no painel F3
+marcos_inicializacao = {'janela': (time.perf_counter() - INICIO_CLIENTE) * 1000}
+
+pygame.font.init()    # Inicializa o módulo de fontes do Pygame
+
 # --- CORES E ESTILOS ---
 # Definição de cores em formato RGB (Red, Green, Blue)
 BRANCO = (255, 255, 255)
@@ -63,11 +65,51 @@ MAPA_CORES = {
     'VERMELHO': VERMELHO, 'VERDE': VERDE, 'AZUL': AZUL, 'AMARELO': AMARELO, 'PRETO': PRETO
 }
 
+# --- FONTES ---
+# pygame.font.SysFont varre as fontes do sistema (fc-list no Linux), o que é lento na
+# primeira chamada. O caminho do arquivo de cada fonte é resolvido uma única vez e guardado
+# em disco; nas próximas execuções a fonte é carregada direto com pygame.font.Font(caminho).
+ARQUIVO_CACHE_FONTES = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'uno', 'fontes.json')
+
+def _ler_cache_fontes():
+    try:
+        with open(ARQUIVO_CACHE_FONTES) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+_cache_fontes = _ler_cache_fontes() # "nome|negrito" -> caminho do arquivo (ou None = fonte padrão)
+
+def carregar_fonte(nome, tamanho, negrito=False):
+    """Carrega uma fonte do sistema usando o cache de caminhos em disco."""
+    chave = f"{nome.lower()}|{'negrito' if negrito else 'normal'}"
+    caminho = _cache_fontes.get(chave)
+    if chave not in _cache_fontes or (caminho and not os.path.exists(caminho)):
+        # Cache vazio ou desatualizado: faz a varredura do sistema (apenas desta vez)
+        caminho = pygame.font.match_font(nome, bold=negrito)
+        _cache_fontes[chave] = caminho
+        try:
+            os.makedirs(os.path.dirname(ARQUIVO_CACHE_FONTES), exist_ok=True)
+            with open(ARQUIVO_CACHE_FONTES, 'w') as f:
+                json.dump(_cache_fontes, f)
+        except OSError:
+            pass # Sem cache em disco: funciona, só não acelera a próxima execução
+
+    fonte = pygame.font.Font(caminho, tamanho) # caminho None = fonte padrão do pygame
+    if negrito and (caminho is None or 'bold' not in os.path.basename(caminho).lower()):
+        fonte.set_bold(True) # Não há arquivo negrito: usa negrito sintético (como o SysFont)
+    return fonte
+
 # Definição das fontes usadas no jogo
-FONT_INFO = pygame.font.SysFont('Arial', 24, bold=True)      # Texto geral
-FONT_AVISO = pygame.font.SysFont('Arial', 36, bold=True)     # Títulos e avisos grandes
-FONT_CARTA = pygame.font.SysFont('Arial', 40, bold=True)     # Símbolo central da carta
-FONT_CARTA_PQ = pygame.font.SysFont('Arial', 14, bold=True)  # Símbolo pequeno nos cantos
+FONT_INFO = carregar_fonte('Arial', 24, negrito=True)      # Texto geral
+FONT_AVISO = carregar_fonte('Arial', 36, negrito=True)     # Títulos e avisos grandes
+FONT_CARTA = carregar_fonte('Arial', 40, negrito=True)     # Símbolo central da carta
+FONT_CARTA_MD = carregar_fonte('Arial', 30, negrito=True)  # Símbolos largos no centro (+2, +4)
+FONT_BOTAO = carregar_fonte('Arial', 20, negrito=True)     # Texto dos botões
+FONT_CARTA_PQ = carregar_fonte('Arial', 14, negrito=True)  # Símbolo pequeno nos cantos
+marcos_inicializacao['fontes'] = (time.perf_counter() - INICIO_CLIENTE) * 1000
 
 # --- ESTADO DO CLIENTE ---
 # Variáveis globais que armazenam o estado atual do jogo no cliente
@@ -75,9 +117,40 @@ estado_local = None         # Cópia do objeto EstadoJogo recebido do servidor
 meu_id = None               # ID deste cliente (atribuído pelo servidor)
 em_sala = False             # Flag indicando se o cliente está em uma sala ou no lobby
 lista_salas = []            # Lista de salas disponíveis (para o lobby)
+intervalo_lista = 1.0       # Segundos entre pedidos da lista de salas (o servidor sobrecarregado pede mais)
 mensagem_erro = ""          # Mensagem de erro para exibir na tela (ex: "Sala cheia")
 escolhendo_cor = False      # Flag para abrir o menu de escolha de cor (Coringa/+4)
 carta_preta_pendente = None # Índice da carta preta que foi clicada (aguardando escolha de cor)
+meu_nome = None             # Nome enviado ao entrar numa sala (--nome): identifica o jogador no histórico
+
+# --- ESPECTADOR ---
+# Assistindo uma sala, o cliente recebe só a visão pública (MSG_VISAO): cartas na mão de cada um,
+# topo do descarte, vez e cor. O atraso pedido vem de --atraso (o servidor pode impor um mínimo).
+assistindo = False          # Flag indicando se o cliente está assistindo uma sala
+sala_assistida = None       # Nome da sala assistida
+atraso_assistido = 0        # Atraso (segundos) confirmado pelo servidor
+visao_espectador = None     # Última visão pública recebida
+atraso_espectador = 0.0     # Atraso pedido ao assistir (--atraso)
+
+# --- PREVISÃO DE JOGADAS (CLIENT-SIDE PREDICTION) ---
+# O cliente aplica a própria jogada localmente (com as mesmas regras do EstadoJogo) e desenha
+# o resultado no mesmo frame. Quando o estado oficial chega, as previsões já confirmadas pelo
+# servidor são descartadas e as restantes são reaplicadas sobre ele (ou desfeitas, se falharem).
+TEMPO_MAX_PREVISAO = 2.0    # Segundos sem confirmação até desfazer a previsão
+estado_confirmado = None    # Último EstadoJogo oficial recebido do servidor
+acoes_previstas = []        # Lista de (acao, instante do envio) ainda não confirmadas
+proxima_seq = 0             # Número de sequência da próxima jogada enviada
+inicio_turno_local = 0.0    # Instante (relógio local) em que o turno atual começou, para a contagem regressiva
+
+# --- RECONEXÃO ---
+# Se a conexão cair dentro de uma sala, o cliente reabre o socket e apresenta o token de sessão
+# recebido no ENTROU; o servidor devolve o assento e só os eventos que ficaram faltando.
+MAX_TENTATIVAS_RECONEXAO = 5
+INTERVALO_RECONEXAO = 1.0   # Espera entre tentativas (cresce a cada tentativa)
+sessao = None               # Token de sessão da sala atual
+endereco_reconexao = None   # Servidor a reconectar (None quando não há reconexão pendente)
+tentativas_reconexao = 0
+proxima_reconexao = 0.0     # Instante da próxima tentativa
 
 # --- CLASSES AUXILIARES ---
 class Botao:
@@ -99,8 +172,7 @@ class Botao:
         pygame.draw.rect(tela, BRANCO, self.rect, width=2, border_radius=12) # Borda branca
         
         # Renderiza o texto centralizado
-        fonte = pygame.font.SysFont('Arial', 20, bold=True)
-        txt = fonte.render(self.texto, True, BRANCO)
+        txt = FONT_BOTAO.render(self.texto, True, BRANCO)
         txt_rect = txt.get_rect(center=self.rect.center)
         tela.blit(txt, txt_rect)
 
@@ -148,57 +220,442 @@ class InputBox:
         pygame.draw.rect(screen, self.color, self.rect, 2) # Borda
         screen.blit(self.txt_surface, (self.rect.x+5, self.rect.y+5)) # Texto
 
+class MonitorDesempenho:
+    """
+    Coleta métricas de desempenho do cliente e desenha um painel (HUD) sobre a tela.
+    F3 liga/desliga o painel. F4 liga/desliga a gravação de um trace (um JSON por frame).
+    """
+    # Faixas do histograma de tempo de frame (em ms)
+    FAIXAS_MS = [8, 16, 33, 50, 100]
+
+    def __init__(self):
+        self.visivel = False
+        self.tempos_frame = deque(maxlen=240) # Últimos ~4s de frames (em ms)
+        self.tempo_telas = {}                 # Nome da tela -> ms gastos no último frame
+        self.bytes_janela = 0                 # Bytes recebidos desde a última virada de segundo
+        self.msgs_janela = 0
+        self.bytes_por_s = 0
+        self.msgs_por_s = 0
+        self.inicio_janela = time.perf_counter()
+        self.decodificacao_ms = 0.0           # Tempo de pickle.loads no último frame
+        self.rtt_ms = None                    # Tempo entre enviar a última jogada e a confirmação
+        self.envios = {}                      # seq da jogada -> instante do envio
+        self.arquivo_trace = None
+        self.frame_bytes = 0
+        self.frame_msgs = 0
+
+    def inicio_frame(self, dt_ms):
+        """Registra a duração do frame anterior e zera os contadores do novo frame."""
+        self.tempos_frame.append(dt_ms)
+        self.tempo_telas = {}
+        self.decodificacao_ms = 0.0
+        self.frame_bytes = 0
+        self.frame_msgs = 0
+
+        agora = time.perf_counter()
+        if agora - self.inicio_janela >= 1.0:
+            decorrido = agora - self.inicio_janela
+            self.bytes_por_s = self.bytes_janela / decorrido
+            self.msgs_por_s = self.msgs_janela / decorrido
+            self.bytes_janela = self.msgs_janela = 0
+            self.inicio_janela = agora
+
+    def medir_tela(self, nome, funcao):
+        """Executa a função de tela e guarda quanto tempo ela levou."""
+        t0 = time.perf_counter()
+        resultado = funcao()
+        self.tempo_telas[nome] = (time.perf_counter() - t0) * 1000
+        return resultado
+
+    def registrar_rede(self, n_bytes, n_msgs, tempo_decodificacao):
+        """Chamado pela camada de rede a cada leitura do socket."""
+        self.bytes_janela += n_bytes
+        self.msgs_janela += n_msgs
+        self.frame_bytes += n_bytes
+        self.frame_msgs += n_msgs
+        self.decodificacao_ms += tempo_decodificacao * 1000
+
+    def registrar_envio(self, seq):
+        self.envios[seq] = time.perf_counter()
+
+    def registrar_confirmacao(self, seq):
+        """Calcula o RTT da jogada 'seq' (e descarta envios mais antigos)."""
+        enviado = self.envios.pop(seq, None)
+        if enviado is not None:
+            self.rtt_ms = (time.perf_counter() - enviado) * 1000
+        for antigo in [s for s in self.envios if s < seq]:
+            del self.envios[antigo]
+
+    def alternar_trace(self):
+        """Começa ou termina a gravação do trace de frames em disco."""
+        if self.arquivo_trace:
+            print(f"Trace salvo em {self.arquivo_trace.name}")
+            self.arquivo_trace.close()
+            self.arquivo_trace = None
+        else:
+            nome = time.strftime("trace_cliente_%Y%m%d_%H%M%S.jsonl")
+            self.arquivo_trace = open(nome, 'w')
+            print(f"Gravando trace de frames em {nome} (F4 para parar)")
+
+    def fim_frame(self):
+        """Grava a linha do trace deste frame (se a gravação estiver ativa)."""
+        if self.arquivo_trace and self.tempos_frame:
+            self.arquivo_trace.write(json.dumps({
+                't': time.time(),
+                'frame_ms': round(self.tempos_frame[-1], 3),
+                'telas_ms': {k: round(v, 3) for k, v in self.tempo_telas.items()},
+                'bytes': self.frame_bytes,
+                'msgs': self.frame_msgs,
+                'decodificacao_ms': round(self.decodificacao_ms, 3),
+                'rtt_ms': self.rtt_ms,
+            }) + '\n')
+
+    def desenhar(self, tela, fps):
+        """Desenha o painel de desempenho no canto superior esquerdo."""
+        if not self.visivel: return
+        linhas = [f"FPS: {fps:.1f}"]
+        if self.tempos_frame:
+            ordenados = sorted(self.tempos_frame)
+            p99 = ordenados[int(len(ordenados) * 0.99) - 1] if len(ordenados) > 1 else ordenados[0]
+            linhas.append(f"Frame: {self.tempos_frame[-1]:.1f} ms (p99 {p99:.1f})")
+        for nome, ms in self.tempo_telas.items():
+            linhas.append(f"{nome}: {ms:.2f} ms")
+        linhas.append(f"Rede: {self.bytes_por_s / 1024:.1f} KB/s, {self.msgs_por_s:.1f} msg/s")
+        linhas.append(f"Decodificação: {self.decodificacao_ms:.2f} ms")
+        linhas.append(f"RTT jogada: {self.rtt_ms:.0f} ms" if self.rtt_ms is not None else "RTT jogada: -")
+        if 'primeiro_frame' in marcos_inicializacao:
+            linhas.append(f"Inicialização: {marcos_inicializacao['primeiro_frame']:.0f} ms"
+                          + (f" (lobby {marcos_inicializacao['lobby']:.0f} ms)" if 'lobby' in marcos_inicializacao else ""))
+        if self.arquivo_trace:
+            linhas.append("Gravando trace (F4)")
+
+        # Histograma dos tempos de frame
+        contagens = [0] * (len(self.FAIXAS_MS) + 1)
+        for ms in self.tempos_frame:
+            i = 0
+            while i < len(self.FAIXAS_MS) and ms >= self.FAIXAS_MS[i]:
+                i += 1
+            contagens[i] += 1
+
+        altura = 18 * len(linhas) + 70
+        fundo = pygame.Surface((260, altura), pygame.SRCALPHA)
+        fundo.fill((0, 0, 0, 170))
+        tela.blit(fundo, (5, 5))
+        for i, linha in enumerate(linhas):
+            tela.blit(FONT_CARTA_PQ.render(linha, True, BRANCO), (12, 10 + i * 18))
+
+        base_y = 10 + len(linhas) * 18 + 50
+        maior = max(contagens) or 1
+        rotulos = [f"<{f}" for f in self.FAIXAS_MS] + [f"{self.FAIXAS_MS[-1]}+"]
+        for i, qtd in enumerate(contagens):
+            h = int(40 * qtd / maior)
+            x = 12 + i * 40
+            pygame.draw.rect(tela, AMARELO if i > 1 else VERDE, (x, base_y - h, 30, h))
+            tela.blit(FONT_CARTA_PQ.render(rotulos[i], True, BRANCO), (x, base_y + 2))
+
+monitor = MonitorDesempenho()
+
 # --- FUNÇÕES DE REDE ---
+class ConexaoServidor:
+    """
+    Camada de rede não-bloqueante do cliente.
+    Em vez de uma thread escrevendo nas variáveis globais no meio de um frame, o loop principal
+    consulta o socket (via selectors) uma vez por frame e aplica as mensagens recebidas antes de
+    desenhar. Assim o estado nunca muda enquanto uma tela está sendo renderizada.
+    """
+    def __init__(self, endereco):
+        # A conexão também é não-bloqueante: a janela continua respondendo (tela "Conectando...")
+        # enquanto o handshake TCP acontece
+        self.endereco = endereco
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(False)
+        self.seletor = selectors.DefaultSelector()
+        self.entrada = BufferMensagens() # Remonta mensagens parciais/múltiplas
+        self.saida = bytearray()         # Bytes ainda não aceitos pelo socket
+        self.aberta = True
+        self.conectando = True
+        self.erro = None                 # Motivo da falha de conexão (exibido na tela)
+        self.inicio = time.perf_counter()
+
+        try:
+            codigo = self.sock.connect_ex(endereco)
+        except OSError as e: # Ex: nome de host inválido
+            self._falhar(str(e))
+            return
+        if codigo not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self._falhar(os.strerror(codigo))
+            return
+        self.seletor.register(self.sock, selectors.EVENT_WRITE) # Gravável = handshake terminou
+
+    def _falhar(self, motivo):
+        self.erro = motivo
+        print(f"Não foi possível conectar ao servidor em {self.endereco[0]}:{self.endereco[1]}")
+        print(f"Erro: {motivo}")
+        self.fechar()
+
+    def _verificar_conexao(self):
+        """Confere (sem bloquear) se o handshake TCP terminou."""
+        if not self.seletor.select(timeout=0):
+            if time.perf_counter() - self.inicio > TEMPO_LIMITE_CONEXAO:
+                self._falhar("tempo esgotado")
+            return
+        codigo = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if codigo:
+            self._falhar(os.strerror(codigo))
+            return
+        self.conectando = False
+        marcos_inicializacao['conectado'] = (time.perf_counter() - INICIO_CLIENTE) * 1000
+        self.seletor.modify(self.sock, selectors.EVENT_READ)
+        self._descarregar() # Envia o que foi enfileirado durante a conexão
+
+    def enviar(self, obj):
+        """Enfileira uma mensagem para envio e tenta despachá-la imediatamente."""
+        if not self.aberta: return
+        self.saida += empacotar(obj)
+        if not self.conectando:
+            self._descarregar()
+
+    def _descarregar(self):
+        """Envia o máximo possível do buffer de saída sem bloquear."""
+        try:
+            while self.saida:
+                enviados = self.sock.send(self.saida)
+                del self.saida[:enviados]
+        except BlockingIOError:
+            pass # Buffer do SO cheio: o resto vai no próximo frame
+        eventos = selectors.EVENT_READ | (selectors.EVENT_WRITE if self.saida else 0)
+        self.seletor.modify(self.sock, eventos)
+
+    def receber(self):
+        """
+        Lê tudo o que já chegou no socket (sem esperar) e retorna a lista de mensagens completas.
+        Deve ser chamada uma vez por frame, no início do loop principal.
+        """
+        if not self.aberta: return []
+        if self.conectando:
+            self._verificar_conexao()
+            return []
+        mensagens = []
+        for _, mascara in self.seletor.select(timeout=0):
+            if mascara & selectors.EVENT_WRITE:
+                self._descarregar()
+            if mascara & selectors.EVENT_READ:
+                while True:
+                    try:
+                        data = self.sock.recv(65536)
+                    except BlockingIOError:
+                        break # Nada mais para ler neste frame
+                    if not data:
+                        self.fechar()
+                        print("Conexão encerrada pelo servidor.")
+                        break
+                    t0 = time.perf_counter()
+                    try:
+                        quadros = self.entrada.alimentar(data)
+                    except ValueError as e: # Tamanho anunciado acima do máximo: o fluxo não tem conserto
+                        self.fechar()
+                        print(f"Conexão encerrada: {e}")
+                        break
+                    novas = [pickle.loads(m) for m in quadros]
+                    monitor.registrar_rede(len(data), len(novas), time.perf_counter() - t0)
+                    mensagens.extend(novas)
+        return mensagens
+
+    def fechar(self):
+        """Fecha o socket e o seletor."""
+        if not self.aberta: return
+        self.aberta = False
+        self.seletor.close()
+        self.sock.close()
+
+conexao = None # ConexaoServidor ativa (None enquanto o jogador não escolheu o servidor)
+
+def iniciar_conexao(ip):
+    """Começa (sem bloquear) a conexão com o servidor e já enfileira o pedido da lista de salas."""
+    global conexao, mensagem_erro
+    mensagem_erro = ""
+    conexao = ConexaoServidor((ip, PORTA_SERVIDOR))
+    enviar_acao({'tipo': MSG_LISTAR_SALAS}) # Pede lista inicial de salas ao conectar
+
+def agendar_reconexao(endereco):
+    """Conexão caiu dentro de uma sala: agenda a próxima tentativa de recuperar o assento."""
+    global conexao, endereco_reconexao, proxima_reconexao, mensagem_erro
+    conexao = None
+    endereco_reconexao = endereco
+    proxima_reconexao = time.time() + INTERVALO_RECONEXAO * tentativas_reconexao
+    mensagem_erro = ""
+
+def iniciar_reconexao():
+    """Reabre a conexão e pede o assento de volta, dizendo até que evento o estado local já chegou."""
+    global conexao, endereco_reconexao, tentativas_reconexao
+    conexao = ConexaoServidor(endereco_reconexao)
+    endereco_reconexao = None
+    tentativas_reconexao += 1
+    eventos = estado_confirmado.eventos if estado_confirmado is not None else None
+    enviar_acao({'tipo': MSG_RECONECTAR, 'token': sessao, 'eventos': eventos})
+
+def seguir_redirecionamento(msg):
+    """A sala fica em outro nó do servidor: conecta nele (se ainda não está) e repete o pedido lá."""
+    global conexao
+    endereco = tuple(msg['endereco'])
+    if conexao.endereco != endereco:
+        conexao.fechar()
+        conexao = ConexaoServidor(endereco)
+    enviar_acao(msg['pedido'])
+
+def sair_da_sala():
+    """Limpa o estado local da sala (volta ao lobby ou à tela de conexão)."""
+    global em_sala, estado_local, estado_confirmado, acoes_previstas, meu_id, sessao
+    global assistindo, sala_assistida, visao_espectador
+    assistindo = False
+    sala_assistida = visao_espectador = None
+    em_sala = False
+    estado_local = estado_confirmado = None
+    acoes_previstas = []
+    meu_id = None
+    sessao = None
+
 def enviar_acao(acao):
     """Envia um objeto (dicionário) para o servidor via pickle."""
     try:
-        client.send(pickle.dumps(acao))
+        conexao.enviar(acao)
     except:
         print("Erro ao enviar dados para o servidor.")
 
-def receber_dados():
+def processar_mensagem(msg):
     """
-    Função executada em uma thread separada.
-    Fica num loop infinito escutando mensagens do servidor e atualizando o estado global.
+    Aplica uma mensagem recebida do servidor ao estado global do cliente.
+    Chamada apenas pelo loop principal, entre um frame e outro.
     """
-    global estado_local, meu_id, em_sala, lista_salas, mensagem_erro
-    while True:
-        try:
-            # Recebe dados do servidor (buffer grande para garantir recebimento do estado completo)
-            data = client.recv(4096 * 8)
-            if not data: break
-            
-            msg = pickle.loads(data) # Deserializa a mensagem
-            
-            # Se for um dicionário, é uma mensagem de controle ou atualização simples
-            if isinstance(msg, dict):
-                if msg.get('tipo') == MSG_LISTAR_SALAS:
-                    lista_salas = msg['salas']
-                elif msg.get('tipo') == MSG_ERRO:
-                    mensagem_erro = msg['msg']
-                    print(f"Erro do servidor: {mensagem_erro}")
-                elif msg.get('tipo') == 'SUCESSO_CRIAR':
-                    # Sala criada com sucesso
-                    pass 
-                elif msg.get('tipo') == 'ENTROU':
-                    # Confirmação de entrada na sala
-                    meu_id = msg['id']
-                    em_sala = True
-                    # A atualização do caption será feita no loop principal para evitar crash
-            
-            # Se for uma instância de EstadoJogo, é a atualização completa do jogo
-            elif isinstance(msg, EstadoJogo):
-                estado_local = msg
-                
-        except Exception as e:
-            print(f"Erro na thread de rede: {e}")
-            break
+    global estado_confirmado, meu_id, em_sala, lista_salas, intervalo_lista, mensagem_erro, inicio_turno_local
+    global sessao, tentativas_reconexao, acoes_previstas
+    global assistindo, sala_assistida, atraso_assistido, visao_espectador
+    # Se for um dicionário, é uma mensagem de controle ou atualização simples
+    if isinstance(msg, dict):
+        if msg.get('tipo') == MSG_LISTAR_SALAS:
+            lista_salas = msg['salas']
+            intervalo_lista = msg.get('intervalo', 1.0) # Modo degradado do servidor: atualiza com menos frequência
+        elif msg.get('tipo') == MSG_ERRO:
+            mensagem_erro = msg['msg']
+            print(f"Erro do servidor: {mensagem_erro}")
+        elif msg.get('tipo') == MSG_REDIRECIONAR:
+            # Vários nós: CRIAR_SALA e ENTRAR_SALA seguem para o nó dono da sala (o lobby continua igual)
+            seguir_redirecionamento(msg)
+        elif msg.get('tipo') == 'ASSISTINDO':
+            assistindo = True
+            sala_assistida = msg['nome']
+            atraso_assistido = msg['atraso']
+            visao_espectador = None
+            mensagem_erro = ""
+        elif msg.get('tipo') == MSG_VISAO:
+            if assistindo:
+                visao_espectador = msg
+        elif msg.get('tipo') == 'SUCESSO_CRIAR':
+            # Sala criada: entra nela pela mesma conexão, isto é, no nó que a criou (depois de um
+            # redirecionamento, CRIAR e ENTRAR seguem juntos; marcado, o ENTRAR não é redirecionado de novo)
+            enviar_acao({'tipo': MSG_ENTRAR_SALA, 'nome': msg['nome'], 'jogador': meu_nome, 'redirecionado': True})
+        elif msg.get('tipo') == 'ENTROU':
+            # Confirmação de entrada na sala
+            meu_id = msg['id']
+            sessao = msg.get('token')
+            em_sala = True
+        elif msg.get('tipo') == 'RECONECTADO':
+            # Snapshot (se o servidor mandou) ou uma cópia do estado oficial local, mais os eventos que
+            # faltaram (sem previsões pendentes, estado_local é o mesmo objeto que estado_confirmado)
+            estado = pickle.loads(msg['snapshot']) if msg['snapshot'] else copy.deepcopy(estado_confirmado)
+            for pid, evento in msg['eventos']:
+                estado.aplicar_evento(pid, evento)
+            estado.versao = msg['versao']
+            estado.acoes_confirmadas = msg['acoes_confirmadas']
+            meu_id = msg['id']
+            sessao = msg['token']
+            tentativas_reconexao = 0
+            acoes_previstas = [] # O que não chegou ao servidor antes da queda se perdeu
+            print(f"Reconectado ({len(msg['eventos'])} eventos recebidos)")
+            processar_mensagem(estado)
+        elif msg.get('tipo') == MSG_CONFIRMAR:
+            # Jogada recusada pelo servidor (não houve broadcast): desfaz a previsão agora
+            if estado_confirmado is not None:
+                estado_confirmado.acoes_confirmadas = {**estado_confirmado.acoes_confirmadas, meu_id: msg['seq']}
+                reconciliar()
+        elif msg.get('tipo') == 'RECONEXAO_RECUSADA':
+            mensagem_erro = msg['msg']
+            tentativas_reconexao = 0
+            sair_da_sala()
+    
+    # Se for uma instância de EstadoJogo, é a atualização completa do jogo
+    elif isinstance(msg, EstadoJogo):
+        if estado_confirmado is None or msg.turnos != estado_confirmado.turnos:
+            inicio_turno_local = time.time() # Relógio local: não depende do relógio do servidor
+        estado_confirmado = msg
+        reconciliar()
+
+def processar_rede():
+    """Consulta a rede e aplica, em ordem de chegada, todas as mensagens pendentes."""
+    global estado_local, acoes_previstas
+    if conexao is None: return
+    try:
+        for msg in conexao.receber():
+            processar_mensagem(msg)
+    except Exception as e:
+        print(f"Erro na rede: {e}")
+        conexao.fechar()
 
-# Inicia a thread de rede em modo daemon (fecha quando o programa principal fechar)
-thread_rede = threading.Thread(target=receber_dados, daemon=True)
-thread_rede.start()
+    # Se o servidor ficou em silêncio (jogada ou confirmação perdida), volta para o estado oficial
+    if acoes_previstas and time.time() - acoes_previstas[0][1] > TEMPO_MAX_PREVISAO:
+        print("Jogada não confirmada pelo servidor, desfazendo previsão.")
+        acoes_previstas = []
+        estado_local = estado_confirmado
+
+# --- PREVISÃO DE JOGADAS ---
+def aplicar_previsao(estado, acao):
+    """Aplica uma jogada deste cliente em 'estado' usando as regras do protocolo. Retorna True se válida."""
+    if acao['tipo'] not in ('JOGAR', 'COMPRAR'):
+        return False
+    return estado.aplicar_acao(meu_id, acao)
+
+def enviar_jogada(acao):
+    """
+    Envia uma jogada (JOGAR/COMPRAR) ao servidor e já exibe o resultado previsto.
+    A ação leva um número de sequência que o servidor devolve em 'acoes_confirmadas'.
+    """
+    global estado_local, proxima_seq
+    proxima_seq += 1
+    acao['seq'] = proxima_seq
+    enviar_acao(acao)
+    monitor.registrar_envio(proxima_seq)
+
+    previsto = copy.deepcopy(estado_local)
+    if aplicar_previsao(previsto, acao):
+        acoes_previstas.append((acao, time.time()))
+        estado_local = previsto
+
+def reconciliar():
+    """Recalcula o estado exibido: estado oficial + jogadas enviadas e ainda não confirmadas."""
+    global estado_local, acoes_previstas
+    confirmada = estado_confirmado.acoes_confirmadas.get(meu_id, 0)
+    if acoes_previstas and acoes_previstas[0][0]['seq'] <= confirmada:
+        monitor.registrar_confirmacao(confirmada)
+    acoes_previstas = [(a, t) for a, t in acoes_previstas if a['seq'] > confirmada]
+
+    estado = estado_confirmado
+    if acoes_previstas:
+        estado = copy.deepcopy(estado_confirmado)
+        for acao, _ in acoes_previstas:
+            if not aplicar_previsao(estado, acao):
+                # O servidor divergiu da previsão: desfaz tudo e fica com o estado oficial
+                acoes_previstas = []
+                estado = estado_confirmado
+                break
+    estado_local = estado
 
 # --- FUNÇÕES DE DESENHO (JOGO) ---
+def nome_jogador(pid):
+    """Nome exibido para um jogador: 'Bot N' para bots, 'Jogador ip:porta' para humanos."""
+    if eh_bot(pid):
+        return f"Bot {pid[1]}"
+    return f"Jogador {pid[0]}:{pid[1]}"
+
 def get_simbolo_visual(valor):
     """Converte valores especiais para símbolos visuais curtos."""
     if valor == 'PULAR': return "Ø"      # Símbolo de proibido
@@ -206,7 +663,11 @@ def get_simbolo_visual(valor):
     if valor == 'CORINGA': return "C"    # Coringa
     return valor
 
-def desenhar_carta_estilizada(x, y, carta, hover=False, oculto=False):
+# Camada translúcida usada para escurecer cartas que não podem ser jogadas (criada uma única vez)
+SOMBRA_INJOGAVEL = pygame.Surface((80, 120), pygame.SRCALPHA)
+pygame.draw.rect(SOMBRA_INJOGAVEL, (0, 0, 0, 140), SOMBRA_INJOGAVEL.get_rect(), border_radius=10)
+
+def desenhar_carta_estilizada(x, y, carta, hover=False, oculto=False, apagada=False):
     """
     Desenha uma carta de UNO na tela.
     Args:
@@ -214,6 +675,7 @@ def desenhar_carta_estilizada(x, y, carta, hover=False, oculto=False):
         carta: Objeto Carta.
         hover: Se True, desenha a carta um pouco mais para cima (efeito visual).
         oculto: Se True, desenha o verso da carta (UNO).
+        apagada: Se True, escurece a carta (jogada inválida neste momento).
     Returns:
         pygame.Rect: O retângulo da carta desenhada (para detecção de clique).
     """
@@ -246,13 +708,15 @@ def desenhar_carta_estilizada(x, y, carta, hover=False, oculto=False):
         txt_centro = FONT_CARTA.render(simbolo, True, cor_texto)
         if len(simbolo) > 1: 
             # Ajusta fonte para símbolos largos (+2, +4)
-            txt_centro = pygame.font.SysFont('Arial', 30, bold=True).render(simbolo, True, cor_texto)
+            txt_centro = FONT_CARTA_MD.render(simbolo, True, cor_texto)
         win.blit(txt_centro, txt_centro.get_rect(center=rect.center))
         
         # Símbolos pequenos nos cantos
         txt_pq = FONT_CARTA_PQ.render(simbolo, True, BRANCO)
         win.blit(txt_pq, (x+5, y+5))
         win.blit(txt_pq, (x+largura-20, y+altura-20))
+        if apagada:
+            win.blit(SOMBRA_INJOGAVEL, rect.topleft)
     return rect
 
 def desenhar_setas_direcao(centro_x, centro_y, sentido_horario):
@@ -277,6 +741,35 @@ def desenhar_setas_direcao(centro_x, centro_y, sentido_horario):
 
 # --- TELAS ---
 input_sala = InputBox(350, 150, 300, 40, '') # Instância global da caixa de input
+input_ip = InputBox(350, 330, 300, 40, '')   # Caixa do IP do servidor (tela de conexão)
+input_ip.active = True
+input_ip.color = AZUL
+
+def tela_conexao():
+    """Renderiza a tela inicial: escolha do servidor e progresso da conexão."""
+    win.fill(CINZA_FUNDO)
+    titulo = FONT_AVISO.render("UNO MULTIPLAYER", True, BRANCO)
+    win.blit(titulo, titulo.get_rect(center=(LARGURA_TELA//2, 150)))
+
+    if em_sala:
+        # Conexão caiu no meio da partida: o assento continua reservado no servidor
+        pontos = "." * (int(time.time() * 3) % 4)
+        txt = FONT_INFO.render(f"Conexão perdida. Reconectando (tentativa {max(tentativas_reconexao, 1)}/"
+                               f"{MAX_TENTATIVAS_RECONEXAO}){pontos}", True, BRANCO)
+        win.blit(txt, txt.get_rect(center=(LARGURA_TELA//2, 350)))
+    elif conexao is not None and conexao.conectando:
+        # Animação simples de "Conectando..." enquanto o handshake não termina
+        pontos = "." * (int(time.time() * 3) % 4)
+        txt = FONT_INFO.render(f"Conectando a {conexao.endereco[0]}:{conexao.endereco[1]}{pontos}", True, BRANCO)
+        win.blit(txt, txt.get_rect(center=(LARGURA_TELA//2, 350)))
+    else:
+        txt = FONT_INFO.render("IP do servidor (Enter para localhost):", True, BRANCO)
+        win.blit(txt, (350, 295))
+        input_ip.draw(win)
+
+    if mensagem_erro:
+        erro = FONT_INFO.render(mensagem_erro, True, VERMELHO)
+        win.blit(erro, erro.get_rect(center=(LARGURA_TELA//2, 450)))
 
 def tela_lobby():
     """Renderiza a tela inicial (Lobby) onde se cria ou escolhe salas."""
@@ -303,9 +796,11 @@ def tela_lobby():
     
     for sala in lista_salas:
         texto = f"{sala['nome']} ({sala['jogadores']}/4) - {sala['status']}"
-        btn = Botao(100, y_offset, 600, 50, texto, AZUL, {'tipo': 'ENTRAR', 'nome': sala['nome']})
+        btn = Botao(100, y_offset, 480, 50, texto, AZUL, {'tipo': 'ENTRAR', 'nome': sala['nome']})
+        btn_assistir = Botao(590, y_offset, 110, 50, "ASSISTIR", CINZA_CARTA, {'tipo': 'ASSISTIR', 'nome': sala['nome']})
         btn.desenhar(win)
-        botoes_salas.append(btn)
+        btn_assistir.desenhar(win)
+        botoes_salas += [btn, btn_assistir]
         y_offset += 60
         
     # Exibe mensagem de erro se houver
@@ -315,6 +810,12 @@ def tela_lobby():
 
     return [btn_criar] + botoes_salas # Retorna botões ativos para checagem de clique
 
+# Textos exibidos para cada opção de regra (protocolo.OPCOES_PADRAO)
+ROTULOS_OPCOES = {
+    'comprar_ate_jogavel': "Comprar até poder jogar",
+    'passe_automatico': "Passe automático",
+}
+
 def tela_config_sala():
     """Renderiza a sala de espera antes do jogo começar."""
     win.fill(CINZA_FUNDO)
@@ -331,7 +832,7 @@ def tela_config_sala():
     
     if estado_local:
         for pid in estado_local.jogadores_conectados:
-            nome_display = f"Jogador {pid[0]}:{pid[1]}"
+            nome_display = nome_jogador(pid)
             if pid == estado_local.host_id: nome_display += " (Anfitrião)"
             if pid == meu_id: nome_display += " (Você)"
             
@@ -340,6 +841,20 @@ def tela_config_sala():
             y_offset += 40
 
     botoes = []
+    # Opções de regra da sala (o anfitrião pode alternar clicando)
+    txt_opcoes = FONT_INFO.render("Regras da Sala:", True, BRANCO)
+    win.blit(txt_opcoes, (600, 100))
+    for i, (chave, rotulo) in enumerate(ROTULOS_OPCOES.items()):
+        ligada = estado_local.opcoes.get(chave, False)
+        texto = f"{rotulo}: {'SIM' if ligada else 'NÃO'}"
+        if meu_id == estado_local.host_id:
+            btn = Botao(600, 150 + i * 60, 340, 45, texto, VERDE if ligada else CINZA_CARTA,
+                        {'tipo': MSG_CONFIGURAR_SALA, 'opcoes': {chave: not ligada}})
+            btn.desenhar(win)
+            botoes.append(btn)
+        else:
+            win.blit(FONT_INFO.render(texto, True, BRANCO), (600, 150 + i * 60))
+
     # Se for o anfitrião, mostra botão de iniciar
     if meu_id == estado_local.host_id:
         pode_iniciar = len(estado_local.jogadores_conectados) >= 2
@@ -349,6 +864,12 @@ def tela_config_sala():
         btn_iniciar.desenhar(win)
         botoes.append(btn_iniciar)
         
+        # Assentos vazios podem ser ocupados por bots do servidor
+        if len(estado_local.jogadores_conectados) < 4:
+            btn_bot = Botao(100, 420, 250, 45, "ADICIONAR BOT", AZUL, {'tipo': MSG_ADICIONAR_BOT})
+            btn_bot.desenhar(win)
+            botoes.append(btn_bot)
+
         if not pode_iniciar:
              aviso = FONT_CARTA_PQ.render("Mínimo 2 jogadores para iniciar", True, VERMELHO)
              win.blit(aviso, aviso.get_rect(center=(LARGURA_TELA//2, 570)))
@@ -447,6 +968,13 @@ def tela_jogo():
         txt_obj = FONT_AVISO.render("SUA VEZ!", True, AMARELO)
         win.blit(txt_obj, txt_obj.get_rect(center=(centro_x, ALTURA_TELA - 180)))
 
+    # Contagem regressiva do prazo do turno (se a sala tiver limite de tempo)
+    if estado_local.tempo_turno and estado_local.vencedor is None:
+        restante = max(0, estado_local.tempo_turno - (time.time() - inicio_turno_local))
+        cor_tempo = VERMELHO if restante < 5 else BRANCO
+        txt_tempo = FONT_INFO.render(f"Tempo: {int(math.ceil(restante))}s", True, cor_tempo)
+        win.blit(txt_tempo, txt_tempo.get_rect(topright=(LARGURA_TELA - 20, 15)))
+
     # Desenha setas de direção
     desenhar_setas_direcao(centro_x, centro_y, estado_local.sentido_horario)
     
@@ -478,6 +1006,13 @@ def tela_jogo():
     pygame.draw.rect(win, BRANCO, rect_monte, width=2, border_radius=10)
     win.blit(FONT_CARTA_PQ.render("Monte", True, BRANCO), (centro_x - 90, centro_y - 15))
     btn_comprar = rect_monte
+    minha_vez = jogador_vez_id == meu_id
+    if minha_vez:
+        dica = FONT_CARTA_PQ.render("Botão direito: comprar e jogar", True, BRANCO)
+        win.blit(dica, dica.get_rect(center=(rect_monte.centerx, rect_monte.bottom + 12)))
+    if minha_vez and not estado_local.tem_jogada(meu_id):
+        # Sem nenhuma carta jogável: destaca o monte como a única ação possível
+        pygame.draw.rect(win, AMARELO, rect_monte, width=4, border_radius=10)
 
     # --- PILHA DE DESCARTE ---
     if estado_local.descarte:
@@ -510,7 +1045,9 @@ def tela_jogo():
         is_hover = rect_temp.collidepoint(mouse_pos)
         if i < len(minha_mao) - 1 and not is_hover: rect_temp.width = espacamento
         
-        rect_final = desenhar_carta_estilizada(pos_x, pos_y, carta, hover=is_hover)
+        # Na minha vez, cartas que não podem ser jogadas ficam escurecidas
+        apagada = minha_vez and not estado_local.pode_jogar(carta)
+        rect_final = desenhar_carta_estilizada(pos_x, pos_y, carta, hover=is_hover and not apagada, apagada=apagada)
         areas_cartas.append((rect_final, i))
     
     # --- SELETOR DE COR (OVERLAY) ---
@@ -554,166 +1091,323 @@ def tela_jogo():
 
     return areas_cartas, btn_comprar, botoes_cor, btn_uno
 
-# --- LOOP PRINCIPAL ---
-run = True
-clock = pygame.time.Clock()
-enviar_acao({'tipo': MSG_LISTAR_SALAS}) # Pede lista inicial de salas ao conectar
-ultimo_update = time.time()
-ultimo_estado_sala = False
-
-while run:
-    clock.tick(60) # Limita a 60 FPS
-    
-    # Atualiza caption se mudou de sala/lobby
-    if em_sala != ultimo_estado_sala:
-        if em_sala and meu_id is not None:
-             pygame.display.set_caption(f"UNO - Jogador {meu_id}")
-        else:
-             pygame.display.set_caption("UNO Multiplayer - Lobby")
-        ultimo_estado_sala = em_sala
+def tela_espectador():
+    """Transmissão de uma sala para espectadores: só a visão pública (nenhuma mão é mostrada)."""
+    win.fill(VERDE_MESA)
+    centro_x, centro_y = LARGURA_TELA // 2, ALTURA_TELA // 2
+    titulo = f"ASSISTINDO: {sala_assistida}" + (f" (atraso {atraso_assistido}s)" if atraso_assistido else "")
+    win.blit(FONT_INFO.render(titulo, True, BRANCO), (20, 20))
+    btn_sair = Botao(LARGURA_TELA - 170, 20, 150, 40, "SAIR", VERMELHO, MSG_SAIR_SALA)
+    btn_sair.desenhar(win)
 
-    mouse_pos = pygame.mouse.get_pos()
-    
-    # Atualização automática da lista de salas no lobby (polling a cada 1s)
-    if not em_sala and time.time() - ultimo_update > 1.0:
-        enviar_acao({'tipo': MSG_LISTAR_SALAS})
-        ultimo_update = time.time()
+    visao = visao_espectador
+    if visao is None:
+        txt = FONT_AVISO.render("Aguardando a transmissão...", True, BRANCO)
+        win.blit(txt, txt.get_rect(center=(centro_x, centro_y)))
+        return [btn_sair]
+
+    # Jogadores e quantas cartas cada um tem (o da vez em destaque)
+    y_offset = 90
+    for i, (pid, cartas) in enumerate(visao['jogadores']):
+        vez = visao['jogo_iniciado'] and visao['vencedor'] is None and i == visao['jogador_atual']
+        texto = f"{'> ' if vez else ''}{nome_jogador(pid)}: {cartas} carta{'s' if cartas != 1 else ''}"
+        if pid in visao['uno_safe']:
+            texto += " (UNO!)"
+        win.blit(FONT_INFO.render(texto, True, AMARELO if vez else BRANCO), (40, y_offset))
+        y_offset += 36
+
+    # Topo do descarte (carta preta com o fundo da cor escolhida, como na mesa)
+    topo = visao['topo']
+    if topo is not None:
+        if topo.cor == 'PRETO' and visao['cor_atual']:
+            pygame.draw.rect(win, MAPA_CORES.get(visao['cor_atual'], CINZA_CARTA), (centro_x - 50, centro_y - 70, 100, 140), border_radius=15)
+        desenhar_carta_estilizada(centro_x - 40, centro_y - 60, topo)
+
+    if visao['vencedor'] is not None:
+        status, cor = f"{nome_jogador(visao['vencedor']).upper()} VENCEU!", AMARELO
+    elif not visao['jogo_iniciado']:
+        status, cor = "Aguardando o início da partida...", BRANCO
+    else:
+        sentido = "horário" if visao['sentido_horario'] else "anti-horário"
+        status, cor = f"Cor: {visao['cor_atual']} | Sentido: {sentido} | Turno {visao['turnos']}", BRANCO
+    txt = FONT_INFO.render(status, True, cor)
+    win.blit(txt, txt.get_rect(center=(centro_x, centro_y + 110)))
+    return [btn_sair]
+
+def tela_fim_jogo():
+    """Mesa com o vencedor por cima. O anfitrião pode pedir revanche; qualquer um pode voltar ao lobby."""
+    tela_jogo() # Desenha o fundo do jogo
+    # Overlay de vitória
+    s = pygame.Surface((LARGURA_TELA, ALTURA_TELA), pygame.SRCALPHA)
+    s.fill((0,0,0, 200))
+    win.blit(s, (0,0))
+
+    msg = f"{nome_jogador(estado_local.vencedor).upper()} VENCEU!"
+    if estado_local.vencedor == meu_id:
+        msg = "VOCÊ VENCEU!"
+        cor = VERDE
+    else:
+        cor = AMARELO
     
-    # Listas de elementos interativos
-    btns_ativos = []
-    areas_jogo = []
-    btn_comprar_rect = None
-    btns_cor = []
-
-    # --- RENDERIZAÇÃO DAS TELAS ---
-    if not em_sala:
-        btns_ativos = tela_lobby()
-    elif not estado_local or not estado_local.jogo_iniciado:
-        btns_ativos = tela_config_sala()
+    txt = FONT_AVISO.render(msg, True, cor)
+    win.blit(txt, txt.get_rect(center=(LARGURA_TELA//2, ALTURA_TELA//2)))
+
+    botoes = [Botao(LARGURA_TELA//2 + 10, ALTURA_TELA//2 + 50, 200, 50, "SAIR", VERMELHO, MSG_SAIR_SALA)]
+    if meu_id == estado_local.host_id:
+        # Revanche: a sala volta à espera com os mesmos jogadores (e bots)
+        botoes.append(Botao(LARGURA_TELA//2 - 210, ALTURA_TELA//2 + 50, 200, 50, "REVANCHE", VERDE, MSG_REVANCHE))
     else:
-        # VERIFICA VITORIA
-        if estado_local.vencedor is not None:
-            tela_jogo() # Desenha o fundo do jogo
-            # Overlay de vitória
-            s = pygame.Surface((LARGURA_TELA, ALTURA_TELA), pygame.SRCALPHA)
-            s.fill((0,0,0, 200))
-            win.blit(s, (0,0))
-            
-            msg = f"JOGADOR {estado_local.vencedor} VENCEU!"
-            if estado_local.vencedor == meu_id:
-                msg = "VOCÊ VENCEU!"
-                cor = VERDE
+        txt_sub = FONT_INFO.render("O anfitrião pode pedir revanche...", True, BRANCO)
+        win.blit(txt_sub, txt_sub.get_rect(center=(LARGURA_TELA//2, ALTURA_TELA//2 + 130)))
+    for btn in botoes:
+        btn.desenhar(win)
+    return botoes
+
+# --- LOOP PRINCIPAL ---
+def imprimir_inicializacao():
+    """Mostra no terminal os marcos do tempo de inicialização (em ms desde o início do módulo)."""
+    marcos = ", ".join(f"{nome}: {ms:.0f} ms" for nome, ms in marcos_inicializacao.items())
+    print(f"[inicialização] {marcos}")
+
+def atualizar_tela():
+    """Mostra o frame desenhado (e registra o instante do primeiro frame da inicialização)."""
+    pygame.display.update()
+    if 'primeiro_frame' not in marcos_inicializacao:
+        marcos_inicializacao['primeiro_frame'] = (time.perf_counter() - INICIO_CLIENTE) * 1000
+        imprimir_inicializacao()
+
+def main():
+    """Executa o loop principal do jogo (conexão, eventos, rede e desenho)."""
+    global conexao, em_sala, estado_local, estado_confirmado, acoes_previstas, meu_id, tentativas_reconexao
+    global escolhendo_cor, carta_preta_pendente, mensagem_erro, atraso_espectador, meu_nome
+    parser = argparse.ArgumentParser(description="Cliente do UNO Multiplayer.")
+    parser.add_argument('ip', nargs='?', help="IP do servidor (se omitido, é perguntado na janela)")
+    parser.add_argument('--medir-inicializacao', action='store_true',
+                        help="imprime os tempos de inicialização e encerra (após conectar, se o IP foi dado)")
+    parser.add_argument('--atraso', type=float, default=0.0,
+                        help="atraso (segundos) da transmissão ao assistir uma sala")
+    parser.add_argument('--nome', help="nome do jogador no histórico e no ranking (padrão: usuário do sistema)")
+    args = parser.parse_args()
+    atraso_espectador = args.atraso
+    meu_nome = args.nome or getpass.getuser()
+    if args.ip:
+        iniciar_conexao(args.ip)
+
+    run = True
+    clock = pygame.time.Clock()
+    ultimo_update = time.time()
+    ultimo_estado_sala = False
+
+    while run:
+        monitor.inicio_frame(clock.tick(60)) # Limita a 60 FPS e registra a duração do frame
+        processar_rede() # Aplica as mensagens do servidor na fronteira do frame
+
+        # Modo de medição: encerra assim que o lobby aparece (ou no primeiro frame, sem IP)
+        if args.medir_inicializacao and ('lobby' in marcos_inicializacao or (
+                'primeiro_frame' in marcos_inicializacao and (not args.ip or conexao is None))):
+            break
+
+        # Conexão falhou ou caiu: dentro de uma sala, tenta recuperar o assento; senão volta para a tela de conexão
+        if conexao is not None and not conexao.aberta:
+            if em_sala and sessao and tentativas_reconexao < MAX_TENTATIVAS_RECONEXAO:
+                agendar_reconexao(conexao.endereco)
+            elif assistindo:
+                # Transmissão encerrada (a sala acabou ou o espectador ficou para trás): volta ao lobby
+                endereco = conexao.endereco
+                sair_da_sala()
+                conexao = ConexaoServidor(endereco)
+                enviar_acao({'tipo': MSG_LISTAR_SALAS})
             else:
-                cor = AMARELO
-                
-            txt = FONT_AVISO.render(msg, True, cor)
-            win.blit(txt, txt.get_rect(center=(LARGURA_TELA//2, ALTURA_TELA//2)))
-            
-            txt_sub = FONT_INFO.render("Voltando ao lobby em 5 segundos...", True, BRANCO)
-            win.blit(txt_sub, txt_sub.get_rect(center=(LARGURA_TELA//2, ALTURA_TELA//2 + 50)))
-            
-            pygame.display.update()
-            time.sleep(5)
-            
-            # Reseta estado local e volta ao lobby
-            enviar_acao({'tipo': MSG_SAIR_SALA})
-            em_sala = False
-            estado_local = None
-            meu_id = None
+                mensagem_erro = f"Falha na conexão: {conexao.erro}" if conexao.erro else "Conexão perdida."
+                conexao = None
+                tentativas_reconexao = 0
+                sair_da_sala()
+        if endereco_reconexao is not None and time.time() >= proxima_reconexao:
+            iniciar_reconexao()
+
+        # --- TELA DE CONEXÃO ---
+        if conexao is None or conexao.conectando:
+            tela_conexao()
+            monitor.desenhar(win, clock.get_fps())
+            atualizar_tela()
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    run = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    monitor.visivel = not monitor.visivel
+                elif conexao is None and not em_sala:
+                    ip = input_ip.handle_event(event)
+                    if ip is not None:
+                        iniciar_conexao(ip.strip() or 'localhost')
             continue
 
-        # Renderiza jogo normal
-        areas_jogo, btn_comprar_rect, btns_cor, btn_uno = tela_jogo()
-        if escolhendo_cor:
-            btns_ativos = btns_cor # Apenas botões de cor ativos se estiver escolhendo
-        if btn_uno:
-            btns_ativos.append(btn_uno)
+        if 'conectado' in marcos_inicializacao and 'lobby' not in marcos_inicializacao:
+            marcos_inicializacao['lobby'] = (time.perf_counter() - INICIO_CLIENTE) * 1000
+            imprimir_inicializacao()
 
-    # Atualiza estado de hover nos botões
-    for btn in btns_ativos:
-        btn.hover = btn.rect.collidepoint(mouse_pos)
+        # Atualiza caption se mudou de sala/lobby
+        if em_sala != ultimo_estado_sala:
+            if em_sala and meu_id is not None:
+                 pygame.display.set_caption(f"UNO - Jogador {meu_id}")
+            else:
+                 pygame.display.set_caption("UNO Multiplayer - Lobby")
+            ultimo_estado_sala = em_sala
 
-    pygame.display.update()
+        mouse_pos = pygame.mouse.get_pos()
+    
+        # Atualização automática da lista de salas no lobby (polling a cada 1s, ou o que o servidor pedir)
+        if not em_sala and not assistindo and time.time() - ultimo_update > intervalo_lista:
+            enviar_acao({'tipo': MSG_LISTAR_SALAS})
+            ultimo_update = time.time()
+    
+        # Listas de elementos interativos
+        btns_ativos = []
+        areas_jogo = []
+        btn_comprar_rect = None
+        btns_cor = []
+
+        # --- RENDERIZAÇÃO DAS TELAS ---
+        if assistindo:
+            btns_ativos = monitor.medir_tela('tela_espectador', tela_espectador)
+        elif not em_sala:
+            btns_ativos = monitor.medir_tela('tela_lobby', tela_lobby)
+        elif not estado_local or not estado_local.jogo_iniciado:
+            btns_ativos = monitor.medir_tela('tela_config_sala', tela_config_sala)
+        else:
+            # VERIFICA VITORIA
+            if estado_local.vencedor is not None:
+                btns_ativos = tela_fim_jogo()
+            else:
+                # Renderiza jogo normal
+                areas_jogo, btn_comprar_rect, btns_cor, btn_uno = monitor.medir_tela('tela_jogo', tela_jogo)
+                if escolhendo_cor:
+                    btns_ativos = btns_cor # Apenas botões de cor ativos se estiver escolhendo
+                if btn_uno:
+                    btns_ativos.append(btn_uno)
 
-    # --- TRATAMENTO DE EVENTOS ---
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            if em_sala:
-                enviar_acao({'tipo': MSG_SAIR_SALA})
-            run = False
-            client.close()
-            pygame.quit()
-            sys.exit()
+        # Atualiza estado de hover nos botões
+        for btn in btns_ativos:
+            btn.hover = btn.rect.collidepoint(mouse_pos)
+
+        monitor.desenhar(win, clock.get_fps())
+        monitor.fim_frame()
+        atualizar_tela()
+
+        # --- TRATAMENTO DE EVENTOS ---
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if em_sala:
+                    enviar_acao({'tipo': MSG_SAIR_SALA})
+                run = False
+                if monitor.arquivo_trace:
+                    monitor.alternar_trace() # Fecha o trace para não perder as últimas linhas
+                conexao.fechar()
+                pygame.quit()
+                sys.exit()
         
-        # Input Box (apenas no lobby)
-        if not em_sala:
-            input_sala.handle_event(event)
+            # Atalhos do painel de desempenho
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                monitor.visivel = not monitor.visivel
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                monitor.alternar_trace()
 
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            # LÓGICA DO LOBBY
-            if not em_sala:
-                for btn in btns_ativos:
-                    acao = btn.checar_click(event.pos)
-                    if acao == 'CRIAR':
-                        nome = input_sala.text.strip()
-                        if nome:
-                            enviar_acao({'tipo': MSG_CRIAR_SALA, 'nome': nome})
-                            # Tenta entrar logo em seguida (pequeno delay para servidor processar)
-                            time.sleep(0.1)
-                            enviar_acao({'tipo': MSG_ENTRAR_SALA, 'nome': nome})
-                    elif isinstance(acao, dict) and acao['tipo'] == 'ENTRAR':
-                        enviar_acao({'tipo': MSG_ENTRAR_SALA, 'nome': acao['nome']})
-            
-            # LÓGICA DA SALA DE ESPERA
-            elif not estado_local.jogo_iniciado:
-                if meu_id == estado_local.host_id:
+            # Input Box (apenas no lobby)
+            if not em_sala and not assistindo:
+                input_sala.handle_event(event)
+
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                # ESPECTADOR (só pode voltar ao lobby)
+                if assistindo:
+                    for btn in btns_ativos:
+                        if btn.checar_click(event.pos) == MSG_SAIR_SALA:
+                            enviar_acao({'tipo': MSG_SAIR_SALA})
+                            sair_da_sala()
+                            break
+
+                # LÓGICA DO LOBBY
+                elif not em_sala:
                     for btn in btns_ativos:
                         acao = btn.checar_click(event.pos)
-                        if acao == 'INICIAR':
-                            # Só envia se tiver gente suficiente (validação visual já feita, mas bom garantir)
-                            if len(estado_local.jogadores_conectados) >= 2:
-                                enviar_acao({'tipo': MSG_INICIAR_JOGO})
+                        if acao == 'CRIAR':
+                            nome = input_sala.text.strip()
+                            if nome:
+                                # O ENTRAR_SALA vai quando o servidor confirmar a criação (SUCESSO_CRIAR)
+                                enviar_acao({'tipo': MSG_CRIAR_SALA, 'nome': nome})
+                        elif isinstance(acao, dict) and acao['tipo'] == 'ENTRAR':
+                            enviar_acao({'tipo': MSG_ENTRAR_SALA, 'nome': acao['nome'], 'jogador': meu_nome})
+                        elif isinstance(acao, dict) and acao['tipo'] == 'ASSISTIR':
+                            enviar_acao({'tipo': MSG_ASSISTIR_SALA, 'nome': acao['nome'], 'atraso': atraso_espectador})
+            
+                # LÓGICA DA SALA DE ESPERA
+                elif not estado_local.jogo_iniciado:
+                    if meu_id == estado_local.host_id:
+                        for btn in btns_ativos:
+                            acao = btn.checar_click(event.pos)
+                            if acao == 'INICIAR':
+                                # Só envia se tiver gente suficiente (validação visual já feita, mas bom garantir)
+                                if len(estado_local.jogadores_conectados) >= 2:
+                                    enviar_acao({'tipo': MSG_INICIAR_JOGO})
+                            elif isinstance(acao, dict) and acao['tipo'] in (MSG_CONFIGURAR_SALA, MSG_ADICIONAR_BOT):
+                                enviar_acao(acao)
             
-            # LÓGICA DO JOGO
-            elif estado_local.jogo_iniciado:
+                # FIM DE JOGO (revanche ou volta ao lobby)
+                elif estado_local.vencedor is not None:
+                    for btn in btns_ativos:
+                        acao = btn.checar_click(event.pos)
+                        if acao == MSG_REVANCHE:
+                            enviar_acao({'tipo': MSG_REVANCHE})
+                        elif acao == MSG_SAIR_SALA:
+                            # Reseta estado local e volta ao lobby
+                            enviar_acao({'tipo': MSG_SAIR_SALA})
+                            sair_da_sala()
+                            break
+
+                # LÓGICA DO JOGO
+                elif estado_local.jogo_iniciado:
                 
-                # Ações Globais (UNO) - Pode ser clicado a qualquer momento se disponível
-                if btn_uno and btn_uno.checar_click(event.pos):
-                    enviar_acao({'tipo': MSG_GRITAR_UNO})
+                    # Ações Globais (UNO) - Pode ser clicado a qualquer momento se disponível
+                    if btn_uno and btn_uno.checar_click(event.pos):
+                        enviar_acao({'tipo': MSG_GRITAR_UNO})
 
-                # Ações de Turno (Só se for minha vez)
-                elif estado_local.jogadores_conectados[estado_local.jogador_atual] == meu_id:
+                    # Ações de Turno (Só se for minha vez)
+                    elif estado_local.jogadores_conectados[estado_local.jogador_atual] == meu_id:
                 
-                    # Se estiver escolhendo cor (após jogar +4 ou Coringa)
-                    if escolhendo_cor:
-                        for btn in btns_ativos: # btns_ativos são os de cor aqui
-                            cor_escolhida = btn.checar_click(event.pos)
-                            if cor_escolhida:
-                                enviar_acao({'tipo': 'JOGAR', 'indice': carta_preta_pendente, 'cor_escolhida': cor_escolhida})
-                                escolhendo_cor = False
-                                carta_preta_pendente = None
+                        # Se estiver escolhendo cor (após jogar +4 ou Coringa)
+                        if escolhendo_cor:
+                            for btn in btns_ativos: # btns_ativos são os de cor aqui
+                                cor_escolhida = btn.checar_click(event.pos)
+                                if cor_escolhida:
+                                    enviar_jogada({'tipo': 'JOGAR', 'indice': carta_preta_pendente, 'cor_escolhida': cor_escolhida})
+                                    escolhendo_cor = False
+                                    carta_preta_pendente = None
                     
-                    else:
-                        # Tenta jogar uma carta da mão
-                        jogou = False
-                        for rect, indice in reversed(areas_jogo): # Reversed para checar as de cima primeiro (se sobrepostas)
-                            if rect.collidepoint(event.pos):
-                                # Verifica se é carta preta antes de enviar
-                                mao = estado_local.maos[meu_id]
-                                if indice < len(mao):
-                                    carta = mao[indice]
-                                    if carta.cor == 'PRETO':
-                                        # Se for preta, abre menu de cor e não envia ainda
-                                        escolhendo_cor = True
-                                        carta_preta_pendente = indice
-                                    else:
-                                        # Se for normal, envia jogada
-                                        enviar_acao({'tipo': 'JOGAR', 'indice': indice})
-                                jogou = True
-                                break
+                        else:
+                            # Tenta jogar uma carta da mão
+                            jogou = False
+                            for rect, indice in reversed(areas_jogo): # Reversed para checar as de cima primeiro (se sobrepostas)
+                                if rect.collidepoint(event.pos):
+                                    # Verifica se é carta preta antes de enviar
+                                    mao = estado_local.maos[meu_id]
+                                    if indice < len(mao):
+                                        carta = mao[indice]
+                                        if not estado_local.pode_jogar(carta):
+                                            pass # Jogada inválida: bloqueada localmente, nada é enviado
+                                        elif carta.cor == 'PRETO':
+                                            # Se for preta, abre menu de cor e não envia ainda
+                                            escolhendo_cor = True
+                                            carta_preta_pendente = indice
+                                        else:
+                                            # Se for normal, envia jogada
+                                            enviar_jogada({'tipo': 'JOGAR', 'indice': indice})
+                                    jogou = True
+                                    break
                         
-                        # Se não clicou em carta, verifica se clicou no monte de comprar
-                        if not jogou and btn_comprar_rect and btn_comprar_rect.collidepoint(event.pos):
-                            enviar_acao({'tipo': 'COMPRAR'})
+                            # Se não clicou em carta, verifica se clicou no monte de comprar
+                            # (botão direito: compra e já joga a carta comprada, se for válida)
+                            if not jogou and btn_comprar_rect and btn_comprar_rect.collidepoint(event.pos):
+                                enviar_jogada({'tipo': 'COMPRAR', 'jogar': event.button == 3})
+
+    pygame.quit()
 
-pygame.quit()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+ARQUIVO: diretorio.py
+FUNÇÃO: Diretório de salas para vários nós do servidor (vários processos servidor.py).
+DESCRIÇÃO: Cada nó anuncia ao diretório, a cada INTERVALO_ANUNCIO segundos, o seu endereço e a
+lista resumida das suas salas, e recebe de volta os nós ativos e as salas de todos os outros.
+Com isso cada nó monta localmente um anel de hashing consistente (AnelConsistente) que diz em
+qual nó fica cada nome de sala, e responde sozinho (sem consultar o diretório a cada pedido):
+LISTAR_SALAS mostra as salas de todos os nós, e CRIAR_SALA/ENTRAR_SALA de uma sala de outro nó
+voltam como MSG_REDIRECIONAR, que o cliente segue. Adicionar um nó só move para ele ~1/N dos
+nomes de salas novas; as salas que já existem continuam no nó onde foram criadas.
+O diretório só guarda o que os nós anunciam: se ele cair, os nós seguem com o último anel
+conhecido, e um nó que para de anunciar sai do anel depois de TTL_NO segundos.
+
+USO:
+    python3 diretorio.py                     # escuta na porta 5550
+    UNO_DIRETORIO=127.0.0.1:5550 UNO_PORTA=5555 python3 servidor.py
+    UNO_DIRETORIO=127.0.0.1:5550 UNO_PORTA=5556 UNO_METRICAS=127.0.0.1:9101 python3 servidor.py
+"""
+
+import argparse  # Linha de comando (host e porta)
+import bisect    # Busca no anel ordenado
+import hashlib   # Posição de nós e salas no anel
+import socket    # Servidor TCP do diretório
+import threading # Uma thread por conexão (anúncios são curtos)
+import time      # Validade dos anúncios
+from protocolo import empacotar, receber_mensagem, MSG_LISTAR_SALAS
+from eventos import configurar_pelo_ambiente
+
+HOST_DIRETORIO = '0.0.0.0'
+PORTA_DIRETORIO = 5550
+INTERVALO_ANUNCIO = 2.0  # Segundos entre dois anúncios de cada nó
+TTL_NO = 3 * INTERVALO_ANUNCIO # Nó sem anunciar por mais que isso sai do anel
+VNOS_POR_NO = 100        # Pontos de cada nó no anel (nós virtuais): divide os nomes por igual entre os nós
+
+# Mensagens entre os nós e o diretório
+MSG_ANUNCIAR_NO = 'ANUNCIAR_NO' # Nó -> diretório: endereço, salas e se está drenando
+MSG_SAIR_NO = 'SAIR_NO'         # Nó -> diretório: o nó está parando
+MSG_DIRETORIO = 'DIRETORIO'     # Diretório -> nó: nós ativos e as salas de cada um
+
+def separar_endereco(endereco):
+    """'host:porta' -> (host, porta)."""
+    host, porta = endereco.rsplit(':', 1)
+    return host, int(porta)
+
+def hash_chave(texto):
+    """Posição de um texto no anel (64 bits)."""
+    return int.from_bytes(hashlib.blake2b(texto.encode(), digest_size=8).digest(), 'big')
+
+class AnelConsistente:
+    """
+    Anel de hashing consistente (imutável: um anel novo é montado quando os nós mudam).
+    Cada nó ocupa VNOS_POR_NO pontos; o dono de um nome é o primeiro ponto depois do hash dele.
+    """
+    def __init__(self, nos=(), vnos=VNOS_POR_NO):
+        self.nos = tuple(sorted(nos))
+        pontos = sorted((hash_chave(f'{no}#{i}'), no) for no in self.nos for i in range(vnos))
+        self.posicoes = [posicao for posicao, _ in pontos]
+        self.donos = [no for _, no in pontos]
+
+    def no_da_sala(self, nome):
+        """Endereço ('host:porta') do nó responsável pelo nome, ou None se o anel está vazio."""
+        if not self.donos:
+            return None
+        i = bisect.bisect(self.posicoes, hash_chave(nome))
+        return self.donos[i % len(self.donos)]
+
+class Diretorio:
+    """Servidor do diretório: guarda o último anúncio de cada nó e responde com os nós ativos."""
+    def __init__(self, host=HOST_DIRETORIO, porta=PORTA_DIRETORIO):
+        self.host = host
+        self.porta = porta
+        self.nos = {} # Endereço -> {'salas': lista resumida, 'drenando': bool, 'visto': time.monotonic()}
+        self.lock = threading.Lock()
+        self.socket = None
+        self.thread_accept = None
+        self.encerrado = threading.Event()
+        self.log = configurar_pelo_ambiente('diretorio.jsonl')
+
+    def iniciar(self):
+        """Abre o socket e começa a aceitar conexões numa thread. Não bloqueia (porta 0 = porta livre)."""
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.porta))
+        self.socket.listen(128)
+        self.porta = self.socket.getsockname()[1]
+        print(f"Diretório de salas rodando em {self.host}:{self.porta}")
+        self.log.info('diretorio_iniciado', host=self.host, porta=self.porta)
+        self.thread_accept = threading.Thread(target=self.aceitar_conexoes, name='diretorio-accept')
+        self.thread_accept.start()
+        return self
+
+    def parar(self):
+        self.encerrado.set()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self.thread_accept.join()
+
+    def aceitar_conexoes(self):
+        while True:
+            try:
+                conn, addr = self.socket.accept()
+            except OSError:
+                if self.encerrado.is_set():
+                    break
+                time.sleep(0.1)
+                continue
+            threading.Thread(target=self.tratar_conexao, args=(conn, addr), daemon=True).start()
+
+    def tratar_conexao(self, conn, addr):
+        """Responde as mensagens de uma conexão (um nó pode anunciar várias vezes na mesma)."""
+        try:
+            conn.settimeout(10.0) # Conexão parada não prende a thread para sempre
+            while True:
+                msg = receber_mensagem(conn)
+                if msg is None:
+                    break
+                if msg.get('tipo') == MSG_ANUNCIAR_NO:
+                    self.registrar_anuncio(msg)
+                    conn.sendall(self.resposta_diretorio())
+                elif msg.get('tipo') == MSG_SAIR_NO:
+                    self.remover_no(msg['endereco'], 'saiu')
+                elif msg.get('tipo') == MSG_LISTAR_SALAS: # Consulta (ex: monitoramento): salas de todos os nós
+                    with self.lock:
+                        salas = [dict(sala, no=no) for no, info in self.nos.items() for sala in info['salas']]
+                    conn.sendall(empacotar({'tipo': MSG_LISTAR_SALAS, 'salas': salas}))
+        except (OSError, EOFError, KeyError, AttributeError) as e:
+            self.log.aviso('erro_conexao_diretorio', endereco=addr, erro=repr(e))
+        finally:
+            conn.close()
+
+    def registrar_anuncio(self, msg):
+        endereco = msg['endereco']
+        with self.lock:
+            novo = endereco not in self.nos
+            anterior = self.nos.get(endereco, {}).get('drenando')
+            self.nos[endereco] = {'salas': msg['salas'], 'drenando': msg.get('drenando', False),
+                                  'visto': time.monotonic()}
+        if novo:
+            self.log.info('no_registrado', no=endereco, salas=len(msg['salas']))
+        elif anterior != msg.get('drenando', False):
+            self.log.info('no_drenando', no=endereco)
+
+    def remover_no(self, endereco, motivo):
+        with self.lock:
+            removido = self.nos.pop(endereco, None) is not None
+        if removido:
+            self.log.info('no_removido', no=endereco, motivo=motivo)
+
+    def resposta_diretorio(self):
+        """Nós ativos (fora os que estão drenando, que não recebem salas novas) e as salas de cada nó."""
+        agora = time.monotonic()
+        for endereco, info in list(self.nos.items()):
+            if agora - info['visto'] > TTL_NO:
+                self.remover_no(endereco, 'expirou')
+        with self.lock:
+            resposta = {'tipo': MSG_DIRETORIO,
+                        'nos': sorted(no for no, info in self.nos.items() if not info['drenando']),
+                        'salas': {no: info['salas'] for no, info in self.nos.items()}}
+        return empacotar(resposta)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Diretório de salas dos nós do servidor UNO.")
+    parser.add_argument('--host', default=HOST_DIRETORIO)
+    parser.add_argument('--porta', type=int, default=PORTA_DIRETORIO)
+    args = parser.parse_args()
+    diretorio = Diretorio(args.host, args.porta).iniciar()
+    try:
+        diretorio.thread_accept.join()
+    except KeyboardInterrupt:
+        diretorio.parar()
@@ -0,0 +1,140 @@
+"""
+ARQUIVO: espectadores.py
+FUNÇÃO: Transmitir a visão pública de uma sala para os espectadores (a plateia).
+DESCRIÇÃO: A visão pública (EstadoJogo.visao_publica: cartas na mão de cada jogador, topo do
+descarte, vez e cor) é empacotada pelo servidor uma única vez por versão, e o mesmo buffer de bytes
+vai para todos os espectadores: cada espectador a mais custa só um send, nunca uma serialização.
+Os espectadores são agrupados pelo atraso (segundos inteiros). O grupo sem atraso recebe cada
+visão na hora; cada grupo com atraso recebe as visões guardadas quando o atraso delas vence, por
+uma tarefa da roda de temporização (uma por grupo, então a ordem se mantém). Os envios não
+bloqueiam: um espectador que não lê (buffer do socket cheio) é desconectado em vez de segurar a sala.
+"""
+
+import collections # Visões recentes (base para os grupos com atraso)
+import socket      # Envio sem bloqueio e desconexão dos espectadores lentos
+import threading   # Trava da plateia
+import time        # Relógio monotônico dos atrasos
+
+ATRASO_MAXIMO = 120 # Segundos: maior atraso aceito (e por quanto tempo as visões ficam guardadas)
+FLAG_SEM_BLOQUEIO = getattr(socket, 'MSG_DONTWAIT', 0) # Não existe no Windows: lá o envio pode bloquear
+
+class Plateia:
+    """
+    Espectadores de uma sala. O servidor chama publicar() a cada versão (com a trava da sala) e
+    adicionar()/remover() das threads das conexões. A trava da plateia (nunca a da sala) protege
+    as visões e os grupos e garante que os envios para um mesmo socket não se misturam.
+    """
+    def __init__(self, roda, submeter, metricas):
+        self.roda = roda
+        self.submeter = submeter # Executa uma tarefa fora da thread da roda (Servidor.submeter)
+        self.metricas = metricas
+        self.lock = threading.Lock()
+        self.visoes = collections.deque() # (nº da visão, instante, bytes), em ordem
+        self.contador = 0                 # Nº da próxima visão publicada
+        # Atraso -> {'conexoes': sockets, 'proxima': nº da próxima visão a enviar, 'agendado': bool}
+        self.grupos = {}
+
+    def __len__(self):
+        return sum(len(grupo['conexoes']) for grupo in self.grupos.values())
+
+    def publicar(self, dados):
+        """Guarda uma visão (já empacotada) e a envia ao grupo sem atraso; os outros grupos são agendados."""
+        agora = time.monotonic()
+        with self.lock:
+            numero = self.contador
+            self.contador += 1
+            self.visoes.append((numero, agora, dados))
+            # Guarda até ATRASO_MAXIMO, mais a última visão anterior a isso (o que um grupo novo vê primeiro)
+            while len(self.visoes) > 1 and agora - self.visoes[1][1] >= ATRASO_MAXIMO:
+                self.visoes.popleft()
+            for atraso, grupo in self.grupos.items():
+                if atraso == 0:
+                    self._enviar(grupo, list(grupo['conexoes']), dados)
+                    grupo['proxima'] = numero + 1
+                elif not grupo['agendado']:
+                    self._agendar(atraso, grupo, agora)
+
+    def adicionar(self, conn, atraso):
+        """Coloca a conexão no grupo do atraso e manda a ela a visão que o grupo está vendo agora."""
+        agora = time.monotonic()
+        with self.lock:
+            grupo = self.grupos.get(atraso)
+            if grupo is None:
+                # O grupo começa pela visão mais recente com pelo menos 'atraso' segundos
+                prontas = [numero for numero, instante, _ in self.visoes if instante + atraso <= agora]
+                proxima = prontas[-1] + 1 if prontas else (self.visoes[0][0] if self.visoes else self.contador)
+                grupo = self.grupos[atraso] = {'conexoes': [], 'proxima': proxima, 'agendado': False}
+                if self.visoes and self.visoes[-1][0] >= proxima:
+                    self._agendar(atraso, grupo, agora)
+            atual = [dados for numero, _, dados in self.visoes if numero == grupo['proxima'] - 1]
+            grupo['conexoes'].append(conn)
+            if atual:
+                self._enviar(grupo, [conn], atual[0])
+
+    def remover(self, conn):
+        with self.lock:
+            for atraso, grupo in list(self.grupos.items()):
+                if conn in grupo['conexoes']:
+                    grupo['conexoes'].remove(conn)
+                    if not grupo['conexoes']:
+                        del self.grupos[atraso] # Uma tarefa ainda agendada para ele não encontra o grupo e termina
+
+    def encerrar(self, dados):
+        """A sala acabou: manda a última mensagem e fecha as conexões de todos os espectadores."""
+        with self.lock:
+            grupos, self.grupos = self.grupos, {}
+            for grupo in grupos.values():
+                self._enviar(grupo, list(grupo['conexoes']), dados)
+                for conn in grupo['conexoes']:
+                    self._desconectar(conn)
+
+    def _agendar(self, atraso, grupo, agora):
+        """Agenda a transmissão do grupo para quando vencer o atraso da próxima visão dele."""
+        for numero, instante, _ in self.visoes:
+            if numero >= grupo['proxima']:
+                grupo['agendado'] = True
+                self.roda.agendar(max(0.0, instante + atraso - agora), self.submeter, self._transmitir, atraso)
+                return
+
+    def _transmitir(self, atraso):
+        """Tarefa de um grupo com atraso: envia (num só buffer) as visões cujo atraso venceu."""
+        agora = time.monotonic()
+        with self.lock:
+            grupo = self.grupos.get(atraso)
+            if grupo is None:
+                return # Todos os espectadores do grupo saíram
+            grupo['agendado'] = False
+            prontas = [(numero, dados) for numero, instante, dados in self.visoes
+                       if numero >= grupo['proxima'] and instante + atraso <= agora]
+            if prontas:
+                self._enviar(grupo, list(grupo['conexoes']), b''.join(dados for _, dados in prontas))
+                grupo['proxima'] = prontas[-1][0] + 1
+            self._agendar(atraso, grupo, agora)
+
+    def _enviar(self, grupo, conexoes, dados):
+        """
+        Envia o mesmo buffer a cada conexão, sem bloquear. Quem não aceita o buffer inteiro sai da
+        plateia (a mensagem ficaria cortada no meio) e é desconectado.
+        """
+        entregues = 0
+        for conn in conexoes:
+            try:
+                enviados = conn.send(dados, FLAG_SEM_BLOQUEIO)
+            except OSError: # Inclui BlockingIOError (buffer cheio)
+                enviados = -1
+            if enviados == len(dados):
+                entregues += 1
+                continue
+            grupo['conexoes'].remove(conn)
+            self.metricas.contar('uno_espectadores_lentos_total')
+            self._desconectar(conn)
+        if not grupo['conexoes']:
+            self.grupos = {atraso: g for atraso, g in self.grupos.items() if g is not grupo}
+        self.metricas.contar('uno_espectador_envios_total', entregues)
+        self.metricas.contar('uno_bytes_enviados_total', len(dados) * entregues)
+
+    def _desconectar(self, conn):
+        try:
+            conn.shutdown(socket.SHUT_RDWR) # A thread da conexão recebe o fim e encerra
+        except OSError:
+            pass
@@ -0,0 +1,139 @@
+"""
+ARQUIVO: eventos.py
+FUNÇÃO: Log estruturado de eventos do servidor (uma linha JSON por evento).
+DESCRIÇÃO: Substitui os print() espalhados pelo servidor. Quem registra um evento só filtra
+pelo nível/amostragem e coloca uma tupla numa fila (alguns microssegundos, sem formatar texto
+nem tocar no disco); uma thread separada converte para JSON, grava em lotes e faz a rotação do
+arquivo por tamanho. Cada linha tem 't' (epoch), 'nivel', 'evento' e os campos extras
+(ex: sala, jogador), prontos para jq/pandas.
+
+CONFIGURAÇÃO (variáveis de ambiente, lidas por configurar_pelo_ambiente):
+    UNO_LOG             arquivo de saída (padrão: servidor.jsonl; '-' = saída padrão; vazio = desligado)
+    UNO_LOG_NIVEL       DEBUG, INFO, AVISO ou ERRO (padrão: INFO)
+    UNO_LOG_AMOSTRAGEM  fração gravada por evento, ex: "jogada=0.1,conexao=0.5"
+    UNO_LOG_TAMANHO     tamanho máximo em MB antes de rotacionar (padrão: 10)
+"""
+
+import json      # Formato das linhas
+import os        # Rotação dos arquivos e leitura da configuração
+import queue     # Fila entre quem registra e a thread escritora
+import random    # Amostragem
+import sys       # Saída padrão (UNO_LOG=-)
+import threading # Thread escritora
+import time      # Carimbo de tempo dos eventos
+
+DEBUG, INFO, AVISO, ERRO = 10, 20, 30, 40
+NOMES_NIVEIS = {DEBUG: 'DEBUG', INFO: 'INFO', AVISO: 'AVISO', ERRO: 'ERRO'}
+NIVEIS = {nome: nivel for nivel, nome in NOMES_NIVEIS.items()}
+
+LOTE_ESCRITA = 256 # Máximo de linhas por escrita no arquivo
+
+class RegistroEventos:
+    """
+    Log JSONL assíncrono com rotação por tamanho.
+    caminho: arquivo de saída ('-' para a saída padrão, None para descartar tudo)
+    amostragem: evento -> fração (0 a 1) das ocorrências que são gravadas
+    """
+    def __init__(self, caminho, nivel=INFO, amostragem=None, tamanho_maximo=10 * 1024 * 1024,
+                 arquivos_mantidos=5):
+        self.caminho = caminho
+        self.nivel = nivel
+        self.amostragem = dict(amostragem or {})
+        self.tamanho_maximo = tamanho_maximo
+        self.arquivos_mantidos = arquivos_mantidos
+        self.fila = queue.SimpleQueue()
+        self.thread = None
+        if caminho is not None:
+            self.thread = threading.Thread(target=self._escrever, name='log-eventos', daemon=True)
+            self.thread.start()
+
+    # --- CAMINHO RÁPIDO (threads do jogo) ---
+    def registrar(self, nivel, evento, **campos):
+        """Registra um evento com campos extras. Não formata nem grava nada nesta thread."""
+        if nivel < self.nivel or self.thread is None:
+            return
+        fracao = self.amostragem.get(evento)
+        if fracao is not None and random.random() >= fracao:
+            return
+        self.fila.put((time.time(), nivel, evento, campos))
+
+    def debug(self, evento, **campos):
+        if self.nivel <= DEBUG: # Testa antes de chamar: com DEBUG desligado, custa só esta comparação
+            self.registrar(DEBUG, evento, **campos)
+
+    def info(self, evento, **campos):
+        self.registrar(INFO, evento, **campos)
+
+    def aviso(self, evento, **campos):
+        self.registrar(AVISO, evento, **campos)
+
+    def erro(self, evento, **campos):
+        self.registrar(ERRO, evento, **campos)
+
+    def fechar(self):
+        """Grava o que está na fila e encerra a thread escritora."""
+        if self.thread is not None:
+            self.fila.put(None)
+            self.thread.join()
+            self.thread = None
+
+    # --- THREAD ESCRITORA ---
+    def _abrir(self):
+        if self.caminho == '-':
+            return sys.stdout
+        return open(self.caminho, 'a', encoding='utf-8')
+
+    def _rotacionar(self, arquivo):
+        """servidor.jsonl -> servidor.jsonl.1 -> .2 ... (o mais antigo é apagado)."""
+        arquivo.close()
+        for i in range(self.arquivos_mantidos - 1, 0, -1):
+            origem = f'{self.caminho}.{i}'
+            if os.path.exists(origem):
+                os.replace(origem, f'{self.caminho}.{i + 1}')
+        os.replace(self.caminho, f'{self.caminho}.1')
+        return self._abrir()
+
+    def _linha(self, item):
+        t, nivel, evento, campos = item
+        registro = {'t': round(t, 6), 'nivel': NOMES_NIVEIS.get(nivel, nivel), 'evento': evento}
+        registro.update(campos)
+        if evento in self.amostragem:
+            registro['amostragem'] = self.amostragem[evento] # Para reponderar as contagens na análise
+        # IDs de jogador (tuplas) viram listas; exceções e outros objetos viram texto (default=str)
+        return json.dumps(registro, ensure_ascii=False, default=str) + '\n'
+
+    def _escrever(self):
+        arquivo = self._abrir()
+        tamanho = arquivo.tell() if arquivo is not sys.stdout else 0
+        encerrar = False
+        while not encerrar:
+            lote = [self.fila.get()]
+            try:
+                while len(lote) < LOTE_ESCRITA:
+                    lote.append(self.fila.get_nowait())
+            except queue.Empty:
+                pass
+            if None in lote:
+                encerrar = True
+                lote = [item for item in lote if item is not None]
+            dados = ''.join(self._linha(item) for item in lote)
+            arquivo.write(dados)
+            arquivo.flush()
+            tamanho += len(dados)
+            if arquivo is not sys.stdout and tamanho >= self.tamanho_maximo:
+                arquivo = self._rotacionar(arquivo)
+                tamanho = 0
+        if arquivo is not sys.stdout:
+            arquivo.close()
+
+def configurar_pelo_ambiente(caminho_padrao):
+    """Cria o RegistroEventos a partir das variáveis UNO_LOG* (ver o cabeçalho do arquivo)."""
+    caminho = os.environ.get('UNO_LOG', caminho_padrao) or None
+    nivel = NIVEIS.get(os.environ.get('UNO_LOG_NIVEL', 'INFO').upper(), INFO)
+    amostragem = {}
+    for item in os.environ.get('UNO_LOG_AMOSTRAGEM', '').split(','):
+        if '=' in item:
+            evento, fracao = item.split('=', 1)
+            amostragem[evento.strip()] = float(fracao)
+    tamanho = float(os.environ.get('UNO_LOG_TAMANHO', '10')) * 1024 * 1024
+    return RegistroEventos(caminho, nivel, amostragem, tamanho)
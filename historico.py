@@ -0,0 +1,229 @@
+"""
+ARQUIVO: historico.py
+FUNÇÃO: Guardar o resultado de cada partida em SQLite e consultar estatísticas e ranking.
+DESCRIÇÃO: As threads do jogo só colocam o resultado numa fila (nunca esperam pelo disco).
+Uma única thread escritora tira os resultados da fila em lotes e grava cada lote numa só
+transação. Além das tabelas de partidas e participações, uma tabela de totais por jogador é
+atualizada na mesma transação, então estatísticas e ranking não precisam varrer o histórico
+(continuam rápidos com milhões de linhas).
+
+USO:
+    python3 historico.py ranking                   # 10 jogadores com mais vitórias
+    python3 historico.py jogador maria
+"""
+
+import argparse  # Linha de comando das consultas
+import queue     # Fila entre as threads do jogo e a thread escritora
+import sqlite3   # Banco de dados em arquivo (biblioteca padrão)
+import threading # Thread escritora
+import traceback # Pilha dos erros de gravação, para o log
+
+from bots import eh_bot
+
+TAMANHO_LOTE = 500     # Máximo de partidas por transação
+ESPERA_LOTE = 0.5      # Segundos esperando mais partidas antes de gravar um lote incompleto
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS partidas (
+    id INTEGER PRIMARY KEY,
+    sala TEXT NOT NULL,
+    semente TEXT NOT NULL,
+    inicio REAL NOT NULL,
+    duracao REAL NOT NULL,
+    turnos INTEGER NOT NULL,
+    vencedor TEXT,
+    num_jogadores INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS participacoes (
+    partida INTEGER NOT NULL REFERENCES partidas(id),
+    jogador TEXT NOT NULL,
+    assento INTEGER NOT NULL,
+    venceu INTEGER NOT NULL,
+    cartas_compradas INTEGER NOT NULL,
+    cartas_na_mao INTEGER NOT NULL,
+    PRIMARY KEY (partida, jogador)
+);
+CREATE INDEX IF NOT EXISTS idx_participacoes_jogador ON participacoes (jogador, partida);
+CREATE TABLE IF NOT EXISTS totais_jogador (
+    jogador TEXT PRIMARY KEY,
+    partidas INTEGER NOT NULL,
+    vitorias INTEGER NOT NULL,
+    cartas_compradas INTEGER NOT NULL,
+    turnos INTEGER NOT NULL,
+    tempo_jogado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_totais_vitorias ON totais_jogador (vitorias DESC, partidas);
+"""
+
+def nome_id(id_jogador, nome_sala, nomes):
+    """
+    Identidade do jogador no histórico. O ID da partida ('host', porta) muda a cada conexão, então
+    humanos são guardados pelo nome com que entraram na sala (nomes: ID -> nome, únicos na sala; ver
+    servidor.nome_jogador_sala). Sem nome (salas restauradas de versões anteriores), vale o próprio
+    ID: nunca se repete na partida. Bots ('BOT', n) repetem o mesmo n em todas as salas: levam o nome da sala.
+    """
+    if eh_bot(id_jogador):
+        return f"{nome_sala}/BOT:{id_jogador[1]}"
+    return nomes.get(id_jogador) or f"{id_jogador[0]}:{id_jogador[1]}"
+
+def resultado_partida(nome_sala, estado, inicio, fim, nomes):
+    """
+    Monta o registro de uma partida terminada a partir do EstadoJogo (feito na thread do jogo).
+    Cada jogador vai como (identidade, assento, venceu, cartas compradas, cartas na mão, humano).
+    """
+    return {
+        'sala': nome_sala,
+        'semente': f'{estado.semente:x}',
+        'inicio': inicio,
+        'duracao': fim - inicio,
+        'turnos': estado.turnos - estado.turno_inicial, # Revanches continuam a contagem da sala
+        'vencedor': nome_id(estado.vencedor, nome_sala, nomes) if estado.vencedor is not None else None,
+        'jogadores': [(nome_id(pid, nome_sala, nomes), assento, pid == estado.vencedor, estado.compradas.get(pid, 0),
+                       len(estado.maos[pid]), not eh_bot(pid))
+                      for assento, pid in enumerate(estado.jogadores_conectados)],
+    }
+
+class HistoricoPartidas:
+    """Histórico persistente das partidas num arquivo SQLite. Erros de gravação vão para 'log', se houver."""
+    def __init__(self, caminho, log=None):
+        self.caminho = caminho
+        self.log = log
+        self.fila = queue.Queue()
+        conexao = self._conectar()
+        conexao.executescript(ESQUEMA)
+        conexao.close()
+        self.thread = threading.Thread(target=self._escrever, name='historico-escritor', daemon=True)
+        self.thread.start()
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho)
+        # WAL: as consultas (em outras conexões) não bloqueiam nem são bloqueadas pela escrita
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('PRAGMA synchronous=NORMAL')
+        return conexao
+
+    # --- ESCRITA ---
+    def registrar_partida(self, resultado):
+        """Enfileira o resultado de uma partida (não bloqueia). Ver resultado_partida."""
+        self.fila.put(resultado)
+
+    def fechar(self):
+        """Grava o que ainda está na fila e encerra a thread escritora."""
+        self.fila.put(None)
+        self.thread.join()
+
+    def _escrever(self):
+        """Loop da thread escritora: junta até TAMANHO_LOTE partidas e grava numa transação."""
+        conexao = self._conectar()
+        encerrar = False
+        while not encerrar:
+            lote = [self.fila.get()]
+            try:
+                while len(lote) < TAMANHO_LOTE:
+                    lote.append(self.fila.get(timeout=ESPERA_LOTE))
+            except queue.Empty:
+                pass
+            if None in lote:
+                encerrar = True
+                lote = [r for r in lote if r is not None]
+            if not lote:
+                continue
+            try:
+                with conexao: # Uma transação por lote
+                    for resultado in lote:
+                        self._inserir(conexao, resultado)
+            except sqlite3.Error:
+                # Regrava uma a uma, para que uma partida com problema não leve o lote inteiro junto
+                for resultado in lote:
+                    try:
+                        with conexao:
+                            self._inserir(conexao, resultado)
+                    except sqlite3.Error as e:
+                        if self.log is None:
+                            print(f"Erro ao gravar a partida da sala {resultado['sala']} no histórico: {e}")
+                        else:
+                            self.log.erro('erro_historico', sala=resultado['sala'], erro=repr(e),
+                                          pilha=traceback.format_exc())
+        conexao.close()
+
+    def _inserir(self, conexao, r):
+        cursor = conexao.execute(
+            'INSERT INTO partidas (sala, semente, inicio, duracao, turnos, vencedor, num_jogadores) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (r['sala'], r['semente'], r['inicio'], r['duracao'], r['turnos'], r['vencedor'], len(r['jogadores'])))
+        partida = cursor.lastrowid
+        conexao.executemany(
+            'INSERT INTO participacoes (partida, jogador, assento, venceu, cartas_compradas, cartas_na_mao) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(partida, jogador, assento, int(venceu), compradas, na_mao)
+             for jogador, assento, venceu, compradas, na_mao, _ in r['jogadores']])
+        # Totais (estatísticas e ranking) só dos humanos: os bots ficam apenas nas participações
+        conexao.executemany(
+            'INSERT INTO totais_jogador (jogador, partidas, vitorias, cartas_compradas, turnos, tempo_jogado) '
+            'VALUES (?, 1, ?, ?, ?, ?) '
+            'ON CONFLICT (jogador) DO UPDATE SET partidas = partidas + 1, vitorias = vitorias + excluded.vitorias, '
+            'cartas_compradas = cartas_compradas + excluded.cartas_compradas, '
+            'turnos = turnos + excluded.turnos, tempo_jogado = tempo_jogado + excluded.tempo_jogado',
+            [(jogador, int(venceu), compradas, r['turnos'], r['duracao'])
+             for jogador, _, venceu, compradas, _, humano in r['jogadores'] if humano])
+
+    # --- CONSULTAS (cada uma com a sua conexão: podem vir de qualquer thread) ---
+    def _consultar(self, sql, parametros=()):
+        conexao = sqlite3.connect(self.caminho)
+        conexao.row_factory = sqlite3.Row
+        try:
+            return [dict(linha) for linha in conexao.execute(sql, parametros)]
+        finally:
+            conexao.close()
+
+    def estatisticas(self, jogador):
+        """Totais de um jogador (partidas, vitorias, taxa, cartas compradas, tempo) ou None."""
+        linhas = self._consultar('SELECT * FROM totais_jogador WHERE jogador = ?', (jogador,))
+        if not linhas:
+            return None
+        totais = linhas[0]
+        totais['taxa_vitoria'] = totais['vitorias'] / totais['partidas']
+        return totais
+
+    def ultimas_partidas(self, jogador, limite=10):
+        """Partidas mais recentes de um jogador (usa o índice (jogador, partida))."""
+        return self._consultar(
+            'SELECT p.id, p.sala, p.inicio, p.duracao, p.turnos, p.vencedor, j.venceu, j.cartas_compradas '
+            'FROM participacoes j JOIN partidas p ON p.id = j.partida '
+            'WHERE j.jogador = ? ORDER BY j.partida DESC LIMIT ?', (jogador, limite))
+
+    def ranking(self, limite=10, minimo_partidas=1):
+        """Jogadores com mais vitórias (usa o índice de vitórias da tabela de totais)."""
+        return self._consultar(
+            'SELECT jogador, vitorias, partidas, CAST(vitorias AS REAL) / partidas AS taxa_vitoria '
+            'FROM totais_jogador WHERE partidas >= ? ORDER BY vitorias DESC, partidas LIMIT ?',
+            (minimo_partidas, limite))
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas ao histórico de partidas do UNO.")
+    parser.add_argument('--banco', default='historico.db')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_ranking = sub.add_parser('ranking', help="jogadores com mais vitórias")
+    p_ranking.add_argument('--limite', type=int, default=10)
+    p_jogador = sub.add_parser('jogador', help="estatísticas e últimas partidas de um jogador")
+    p_jogador.add_argument('id', help="nome do jogador (ou o IP, para clientes sem nome)")
+    args = parser.parse_args()
+
+    historico = HistoricoPartidas(args.banco)
+    if args.comando == 'ranking':
+        print(f"{'#':>3}  {'jogador':<24}{'vitórias':>9}{'partidas':>9}{'taxa':>8}")
+        for i, linha in enumerate(historico.ranking(args.limite), 1):
+            print(f"{i:>3}  {linha['jogador']:<24}{linha['vitorias']:>9}{linha['partidas']:>9}{linha['taxa_vitoria']:>8.1%}")
+    else:
+        totais = historico.estatisticas(args.id)
+        if totais is None:
+            print("Jogador sem partidas registradas.")
+            return
+        print(f"{totais['partidas']} partidas, {totais['vitorias']} vitórias ({totais['taxa_vitoria']:.1%}), "
+              f"{totais['cartas_compradas']} cartas compradas, {totais['tempo_jogado'] / 60:.0f} min jogados")
+        for p in historico.ultimas_partidas(args.id):
+            print(f"  #{p['id']} sala {p['sala']}: {p['turnos']} turnos, {p['duracao']:.0f}s, "
+                  f"{'venceu' if p['venceu'] else 'vencedor ' + str(p['vencedor'])}")
+
+if __name__ == '__main__':
+    main()
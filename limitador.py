@@ -0,0 +1,58 @@
+"""
+ARQUIVO: limitador.py
+FUNÇÃO: Limite de taxa das mensagens de cada conexão (token bucket, ou "balde de fichas").
+DESCRIÇÃO: Cada tipo de mensagem tem um balde com um orçamento (fichas por segundo e rajada
+máxima); cada mensagem gasta uma ficha e, sem fichas, é descartada. O reabastecimento é
+calculado na própria verificação, pelo tempo decorrido desde a anterior: O(1), sem thread nem
+temporizador. Os descartes gastam fichas de um segundo balde, o de tolerância: quem continua
+passando do limite esvazia esse balde e é tratado como abusivo (o servidor desconecta).
+Cada LimitadorConexao pertence à thread da sua conexão, então não precisa de trava.
+"""
+
+import time # Relógio monotônico do reabastecimento
+
+# Resultados de LimitadorConexao.verificar
+PERMITIDA = 'permitida'
+DESCARTADA = 'descartada'
+ABUSO = 'abuso'
+
+class BaldeFichas:
+    """Balde com até 'capacidade' fichas, reabastecido a 'taxa' fichas por segundo."""
+    __slots__ = ('taxa', 'capacidade', 'fichas', 'ultimo')
+
+    def __init__(self, taxa, capacidade, agora):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.fichas = capacidade # Começa cheio: a rajada inicial (ex: entrar na sala) passa
+        self.ultimo = agora
+
+    def consumir(self, agora):
+        """Gasta uma ficha, se houver. Retorna False se o balde está vazio."""
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.ultimo) * self.taxa)
+        self.ultimo = agora
+        if self.fichas >= 1:
+            self.fichas -= 1
+            return True
+        return False
+
+class LimitadorConexao:
+    """
+    Baldes de uma conexão, um por tipo de mensagem (criados no primeiro uso).
+    orcamentos: tipo -> (fichas por segundo, rajada); a chave '*' vale para os tipos sem orçamento próprio
+    tolerancia: (fichas por segundo, capacidade) do balde de mensagens descartadas
+    """
+    def __init__(self, orcamentos, tolerancia):
+        self.orcamentos = orcamentos
+        self.baldes = {}
+        self.tolerancia = BaldeFichas(*tolerancia, time.monotonic())
+
+    def verificar(self, tipo):
+        """PERMITIDA, DESCARTADA (passou do orçamento) ou ABUSO (passou também da tolerância)."""
+        agora = time.monotonic()
+        balde = self.baldes.get(tipo)
+        if balde is None:
+            taxa, rajada = self.orcamentos.get(tipo) or self.orcamentos['*']
+            balde = self.baldes[tipo] = BaldeFichas(taxa, rajada, agora)
+        if balde.consumir(agora):
+            return PERMITIDA
+        return DESCARTADA if self.tolerancia.consumir(agora) else ABUSO
@@ -0,0 +1,185 @@
+"""
+ARQUIVO: metricas.py
+FUNÇÃO: Métricas do servidor (contadores, histogramas e medidores) expostas por HTTP no formato
+texto do Prometheus.
+DESCRIÇÃO: Cada thread incrementa os seus próprios contadores (um "fragmento" por thread, sem
+trava no caminho quente); só a leitura (/metrics) soma os fragmentos de todas as threads.
+Fragmentos de threads que já terminaram são consolidados na leitura, para que a lista não
+cresça com as milhares de threads de clientes que vêm e vão.
+
+USO:
+    curl http://127.0.0.1:9100/metrics
+"""
+
+import bisect    # Balde do histograma
+import threading # Fragmentos por thread e thread do servidor HTTP
+import time      # Cronômetro
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites superiores (segundos) dos baldes dos histogramas de tempo
+BALDES_TEMPO = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Cronometro:
+    """Context manager que observa a duração do bloco num histograma (funciona com continue/break)."""
+    __slots__ = ('metricas', 'nome', 'rotulos', 'inicio')
+
+    def __init__(self, metricas, nome, rotulos):
+        self.metricas = metricas
+        self.nome = nome
+        self.rotulos = rotulos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        self.metricas.observar(self.nome, time.perf_counter() - self.inicio, **self.rotulos)
+
+class Metricas:
+    """Registro de métricas com agregação por thread."""
+    def __init__(self):
+        self.lock = threading.Lock()    # Só para registrar fragmentos novos e para a leitura
+        self.local = threading.local()
+        self.fragmentos = []            # (thread, {'contadores': {}, 'histogramas': {}})
+        self.consolidado = {'contadores': {}, 'histogramas': {}} # Soma das threads já encerradas
+        self.descricoes = {}            # nome -> (tipo, texto de ajuda)
+        self.medidores = {}             # nome -> função que retorna {rótulos: valor} na hora da leitura
+
+    def descrever(self, nome, tipo, ajuda):
+        """Define o tipo (counter, histogram, gauge) e a ajuda de uma métrica, para o /metrics."""
+        self.descricoes[nome] = (tipo, ajuda)
+
+    def medidor(self, nome, ajuda, funcao):
+        """Registra um medidor calculado na hora da leitura (funcao() -> {tupla de rótulos: valor})."""
+        self.descrever(nome, 'gauge', ajuda)
+        self.medidores[nome] = funcao
+
+    def _fragmento(self):
+        try:
+            return self.local.fragmento
+        except AttributeError:
+            fragmento = {'contadores': {}, 'histogramas': {}}
+            with self.lock:
+                self.fragmentos.append((threading.current_thread(), fragmento))
+            self.local.fragmento = fragmento
+            return fragmento
+
+    # --- CAMINHO QUENTE (sem trava: cada thread só escreve no próprio fragmento) ---
+    def contar(self, nome, valor=1, **rotulos):
+        contadores = self._fragmento()['contadores']
+        chave = (nome, tuple(rotulos.items()))
+        contadores[chave] = contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **rotulos):
+        histogramas = self._fragmento()['histogramas']
+        chave = (nome, tuple(rotulos.items()))
+        h = histogramas.get(chave)
+        if h is None:
+            h = histogramas[chave] = [0.0, 0] + [0] * (len(BALDES_TEMPO) + 1) # soma, total, baldes
+        h[0] += valor
+        h[1] += 1
+        h[2 + bisect.bisect_left(BALDES_TEMPO, valor)] += 1
+
+    def medir(self, nome, **rotulos):
+        """with metricas.medir('x_segundos', tipo=...): ... observa a duração do bloco."""
+        return Cronometro(self, nome, rotulos)
+
+    # --- LEITURA ---
+    def _somar(self):
+        """Soma todos os fragmentos (consolidando os das threads encerradas)."""
+        with self.lock:
+            vivos = []
+            for thread, fragmento in self.fragmentos:
+                if thread.is_alive():
+                    vivos.append((thread, fragmento))
+                else:
+                    _acumular(self.consolidado, fragmento)
+            self.fragmentos = vivos
+            total = {'contadores': dict(self.consolidado['contadores']),
+                     'histogramas': {k: list(v) for k, v in self.consolidado['histogramas'].items()}}
+            for _, fragmento in vivos:
+                _acumular(total, fragmento)
+        return total
+
+    def total(self, nome):
+        """Soma de um contador em todos os rótulos e threads."""
+        return sum(v for (n, _), v in self._somar()['contadores'].items() if n == nome)
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus."""
+        total = self._somar()
+        series = {} # nome -> linhas
+        for (nome, rotulos), valor in sorted(total['contadores'].items()):
+            series.setdefault(nome, []).append(f"{nome}{_rotulos(rotulos)} {valor}")
+        for (nome, rotulos), h in sorted(total['histogramas'].items()):
+            linhas = series.setdefault(nome, [])
+            acumulado = 0
+            for limite, quantidade in zip(BALDES_TEMPO + ('+Inf',), h[2:]):
+                acumulado += quantidade
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos + (('le', limite),))} {acumulado}")
+            linhas.append(f"{nome}_sum{_rotulos(rotulos)} {h[0]}")
+            linhas.append(f"{nome}_count{_rotulos(rotulos)} {h[1]}")
+        for nome, funcao in self.medidores.items():
+            series[nome] = [f"{nome}{_rotulos(rotulos)} {valor}" for rotulos, valor in funcao().items()]
+
+        saida = []
+        for nome, linhas in series.items():
+            tipo, ajuda = self.descricoes.get(nome, ('untyped', ''))
+            saida.append(f"# HELP {nome} {ajuda}")
+            saida.append(f"# TYPE {nome} {tipo}")
+            saida.extend(linhas)
+        return "\n".join(saida) + "\n"
+
+def _acumular(destino, fragmento):
+    for chave, valor in list(fragmento['contadores'].items()):
+        destino['contadores'][chave] = destino['contadores'].get(chave, 0) + valor
+    for chave, h in list(fragmento['histogramas'].items()):
+        atual = destino['histogramas'].get(chave)
+        if atual is None:
+            destino['histogramas'][chave] = list(h)
+        else:
+            for i, valor in enumerate(h):
+                atual[i] += valor
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{chave}="{valor}"' for chave, valor in rotulos) + '}'
+
+def iniciar_servidor_http(metricas, host, porta, rotas=None):
+    """
+    Sobe (numa thread) o servidor HTTP com GET /metrics. 'rotas' acrescenta outros caminhos:
+    caminho -> função(parâmetros da query) que retorna (content-type, corpo em bytes).
+    Retorna o ThreadingHTTPServer (shutdown() para parar).
+    """
+    todas = {'/metrics': lambda _: ('text/plain; version=0.0.4', metricas.exportar().encode())}
+    todas.update(rotas or {})
+
+    class Tratador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            caminho, _, query = self.path.partition('?')
+            rota = todas.get(caminho)
+            if rota is None:
+                self.send_error(404)
+                return
+            parametros = dict(p.split('=', 1) for p in query.split('&') if '=' in p)
+            try:
+                tipo, corpo = rota(parametros)
+            except Exception as e:
+                self.send_error(500, str(e))
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass # Sem uma linha no terminal por requisição
+
+    servidor = ThreadingHTTPServer((host, porta), Tratador)
+    # Threads das requisições não são daemon: uma resposta em andamento (ex: a de /drenar, que
+    # encerra o processo) termina de ser enviada antes de o interpretador sair
+    servidor.daemon_threads = False
+    threading.Thread(target=servidor.serve_forever, name='metricas-http', daemon=True).start()
+    return servidor
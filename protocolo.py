@@ -7,7 +7,9 @@ DESCRIÇÃO: Contém a classe Carta, a classe EstadoJogo (que encapsula toda a l
 e as constantes de mensagens de rede.
 """
 
-import random   # Usado para embaralhar o baralho
+import random   # Gerador de números aleatórios (embaralhamento determinístico por sala)
+import pickle   # Serialização das mensagens trocadas pela rede
+import struct   # Empacotamento do cabeçalho de tamanho das mensagens
 
 # --- CONSTANTES DO JOGO ---
 # Definem as propriedades básicas das cartas
@@ -24,6 +26,103 @@ MSG_INICIAR_JOGO = 'INICIAR_JOGO'
 MSG_GRITAR_UNO = 'GRITAR_UNO'
 MSG_SAIR_SALA = 'SAIR_SALA'
 MSG_ERRO = 'ERRO'
+MSG_CONFIGURAR_SALA = 'CONFIGURAR_SALA' # Anfitrião altera as opções de regra antes do jogo
+MSG_ADICIONAR_BOT = 'ADICIONAR_BOT' # Anfitrião ocupa um assento vazio com um bot
+MSG_RECONECTAR = 'RECONECTAR' # Cliente que caiu pede o assento de volta com o token de sessão
+MSG_REVANCHE = 'REVANCHE' # Anfitrião, depois do fim da partida, volta à sala de espera com os mesmos jogadores
+MSG_REDIRECIONAR = 'REDIRECIONAR' # A sala fica em outro nó do servidor: o cliente repete o pedido no endereço indicado
+MSG_ASSISTIR_SALA = 'ASSISTIR_SALA' # Espectador pede a transmissão de uma sala (com um atraso opcional)
+MSG_VISAO = 'VISAO' # Visão pública de uma sala enviada aos espectadores (EstadoJogo.visao_publica)
+MSG_CONFIRMAR = 'CONFIRMAR' # Ação (seq) processada sem mudar o estado: o cliente desfaz a previsão dela
+
+# --- OPÇÕES DE REGRA DA SALA ---
+# comprar_ate_jogavel: ao comprar, continua comprando até sair uma carta jogável
+# passe_automatico: quando o jogador da vez não tem jogada, o servidor compra (e joga, se
+#                   possível) por ele no mesmo passo, sem esperar um clique
+OPCOES_PADRAO = {'comprar_ate_jogavel': False, 'passe_automatico': False}
+
+# --- ENQUADRAMENTO DAS MENSAGENS (FRAMING) ---
+# O TCP é um fluxo de bytes: um único recv pode trazer meia mensagem ou várias de uma vez.
+# Por isso cada mensagem é enviada como [tamanho (4 bytes, big-endian)] + [pickle do objeto].
+CABECALHO = struct.Struct('>I')
+# Maior mensagem aceita. O tamanho vem do outro lado da conexão: sem limite, um único cabeçalho
+# b'\xff\xff\xff\xff' faria o receptor reservar 4 GB. A maior mensagem legítima (lista de salas
+# de todos os nós, ou o snapshot da reconexão) fica bem abaixo disso
+TAMANHO_MAXIMO_MENSAGEM = 16 * 1024 * 1024
+TAMANHO_LEITURA = 65536 # Máximo de bytes pedidos a cada recv (a memória cresce só com o que chega)
+
+def empacotar(obj):
+    """Serializa um objeto e prefixa o tamanho, pronto para ser enviado pelo socket."""
+    dados = pickle.dumps(obj)
+    return CABECALHO.pack(len(dados)) + dados
+
+def enviar_mensagem(sock, obj):
+    """Envia um objeto completo pelo socket (bloqueante)."""
+    sock.sendall(empacotar(obj))
+
+def receber_mensagem(sock):
+    """
+    Lê exatamente uma mensagem do socket (bloqueante).
+    Retorna None se a conexão foi fechada pelo outro lado.
+    """
+    dados = receber_quadro(sock)
+    if dados is None:
+        return None
+    return pickle.loads(dados)
+
+def receber_quadro(sock):
+    """
+    Lê os bytes (ainda serializados) de uma mensagem, ou None se a conexão fechou ou o tamanho
+    anunciado passa de TAMANHO_MAXIMO_MENSAGEM (quem chama encerra a conexão nos dois casos).
+    """
+    cabecalho = _receber_exato(sock, CABECALHO.size)
+    if cabecalho is None:
+        return None
+    (tamanho,) = CABECALHO.unpack(cabecalho)
+    if tamanho > TAMANHO_MAXIMO_MENSAGEM:
+        return None
+    return _receber_exato(sock, tamanho)
+
+def _receber_exato(sock, n):
+    """Lê exatamente n bytes do socket, ou retorna None se a conexão fechar no meio."""
+    partes = []
+    while n > 0:
+        pacote = sock.recv(min(n, TAMANHO_LEITURA)) # recv(n) reservaria os n bytes de uma vez
+        if not pacote:
+            return None
+        partes.append(pacote)
+        n -= len(pacote)
+    return b''.join(partes)
+
+class BufferMensagens:
+    """
+    Acumula bytes recebidos de um socket não-bloqueante e separa as mensagens completas.
+    Trata tanto mensagens parciais (ficam guardadas até chegar o resto) quanto
+    várias mensagens num mesmo recv.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def alimentar(self, dados):
+        """
+        Adiciona bytes recebidos e retorna a lista de mensagens (bytes) já completas.
+        Levanta ValueError se uma mensagem anuncia mais que TAMANHO_MAXIMO_MENSAGEM (feche a conexão).
+        """
+        self.buffer += dados
+        mensagens = []
+        inicio = 0
+        while len(self.buffer) - inicio >= CABECALHO.size:
+            (tamanho,) = CABECALHO.unpack_from(self.buffer, inicio)
+            if tamanho > TAMANHO_MAXIMO_MENSAGEM:
+                raise ValueError(f"mensagem de {tamanho} bytes (máximo {TAMANHO_MAXIMO_MENSAGEM})")
+            fim = inicio + CABECALHO.size + tamanho
+            if fim > len(self.buffer):
+                break # Mensagem ainda incompleta, espera o próximo recv
+            mensagens.append(bytes(self.buffer[inicio + CABECALHO.size:fim]))
+            inicio = fim
+        if inicio:
+            del self.buffer[:inicio]
+        return mensagens
 
 class Carta:
     """
@@ -40,13 +139,50 @@ class Carta:
         # Método mágico para representação em string (útil para debug)
         return f"{self.valor} {self.cor}"
 
+def _criar_cartas():
+    """Gera todas as cartas do baralho padrão do UNO."""
+    baralho = []
+    for cor in CORES:
+        for valor in VALORES:
+            baralho.append(Carta(cor, valor))
+            if valor != '0': # No UNO, existe apenas um '0' por cor, mas duas de cada outra
+                baralho.append(Carta(cor, valor))
+    
+    # Adiciona as cartas pretas (Coringas e +4)
+    for _ in range(4):
+        baralho.append(Carta('PRETO', 'CORINGA'))
+        baralho.append(Carta('PRETO', '+4'))
+    return baralho
+
+# As 108 cartas, criadas uma única vez: os baralhos de todas as salas (e das revanches) são listas
+# de referências a estes objetos, que nunca são alterados. Cada cópia (pickle) tem as suas.
+BARALHO_PADRAO = tuple(_criar_cartas())
+# Carta -> código de 1 byte (posição em BARALHO_PADRAO) para o formato compacto (EstadoJogo.compactar).
+# A busca é pela própria carta (identidade): as do servidor são sempre as de BARALHO_PADRAO. Cartas
+# copiadas (estado vindo de um pickle) são procuradas pela cor e valor, já que iguais são intercambiáveis.
+CODIGO_CARTA = {carta: i for i, carta in enumerate(BARALHO_PADRAO)}
+CODIGO_COR_VALOR = {(carta.cor, carta.valor): i for i, carta in enumerate(BARALHO_PADRAO)}
+
+def _codificar_cartas(cartas):
+    try:
+        return bytes(map(CODIGO_CARTA.__getitem__, cartas))
+    except KeyError:
+        return bytes([CODIGO_COR_VALOR[carta.cor, carta.valor] for carta in cartas])
+
+def _decodificar_cartas(codigos):
+    return list(map(BARALHO_PADRAO.__getitem__, codigos))
+
 class EstadoJogo:
     """
     Classe principal que armazena todo o estado do jogo num determinado momento.
     O servidor mantém uma instância desta classe e envia cópias dela para os clientes.
+    A 'semente' define todos os embaralhamentos da partida: a mesma semente com a mesma
+    sequência de eventos (ver aplicar_evento e reproduzir) gera exatamente o mesmo jogo.
     """
-    def __init__(self):
-        self.baralho = self.criar_baralho() # Lista de cartas disponíveis para compra
+    def __init__(self, semente=None):
+        # Sem semente explícita, sorteia uma (e guarda, para a partida poder ser reproduzida)
+        self.semente = semente if semente is not None else random.getrandbits(64)
+        self.baralho = [] # Lista de cartas disponíveis para compra (montada no início da partida)
         self.descarte = [] # Pilha de cartas jogadas na mesa
         self.maos = {} # Dicionário mapeando ID do jogador -> Lista de Cartas
         self.jogador_atual = 0 # Índice do jogador que deve jogar agora
@@ -57,32 +193,109 @@ class EstadoJogo:
         self.cor_atual = None # Cor ativa na mesa (importante para coringas)
         self.uno_safe = [] # Lista de IDs de jogadores que gritaram UNO e estão seguros
         self.host_id = None # ID do anfitrião da sala
-        
-        # Inicialização do jogo: embaralha e vira a primeira carta
+        self.versao = 0 # Incrementada pelo servidor a cada estado publicado
+        self.acoes_confirmadas = {} # ID do jogador -> número (seq) da última ação processada pelo servidor
+        self.opcoes = dict(OPCOES_PADRAO) # Opções de regra escolhidas pelo anfitrião
+        self.turnos = 0 # Quantas vezes a vez já passou (identifica o turno atual)
+        self.turno_inicial = 0 # Valor de 'turnos' no início da partida atual (revanches continuam a contagem)
+        self.embaralhamentos = 0 # Quantas vezes o baralho foi embaralhado (estatística)
+        self.reciclagens = 0 # Quantas vezes o descarte voltou a ser baralho (estatística)
+        self.compradas = {} # ID do jogador -> cartas compradas depois do início da partida (estatística)
+        self.eventos = 0 # Quantos eventos da sala já foram aplicados (posição no registro do servidor)
+        self.tempo_turno = None # Segundos para cada jogada (None = sem limite), definido pelo servidor
+        # Índice de jogabilidade: ID do jogador -> {cor ou valor: quantidade de cartas na mão}
+        # Mantido incrementalmente a cada compra/jogada para responder "pode jogar?" em O(1)
+        self.contagem_maos = {}
+        # Baralho, mãos e primeira carta só são montados no início da partida (preparar_mesa):
+        # uma sala que nunca começa não embaralha nem distribui nada
+
+    def preparar_mesa(self):
+        """Monta e embaralha o baralho, distribui 7 cartas a cada jogador e vira a primeira carta."""
+        self.baralho[:] = BARALHO_PADRAO # Reaproveita a lista (revanche); as cartas são as compartilhadas
+        self.descarte.clear()
         self.embaralhar()
+        for id_jogador in self.jogadores_conectados:
+            for _ in range(7):
+                self.comprar_carta(id_jogador)
         topo = self.baralho.pop()
         self.descarte.append(topo)
         # Se a primeira carta for preta, define vermelho como padrão, senão usa a cor da carta
         self.cor_atual = topo.cor if topo.cor != 'PRETO' else 'VERMELHO'
 
-    def criar_baralho(self):
-        """Gera todas as cartas do baralho padrão do UNO."""
-        baralho = []
-        for cor in CORES:
-            for valor in VALORES:
-                baralho.append(Carta(cor, valor))
-                if valor != '0': # No UNO, existe apenas um '0' por cor, mas duas de cada outra
-                    baralho.append(Carta(cor, valor))
-        
-        # Adiciona as cartas pretas (Coringas e +4)
-        for _ in range(4):
-            baralho.append(Carta('PRETO', 'CORINGA'))
-            baralho.append(Carta('PRETO', '+4'))
-        return baralho
+    def adicionar_jogador(self, id_jogador):
+        """Senta um novo jogador na mesa com a mão vazia."""
+        self.jogadores_conectados.append(id_jogador)
+        self.maos[id_jogador] = []
+        self.contagem_maos[id_jogador] = {}
+
+    def entrar(self, id_jogador):
+        """Senta um jogador que acabou de entrar na sala (as cartas vêm no início da partida)."""
+        self.adicionar_jogador(id_jogador)
+        # O primeiro a entrar é o anfitrião (Host)
+        if self.host_id is None:
+            self.host_id = id_jogador
+        return True
+
+    def remover_jogador(self, id_jogador):
+        """
+        Remove um jogador (e a sua mão) da mesa.
+        Retorna True se o jogador estava sentado.
+        """
+        if id_jogador not in self.jogadores_conectados:
+            return False
+        idx = self.jogadores_conectados.index(id_jogador)
+        self.jogadores_conectados.remove(id_jogador)
+        self.maos.pop(id_jogador, None)
+        self.contagem_maos.pop(id_jogador, None)
+        self.acoes_confirmadas.pop(id_jogador, None)
+        if id_jogador in self.uno_safe:
+            self.uno_safe.remove(id_jogador)
+
+        # Mantém o turno apontando para o mesmo jogador (ou para o seguinte, se foi o da vez que saiu)
+        if idx < self.jogador_atual:
+            self.jogador_atual -= 1
+        elif idx == self.jogador_atual:
+            self.turnos += 1 # A vez passou para outro jogador
+        if self.jogadores_conectados:
+            self.jogador_atual %= len(self.jogadores_conectados)
+        else:
+            self.jogador_atual = 0
+
+        # Se o anfitrião saiu, passa a liderança para o próximo
+        if self.host_id == id_jogador and self.jogadores_conectados:
+            self.host_id = self.jogadores_conectados[0]
+        return True
+
+    def _indexar(self, id_jogador, carta, delta):
+        """Atualiza o índice de jogabilidade quando uma carta entra (+1) ou sai (-1) da mão."""
+        contagem = self.contagem_maos[id_jogador]
+        contagem[carta.cor] = contagem.get(carta.cor, 0) + delta
+        contagem[carta.valor] = contagem.get(carta.valor, 0) + delta
+
+    def pode_jogar(self, carta):
+        """Verifica em O(1) se a carta pode ser jogada sobre o topo atual do descarte."""
+        # 1. Mesma cor (da carta ou da cor ativa na mesa)
+        # 2. Mesmo valor/símbolo (ex: 7 no 7, Pular no Pular)
+        # 3. Carta do jogador é preta (Coringa/+4) - sempre pode jogar
+        return (carta.cor == 'PRETO' or carta.cor == self.cor_atual
+                or carta.valor == self.descarte[-1].valor)
+
+    def tem_jogada(self, id_jogador):
+        """Verifica em O(1) se o jogador tem alguma carta jogável na mão."""
+        contagem = self.contagem_maos.get(id_jogador)
+        if not contagem:
+            return False
+        return (contagem.get('PRETO', 0) > 0 or contagem.get(self.cor_atual, 0) > 0
+                or contagem.get(self.descarte[-1].valor, 0) > 0)
 
     def embaralhar(self):
-        """Mistura as cartas do baralho."""
-        random.shuffle(self.baralho)
+        """
+        Mistura as cartas do baralho com um gerador derivado de (semente, nº do embaralhamento).
+        Não usa o 'random' global (compartilhado por todas as salas e threads) e não guarda um
+        random.Random no estado, que deixaria cada broadcast ~2,5 KB maior.
+        """
+        random.Random(f'{self.semente}:{self.embaralhamentos}').shuffle(self.baralho)
+        self.embaralhamentos += 1
 
     def comprar_carta(self, id_jogador):
         """
@@ -90,14 +303,21 @@ class EstadoJogo:
         Se o baralho acabar, recicla as cartas do descarte.
         """
         if not self.baralho:
+            if not self.descarte:
+                return False # Mesa ainda não montada (ou sem nenhuma carta): nada para comprar
             # Se o baralho acabou, pega o descarte (menos a carta do topo), embaralha e usa como novo baralho
             self.baralho = self.descarte[:-1]
             self.descarte = [self.descarte[-1]]
-            random.shuffle(self.baralho)
+            if self.baralho:
+                self.reciclagens += 1
+                self.embaralhar()
         
         if self.baralho:
             carta = self.baralho.pop()
             self.maos[id_jogador].append(carta)
+            self._indexar(id_jogador, carta, 1)
+            if self.jogo_iniciado: # A distribuição inicial não conta
+                self.compradas[id_jogador] = self.compradas.get(id_jogador, 0) + 1
             
             # Se comprou e ficou com mais de 1 carta, perde o status de UNO (se tivesse)
             # Isso evita que alguém grite UNO, compre carta e continue "safe" com 2 cartas
@@ -117,16 +337,8 @@ class EstadoJogo:
         # Verifica se o índice é válido
         if 0 <= indice_carta < len(mao):
             carta = mao[indice_carta]
-            topo = self.descarte[-1] # A carta que está atualmente no topo da mesa
-
-            # --- REGRAS DE VALIDAÇÃO ---
-            # 1. Mesma cor (da carta ou da cor ativa na mesa)
-            # 2. Mesmo valor/símbolo (ex: 7 no 7, Pular no Pular)
-            # 3. Carta do jogador é preta (Coringa/+4) - sempre pode jogar
-            match_cor = carta.cor == self.cor_atual or carta.cor == 'PRETO'
-            match_valor = carta.valor == topo.valor
-            
-            if match_cor or match_valor:
+            # --- REGRAS DE VALIDAÇÃO --- (ver pode_jogar)
+            if self.pode_jogar(carta):
                 # Se for carta preta, PRECISA ter escolhido uma cor
                 if carta.cor == 'PRETO':
                     if not cor_escolhida or cor_escolhida not in CORES:
@@ -137,6 +349,7 @@ class EstadoJogo:
 
                 # Remove da mão e coloca no descarte
                 self.descarte.append(mao.pop(indice_carta))
+                self._indexar(id_jogador, carta, -1)
                 
                 # VERIFICA VITORIA
                 if len(mao) == 0:
@@ -199,3 +412,216 @@ class EstadoJogo:
         passo = 1 if self.sentido_horario else -1
         # Aritmética modular para garantir que o índice dê a volta (ex: jogador 3 -> jogador 0)
         self.jogador_atual = (self.jogador_atual + passo) % total
+        self.turnos += 1
+
+    # --- EVENTOS DA SALA ---
+    def configurar(self, opcoes):
+        """Altera as opções de regra (só aceita opções conhecidas, com valores booleanos)."""
+        for chave, valor in opcoes.items():
+            if chave in self.opcoes:
+                self.opcoes[chave] = bool(valor)
+        return True
+
+    def iniciar(self):
+        """Começa a partida, se ainda não começou e houver pelo menos 2 jogadores."""
+        if self.jogo_iniciado or len(self.jogadores_conectados) < 2:
+            return False
+        self.preparar_mesa() # Antes de jogo_iniciado: a distribuição não conta como compra
+        self.jogo_iniciado = True
+        self.turno_inicial = self.turnos
+        self.resolver_passes_automaticos() # O primeiro da vez pode não ter jogada
+        return True
+
+    def revanche(self):
+        """
+        Depois do fim da partida, volta à sala de espera com os mesmos jogadores e opções,
+        reaproveitando as listas e dicionários do estado. 'turnos' e 'embaralhamentos' continuam
+        de onde pararam: os prazos de turno e os replays contam com turnos sempre crescentes, e o
+        próximo embaralhamento (ainda derivado da semente) é outro.
+        """
+        if self.vencedor is None:
+            return False
+        self.baralho.clear()
+        self.descarte.clear()
+        for mao in self.maos.values():
+            mao.clear()
+        for contagem in self.contagem_maos.values():
+            contagem.clear()
+        self.uno_safe.clear()
+        self.compradas.clear()
+        self.jogador_atual = 0
+        self.sentido_horario = True
+        self.cor_atual = None
+        self.vencedor = None
+        self.jogo_iniciado = False
+        self.turnos += 1 # A vez "passa": prazos e jogadas de bot agendados na partida anterior ficam obsoletos
+        return True
+
+    def compactar(self):
+        """
+        Atributos do estado num dicionário, com cada pilha de cartas (baralho, descarte e mãos)
+        trocada por bytes (um código por carta): o pickle disso é bem menor e mais rápido que o
+        dos objetos Carta. Usado para salvar as salas em disco (Servidor.salvar_salas).
+        Os demais valores são os do próprio estado: serialize o resultado na hora.
+        """
+        dados = dict(vars(self))
+        dados['baralho'] = _codificar_cartas(self.baralho)
+        dados['descarte'] = _codificar_cartas(self.descarte)
+        dados['maos'] = {id_jogador: _codificar_cartas(mao) for id_jogador, mao in self.maos.items()}
+        return dados
+
+    @classmethod
+    def descompactar(cls, dados):
+        """Reconstrói o estado a partir de compactar() (as cartas voltam a ser as de BARALHO_PADRAO)."""
+        estado = cls.__new__(cls)
+        estado.__dict__.update(dados)
+        estado.baralho = _decodificar_cartas(dados['baralho'])
+        estado.descarte = _decodificar_cartas(dados['descarte'])
+        estado.maos = {id_jogador: _decodificar_cartas(mao) for id_jogador, mao in dados['maos'].items()}
+        return estado
+
+    def visao_publica(self):
+        """
+        O que um espectador vê (MSG_VISAO): quantas cartas cada jogador tem, o topo do descarte,
+        de quem é a vez, a cor e o sentido. Nenhuma mão nem o baralho.
+        """
+        return {
+            'tipo': MSG_VISAO,
+            'versao': self.versao,
+            'jogadores': [(id_jogador, len(self.maos.get(id_jogador, ()))) for id_jogador in self.jogadores_conectados],
+            'topo': self.descarte[-1] if self.descarte else None,
+            'cor_atual': self.cor_atual,
+            'jogador_atual': self.jogador_atual,
+            'sentido_horario': self.sentido_horario,
+            'uno_safe': list(self.uno_safe),
+            'jogo_iniciado': self.jogo_iniciado,
+            'vencedor': self.vencedor,
+            'turnos': self.turnos - self.turno_inicial,
+        }
+
+    def aplicar_evento(self, id_jogador, evento):
+        """
+        Aplica qualquer evento que altera a sala: entrada e saída de jogadores, configuração,
+        início da partida, revanche ou uma ação de jogo. É o que o servidor guarda no registro da sala.
+        Retorna True se o estado mudou.
+        """
+        tipo = evento['tipo']
+        if tipo == MSG_ENTRAR_SALA:
+            alterou = self.entrar(id_jogador)
+        elif tipo == MSG_SAIR_SALA:
+            alterou = self.remover_jogador(id_jogador)
+        elif tipo == MSG_CONFIGURAR_SALA:
+            alterou = self.configurar(evento.get('opcoes', {}))
+        elif tipo == MSG_INICIAR_JOGO:
+            alterou = self.iniciar()
+        elif tipo == MSG_REVANCHE:
+            alterou = self.revanche()
+        else:
+            alterou = self.aplicar_acao(id_jogador, evento)
+        if alterou:
+            self.eventos += 1
+        return alterou
+
+    # --- AÇÕES DOS JOGADORES ---
+    def aplicar_acao(self, id_jogador, acao):
+        """
+        Ponto de entrada único para as ações de jogo (JOGAR, COMPRAR, GRITAR_UNO).
+        Usado pelo servidor e pela previsão do cliente, para que ambos sigam as mesmas regras.
+        Retorna True se o estado mudou (e precisa ser reenviado).
+        """
+        if not self.jogo_iniciado or self.vencedor is not None:
+            return False
+        alterou = False
+        tipo = acao['tipo']
+
+        # Ações do Jogador da Vez (Jogar ou Comprar)
+        if self.jogadores_conectados[self.jogador_atual] == id_jogador:
+            if tipo == 'JOGAR':
+                # Tenta jogar a carta (validação feita dentro de jogar_carta)
+                alterou = self.jogar_carta(id_jogador, acao['indice'], acao.get('cor_escolhida'))
+            elif tipo == 'COMPRAR':
+                alterou = self.comprar_vez(id_jogador, acao.get('jogar', False), acao.get('cor_escolhida'))
+
+        # Ações Globais (Qualquer um pode fazer a qualquer momento)
+        if tipo == MSG_GRITAR_UNO:
+            alterou = self.gritar_uno(id_jogador)
+
+        if alterou:
+            self.resolver_passes_automaticos()
+        return alterou
+
+    def comprar_vez(self, id_jogador, jogar=False, cor_escolhida=None):
+        """
+        Compra do jogador da vez, resolvida num único passo:
+        compra 1 carta (ou até sair uma jogável, se a sala usa 'comprar_ate_jogavel'),
+        joga a carta comprada se 'jogar' for True e ela for válida, senão passa a vez.
+        """
+        comprou = self.comprar_carta(id_jogador)
+        if self.opcoes['comprar_ate_jogavel']:
+            while comprou and not self.tem_jogada(id_jogador):
+                comprou = self.comprar_carta(id_jogador)
+
+        mao = self.maos[id_jogador]
+        if jogar and comprou and self.pode_jogar(mao[-1]):
+            cor = None
+            if mao[-1].cor == 'PRETO':
+                cor = cor_escolhida if cor_escolhida in CORES else self.cor_preferida(id_jogador)
+            if self.jogar_carta(id_jogador, len(mao) - 1, cor):
+                return True
+
+        self.avancar_turno() # Passa a vez após comprar
+        return True
+
+    def cor_preferida(self, id_jogador):
+        """Cor mais frequente na mão do jogador (usada para escolher a cor de coringas automáticos)."""
+        contagem = self.contagem_maos[id_jogador]
+        return max(CORES, key=lambda cor: contagem.get(cor, 0))
+
+    def gritar_uno(self, id_jogador):
+        """
+        GRITAR_UNO: protege quem grita (se tiver 1 carta) e pune quem esqueceu de gritar.
+        Retorna True se algo mudou.
+        """
+        alterou = False
+        # Caso 1: O próprio jogador grita UNO (para se proteger)
+        if len(self.maos[id_jogador]) == 1:
+            if id_jogador not in self.uno_safe:
+                self.uno_safe.append(id_jogador)
+                alterou = True
+
+        # Caso 2: Alguém grita UNO para denunciar outro (Counter-UNO)
+        for pid in self.jogadores_conectados:
+            if pid != id_jogador:
+                # Se alguém tem 1 carta e NÃO está safe (esqueceu de gritar)
+                if len(self.maos[pid]) == 1 and pid not in self.uno_safe:
+                    # Penalidade: Compra 2 cartas
+                    self.comprar_carta(pid)
+                    self.comprar_carta(pid)
+                    alterou = True
+        return alterou
+
+    def resolver_passes_automaticos(self):
+        """
+        Com 'passe_automatico' ligado, resolve em sequência os turnos de quem não tem
+        nenhuma carta jogável (compra e joga/passa por eles), até chegar em alguém que precise decidir.
+        """
+        if not self.opcoes['passe_automatico'] or not self.jogo_iniciado:
+            return
+        # Limite de segurança: cada volta compra uma carta, então o laço sempre termina
+        for _ in range(4 * len(self.jogadores_conectados)):
+            if self.vencedor is not None:
+                return
+            id_vez = self.jogadores_conectados[self.jogador_atual]
+            if self.tem_jogada(id_vez):
+                return
+            self.comprar_vez(id_vez, jogar=True)
+
+def reproduzir(semente, registro):
+    """
+    Reconstrói uma partida a partir da semente e do registro de eventos da sala
+    (lista de (ID do jogador, evento)), na ordem em que o servidor os aplicou.
+    """
+    estado = EstadoJogo(semente)
+    for id_jogador, evento in registro:
+        estado.aplicar_evento(id_jogador, evento)
+    return estado
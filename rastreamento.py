@@ -0,0 +1,216 @@
+"""
+ARQUIVO: rastreamento.py
+FUNÇÃO: Rastreamento por amostragem (spans) e perfil sob demanda do servidor.
+DESCRIÇÃO: Cada unidade de trabalho do servidor (uma mensagem de cliente, uma jogada de bot, um
+prazo de turno) é uma "requisição"; dentro dela, spans marcam as fases (desserializar, aplicar o
+evento, serializar e enviar o broadcast...) com a sala e o jogador. A decisão de amostragem é
+tomada uma vez por requisição e vale para todos os spans dela (na mesma thread). Os spans vão para
+um buffer circular em memória e são exportados no formato JSON de trace do Chrome
+(chrome://tracing ou https://ui.perfetto.dev).
+Desligado, cada requisição/span custa uma chamada que devolve um context manager vazio.
+O perfil (cProfile) liga um profiler em cada thread que tratar requisições durante a janela
+pedida e junta todos no final (o cProfile só enxerga a thread em que foi ligado).
+
+USO (pelas rotas HTTP do servidor de métricas):
+    curl '127.0.0.1:9100/rastreamento/iniciar?amostragem=0.1'
+    curl  127.0.0.1:9100/rastreamento > trace.json
+    curl  127.0.0.1:9100/rastreamento/parar
+    curl '127.0.0.1:9100/perfil?segundos=10&ordem=tottime'
+"""
+
+import collections # Buffer circular dos spans
+import cProfile    # Perfil sob demanda
+import io          # Texto do relatório do pstats
+import json        # Formato de trace do Chrome
+import os          # PID no trace
+import pstats      # Junção dos perfis das threads
+import random      # Amostragem
+import threading   # Estado por thread (amostragem, profiler)
+import time        # Relógio dos spans
+
+LIMITE_SPANS = 200000 # Spans guardados (os mais antigos são descartados)
+ESPERA_PERFIS = 1.0   # Segundos esperando as requisições em andamento no fim da janela de perfil
+MAX_SEGUNDOS_PERFIL = 120
+
+class _Nulo:
+    """Context manager que não faz nada (rastreamento desligado ou requisição não amostrada)."""
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *erro):
+        return False
+
+NULO = _Nulo()
+
+class Span:
+    __slots__ = ('rastreador', 'nome', 'tags', 'inicio')
+
+    def __init__(self, rastreador, nome, tags):
+        self.rastreador = rastreador
+        self.nome = nome
+        self.tags = tags
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        self.rastreador._gravar(self.nome, self.inicio, time.perf_counter(), self.tags)
+        return False
+
+class Requisicao:
+    """Span raiz: sorteia a amostragem da thread e liga o profiler dela durante uma janela de perfil."""
+    __slots__ = ('rastreador', 'nome', 'tags', 'inicio', 'amostrada', 'perfil')
+
+    def __init__(self, rastreador, nome, tags):
+        self.rastreador = rastreador
+        self.nome = nome
+        self.tags = tags
+
+    def __enter__(self):
+        r = self.rastreador
+        self.amostrada = r.ativo and random.random() < r.amostragem
+        r.local.amostrando = self.amostrada
+        self.perfil = r._ligar_perfil() if r.perfilando else None
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        r = self.rastreador
+        if self.amostrada:
+            r._gravar(self.nome, self.inicio, time.perf_counter(), self.tags)
+        r.local.amostrando = False
+        if self.perfil is not None:
+            r._desligar_perfil(self.perfil)
+        return False
+
+class Rastreador:
+    def __init__(self, limite=LIMITE_SPANS):
+        self.ativo = False
+        self.amostragem = 1.0
+        self.spans = collections.deque(maxlen=limite) # append/popleft são seguros entre threads
+        self.nomes_threads = {}
+        self.origem = time.perf_counter()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # Perfil: uma "geração" por janela; cada thread cria o seu profiler na primeira requisição dela
+        self.perfilando = False
+        self.geracao = 0
+        self.perfis = []
+        self.em_uso = 0 # Profilers ligados agora (requisições em andamento)
+
+    # --- CONTROLE ---
+    def iniciar(self, amostragem=1.0):
+        """Liga o rastreamento (descarta os spans anteriores). amostragem: fração das requisições."""
+        self.spans.clear()
+        self.amostragem = max(0.0, min(1.0, amostragem))
+        self.ativo = True
+
+    def parar(self):
+        self.ativo = False
+
+    # --- CAMINHO QUENTE ---
+    def requisicao(self, nome, **tags):
+        """with rastreador.requisicao('mensagem', sala=...): ... envolve uma unidade de trabalho."""
+        if not self.ativo and not self.perfilando:
+            return NULO
+        return Requisicao(self, nome, tags)
+
+    def span(self, nome, **tags):
+        """with rastreador.span('fase', ...): ... dentro de uma requisição (só grava se ela foi amostrada)."""
+        if not self.ativo or not getattr(self.local, 'amostrando', False):
+            return NULO
+        return Span(self, nome, tags)
+
+    def _gravar(self, nome, inicio, fim, tags):
+        tid = threading.get_ident()
+        if tid not in self.nomes_threads:
+            self.nomes_threads[tid] = threading.current_thread().name
+        self.spans.append((nome, inicio, fim - inicio, tid, tags))
+
+    # --- EXPORTAÇÃO ---
+    def exportar_chrome(self):
+        """Spans no formato de trace do Chrome (eventos 'X' com tempos em microssegundos)."""
+        pid = os.getpid()
+        eventos = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': nome}}
+                   for tid, nome in list(self.nomes_threads.items())]
+        for nome, inicio, duracao, tid, tags in list(self.spans):
+            eventos.append({'name': nome, 'cat': 'uno', 'ph': 'X', 'pid': pid, 'tid': tid,
+                            'ts': round((inicio - self.origem) * 1e6, 3), 'dur': round(duracao * 1e6, 3),
+                            'args': tags})
+        # IDs de jogador (tuplas) viram listas; outros objetos viram texto
+        return json.dumps({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, default=str)
+
+    # --- PERFIL ---
+    def _ligar_perfil(self):
+        local = self.local
+        with self.lock:
+            if not self.perfilando:
+                return None
+            if getattr(local, 'geracao', None) != self.geracao:
+                local.geracao = self.geracao
+                local.perfil = cProfile.Profile()
+                self.perfis.append(local.perfil)
+            self.em_uso += 1
+        try:
+            local.perfil.enable()
+        except ValueError: # Outro profiler já ligado nesta thread
+            with self.lock:
+                self.em_uso -= 1
+            return None
+        return local.perfil
+
+    def _desligar_perfil(self, perfil):
+        perfil.disable()
+        with self.lock:
+            self.em_uso -= 1
+
+    def perfilar(self, segundos, ordem='cumulative', linhas=40):
+        """Perfila todas as requisições tratadas nos próximos 'segundos' e devolve o relatório do pstats."""
+        segundos = max(0.1, min(float(segundos), MAX_SEGUNDOS_PERFIL))
+        with self.lock:
+            if self.perfilando:
+                raise RuntimeError("Já há um perfil em andamento")
+            self.geracao += 1
+            self.perfis = []
+            self.perfilando = True
+        time.sleep(segundos)
+        with self.lock:
+            self.perfilando = False
+        # Requisições que começaram dentro da janela ainda podem estar com o profiler ligado
+        prazo = time.monotonic() + ESPERA_PERFIS
+        while self.em_uso and time.monotonic() < prazo:
+            time.sleep(0.01)
+        with self.lock:
+            perfis = self.perfis
+            self.perfis = []
+
+        saida = io.StringIO()
+        print(f"Perfil de {segundos:.1f}s, {len(perfis)} thread(s) com requisições", file=saida)
+        if perfis:
+            estatisticas = pstats.Stats(perfis[0], stream=saida)
+            for perfil in perfis[1:]:
+                estatisticas.add(perfil)
+            estatisticas.sort_stats(ordem).print_stats(int(linhas))
+        return saida.getvalue()
+
+    def rotas_http(self):
+        """Rotas para iniciar_servidor_http (metricas.py)."""
+        def iniciar(parametros):
+            self.iniciar(float(parametros.get('amostragem', 1.0)))
+            return 'text/plain', f"rastreamento ligado (amostragem {self.amostragem})\n".encode()
+
+        def parar(_):
+            self.parar()
+            return 'text/plain', f"rastreamento desligado ({len(self.spans)} spans no buffer)\n".encode()
+
+        def exportar(_):
+            return 'application/json', self.exportar_chrome().encode()
+
+        def perfil(parametros):
+            relatorio = self.perfilar(parametros.get('segundos', 5), parametros.get('ordem', 'cumulative'),
+                                      parametros.get('linhas', 40))
+            return 'text/plain; charset=utf-8', relatorio.encode()
+
+        return {'/rastreamento/iniciar': iniciar, '/rastreamento/parar': parar,
+                '/rastreamento': exportar, '/perfil': perfil}
@@ -0,0 +1,221 @@
+"""
+ARQUIVO: replay.py
+FUNÇÃO: Gravar as partidas em um formato binário compacto e reabri-las em qualquer ponto.
+DESCRIÇÃO: Um replay é composto por três arquivos, todos só de acréscimo (append-only):
+    <base>.acoes  cabeçalho (semente, intervalo de snapshots) + um registro de 8 bytes por evento
+    <base>.snap   snapshots completos do EstadoJogo (pickle com prefixo de tamanho)
+    <base>.idx    índice de 16 bytes por snapshot: (nº de eventos já aplicados, turno, offset no .snap)
+Os IDs dos jogadores não cabem em 8 bytes; cada registro guarda só o número do jogador numa tabela
+que acompanha todos os snapshots (e um snapshot é gravado a cada entrada de jogador).
+A leitura usa mmap: para chegar a um evento ou turno, faz busca binária no índice, carrega o
+snapshot anterior mais próximo e aplica no máximo K eventos, sem reproduzir desde o início.
+
+USO:
+    python3 replay.py replays/20260101-120000-minha_sala-1a2b3c4d5e6f7081 --turno 40
+    python3 replay.py replays/20260101-120000-minha_sala-1a2b3c4d5e6f7081 --eventos
+"""
+
+import argparse # Linha de comando do visualizador
+import bisect   # Busca binária no índice de snapshots
+import mmap     # Leitura dos arquivos sem copiá-los para a memória
+import pickle   # Serialização dos snapshots
+import struct   # Registros binários de tamanho fixo
+
+from protocolo import (CORES, OPCOES_PADRAO, CABECALHO, MSG_ENTRAR_SALA, MSG_SAIR_SALA,
+                       MSG_CONFIGURAR_SALA, MSG_INICIAR_JOGO, MSG_GRITAR_UNO, MSG_REVANCHE)
+
+MAGICO = b'UNOR'
+VERSAO_FORMATO = 3 # 2: cartas distribuídas no início da partida (e não na entrada); revanche. 3: jogador em 2 bytes
+INTERVALO_SNAPSHOT = 64 # K: um snapshot a cada K eventos
+
+CABECALHO_REPLAY = struct.Struct('>4sHHQ') # mágico, versão do formato, K, semente
+# tipo, jogador, índice da carta, cor, flags (+1 byte livre). O jogador tem 2 bytes: cada reconexão ou
+# reentrada numa sala longa ganha um ID novo, e 1 byte (256 jogadores) acabava no meio da partida
+REGISTRO = struct.Struct('>BHHBBx')
+ENTRADA_INDICE = struct.Struct('>IIQ')     # eventos aplicados, turno, offset do snapshot no .snap
+
+# Tipos de evento (1 byte) <-> tipo da mensagem
+TIPOS = ['JOGAR', 'COMPRAR', MSG_GRITAR_UNO, MSG_ENTRAR_SALA, MSG_SAIR_SALA, MSG_CONFIGURAR_SALA, MSG_INICIAR_JOGO,
+         MSG_REVANCHE]
+CODIGO_TIPO = {tipo: i for i, tipo in enumerate(TIPOS)}
+ORDEM_OPCOES = list(OPCOES_PADRAO) # Bit i das flags de CONFIGURAR_SALA = opção i
+FLAG_JOGAR = 1                     # COMPRAR com 'jogar': True
+
+def codificar_evento(jogador, evento):
+    """Converte (nº do jogador, evento) para o registro binário de 8 bytes."""
+    tipo = evento['tipo']
+    indice = evento.get('indice', 0) if tipo == 'JOGAR' else 0
+    cor = evento.get('cor_escolhida')
+    cor = CORES.index(cor) + 1 if cor in CORES else 0
+    flags = 0
+    if tipo == 'COMPRAR' and evento.get('jogar'):
+        flags = FLAG_JOGAR
+    elif tipo == MSG_CONFIGURAR_SALA:
+        # Guarda o valor final de todas as opções (o estado já aplicou a configuração)
+        for bit, chave in enumerate(ORDEM_OPCOES):
+            if evento['opcoes'].get(chave):
+                flags |= 1 << bit
+    return REGISTRO.pack(CODIGO_TIPO[tipo], jogador, indice, cor, flags)
+
+def decodificar_evento(dados, offset=0):
+    """Converte um registro binário de volta para (nº do jogador, evento)."""
+    codigo, jogador, indice, cor, flags = REGISTRO.unpack_from(dados, offset)
+    tipo = TIPOS[codigo]
+    evento = {'tipo': tipo}
+    if tipo == 'JOGAR':
+        evento['indice'] = indice
+    if cor:
+        evento['cor_escolhida'] = CORES[cor - 1]
+    if tipo == 'COMPRAR':
+        evento['jogar'] = bool(flags & FLAG_JOGAR)
+    elif tipo == MSG_CONFIGURAR_SALA:
+        evento['opcoes'] = {chave: bool(flags & (1 << bit)) for bit, chave in enumerate(ORDEM_OPCOES)}
+    return jogador, evento
+
+class GravadorReplay:
+    """
+    Grava os eventos de uma sala à medida que o servidor os aplica.
+    Deve ser criado junto com o EstadoJogo (antes do primeiro evento).
+    """
+    def __init__(self, base, estado, intervalo=INTERVALO_SNAPSHOT):
+        self.base = base
+        self.intervalo = intervalo
+        self.jogadores = []   # Tabela nº -> ID do jogador
+        self.numeros = {}     # ID do jogador -> nº na tabela
+        self.eventos = 0      # Eventos gravados até agora
+        # Sem buffer: cada evento vai direto para o arquivo (um leitor pode abrir uma sala em andamento)
+        self.arq_acoes = open(base + '.acoes', 'wb', buffering=0)
+        self.arq_snap = open(base + '.snap', 'wb', buffering=0)
+        self.arq_idx = open(base + '.idx', 'wb', buffering=0)
+        self.arq_acoes.write(CABECALHO_REPLAY.pack(MAGICO, VERSAO_FORMATO, intervalo, estado.semente))
+        self.gravar_snapshot(estado)
+
+    def gravar(self, id_jogador, evento, estado):
+        """Acrescenta um evento já aplicado ao estado (e um snapshot, se for a hora)."""
+        novo = id_jogador not in self.numeros
+        if novo:
+            self.numeros[id_jogador] = len(self.jogadores)
+            self.jogadores.append(id_jogador)
+        if evento['tipo'] == MSG_CONFIGURAR_SALA:
+            evento = {'tipo': MSG_CONFIGURAR_SALA, 'opcoes': estado.opcoes}
+        self.arq_acoes.write(codificar_evento(self.numeros[id_jogador], evento))
+        self.eventos += 1
+        # Um jogador novo muda a tabela de IDs: o snapshot garante que o leitor a conheça
+        if novo or self.eventos % self.intervalo == 0:
+            self.gravar_snapshot(estado)
+
+    def gravar_snapshot(self, estado):
+        offset = self.arq_snap.tell()
+        dados = pickle.dumps((estado, self.jogadores))
+        self.arq_snap.write(CABECALHO.pack(len(dados)) + dados)
+        self.arq_idx.write(ENTRADA_INDICE.pack(self.eventos, estado.turnos, offset))
+
+    def fechar(self):
+        for arq in (self.arq_acoes, self.arq_snap, self.arq_idx):
+            arq.close()
+
+class LeitorReplay:
+    """
+    Abre um replay (mesmo de uma sala ainda em andamento) com mmap. Enxerga os eventos gravados
+    até o momento da abertura.
+    """
+    def __init__(self, base):
+        self.arquivos = [open(base + ext, 'rb') for ext in ('.acoes', '.snap', '.idx')]
+        self.acoes, self.snap, self.idx = (mmap.mmap(arq.fileno(), 0, access=mmap.ACCESS_READ)
+                                           for arq in self.arquivos)
+        magico, versao, self.intervalo, self.semente = CABECALHO_REPLAY.unpack_from(self.acoes, 0)
+        if magico != MAGICO or versao != VERSAO_FORMATO:
+            raise ValueError(f"{base}: não é um replay UNO (versão {VERSAO_FORMATO})")
+        self.num_eventos = (len(self.acoes) - CABECALHO_REPLAY.size) // REGISTRO.size
+        # Só snapshots cujos eventos já estão no .acoes (a gravação pode estar em andamento)
+        self.num_snapshots = len(self.idx) // ENTRADA_INDICE.size
+        while self.num_snapshots and self._entrada(self.num_snapshots - 1)[0] > self.num_eventos:
+            self.num_snapshots -= 1
+        # Colunas do índice para a busca binária (16 bytes por snapshot; cabe em memória mesmo em partidas longas)
+        entradas = [self._entrada(i) for i in range(self.num_snapshots)]
+        self.posicoes = [e[0] for e in entradas]
+        self.turnos = [e[1] for e in entradas]
+
+    def __len__(self):
+        return self.num_eventos
+
+    def _entrada(self, i):
+        return ENTRADA_INDICE.unpack_from(self.idx, i * ENTRADA_INDICE.size)
+
+    def evento(self, i):
+        """Evento número i, como (nº do jogador, evento)."""
+        return decodificar_evento(self.acoes, CABECALHO_REPLAY.size + i * REGISTRO.size)
+
+    def snapshot(self, i):
+        """Snapshot número i, como (eventos aplicados, EstadoJogo, tabela de jogadores)."""
+        posicao, _, offset = self._entrada(i)
+        (tamanho,) = CABECALHO.unpack_from(self.snap, offset)
+        inicio = offset + CABECALHO.size
+        estado, jogadores = pickle.loads(self.snap[inicio:inicio + tamanho])
+        return posicao, estado, jogadores
+
+    def estado_em(self, n):
+        """Estado da partida depois dos n primeiros eventos."""
+        n = max(0, min(n, self.num_eventos))
+        i = bisect.bisect_right(self.posicoes, n) - 1
+        posicao, estado, jogadores = self.snapshot(i)
+        for j in range(posicao, n):
+            jogador, evento = self.evento(j)
+            estado.aplicar_evento(jogadores[jogador], evento)
+        return estado
+
+    def estado_no_turno(self, turno):
+        """Estado no início do turno pedido (ou o último estado, se a partida não chegou lá)."""
+        i = max(0, bisect.bisect_left(self.turnos, turno) - 1)
+        posicao, estado, jogadores = self.snapshot(i)
+        while posicao < self.num_eventos and estado.turnos < turno:
+            jogador, evento = self.evento(posicao)
+            estado.aplicar_evento(jogadores[jogador], evento)
+            posicao += 1
+        return estado
+
+    def jogadores(self):
+        """Tabela completa de jogadores (a do último snapshot)."""
+        return self.snapshot(self.num_snapshots - 1)[2]
+
+    def fechar(self):
+        for m in (self.acoes, self.snap, self.idx):
+            m.close()
+        for arq in self.arquivos:
+            arq.close()
+
+def descrever(estado):
+    """Resumo em texto de um EstadoJogo (para o visualizador de linha de comando)."""
+    topo = estado.descarte[-1] if estado.descarte else '-' # Antes do início não há mesa
+    linhas = [f"Turno {estado.turnos} | topo: {topo} | cor: {estado.cor_atual} | "
+              f"baralho: {len(estado.baralho)} cartas | vencedor: {estado.vencedor}"]
+    for i, pid in enumerate(estado.jogadores_conectados):
+        vez = '>' if estado.jogo_iniciado and i == estado.jogador_atual else ' '
+        linhas.append(f" {vez} {pid}: {estado.maos[pid]}")
+    return "\n".join(linhas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Visualizador de replays do UNO.")
+    parser.add_argument('base', help="caminho do replay, sem extensão")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--turno', type=int, help="mostra a mesa no início deste turno")
+    grupo.add_argument('--evento', type=int, help="mostra a mesa depois deste número de eventos")
+    grupo.add_argument('--eventos', action='store_true', help="lista todos os eventos")
+    args = parser.parse_args()
+
+    leitor = LeitorReplay(args.base)
+    print(f"Semente {leitor.semente:#x} | {len(leitor)} eventos | {leitor.num_snapshots} snapshots | "
+          f"jogadores: {leitor.jogadores()}")
+    if args.eventos:
+        tabela = leitor.jogadores()
+        for i in range(len(leitor)):
+            jogador, evento = leitor.evento(i)
+            print(f"{i:>6}  {tabela[jogador]}  {evento}")
+    elif args.turno is not None:
+        print(descrever(leitor.estado_no_turno(args.turno)))
+    else:
+        print(descrever(leitor.estado_em(len(leitor) if args.evento is None else args.evento)))
+    leitor.fechar()
+
+if __name__ == '__main__':
+    main()
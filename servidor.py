@@ -5,261 +5,1380 @@ ARQUITETURA: Cliente-Servidor com Múltiplas Salas.
 DESCRIÇÃO: Este arquivo implementa o servidor central do jogo UNO. Ele aceita conexões TCP,
 gerencia múltiplas salas de jogo simultâneas, processa as mensagens dos clientes e mantém
 o estado oficial de cada jogo (usando a classe EstadoJogo).
+Todo o estado do servidor (salas, sessões, temporizadores, métricas) fica numa instância de
+Servidor: importar o módulo não abre porta nem arquivo nenhum, e vários servidores (ex: em porta 0, num
+benchmark ou teste de carga) podem rodar no mesmo processo.
+
+USO:
+    python3 servidor.py
+    UNO_DIRETORIO=127.0.0.1:5550 UNO_PORTA=5556 python3 servidor.py  # nó de um grupo (ver diretorio.py)
+
+    # Embutido (benchmarks, testes de carga):
+    from servidor import Servidor
+    servidor = Servidor(porta=0, endereco_metricas='', arquivo_historico='', arquivo_salas='')
+    servidor.iniciar()  # não bloqueia; a porta escolhida fica em servidor.porta
+    ...
+    servidor.parar()
 """
 
 import socket   # Biblioteca para comunicação de rede (TCP/IP)
+import os       # Leitura da semente fixa (UNO_SEMENTE) para testes de carga reproduzíveis
+import hashlib  # Derivação da semente de cada sala a partir da semente fixa
+import re       # Nome de arquivo seguro para o replay de cada sala
+import time     # Data no nome dos arquivos de replay
+import pickle   # Snapshots do estado usados na reconexão
+import sys      # Estimativa de memória das salas (coleta de salas ociosas)
+import secrets  # Tokens de sessão (reconexão)
+import gc       # Coletor de ciclos pausado ao salvar e restaurar as salas (milhares de objetos novos)
+import signal   # SIGTERM inicia a drenagem (reinício sem derrubar as partidas)
 import threading # Biblioteca para lidar com múltiplos clientes simultaneamente (Threads)
-import pickle   # Biblioteca para serialização de objetos (enviar dados complexos pela rede)
+import traceback # Pilha das exceções das tarefas agendadas, para o log
+from concurrent.futures import ThreadPoolExecutor # Executor compartilhado para tarefas agendadas
 # Importa as constantes e classes compartilhadas do protocolo
-from protocolo import EstadoJogo, MSG_CRIAR_SALA, MSG_ENTRAR_SALA, MSG_LISTAR_SALAS, MSG_INICIAR_JOGO, MSG_GRITAR_UNO, MSG_SAIR_SALA, MSG_ERRO
+from protocolo import EstadoJogo, MSG_CRIAR_SALA, MSG_ENTRAR_SALA, MSG_LISTAR_SALAS, MSG_INICIAR_JOGO, MSG_GRITAR_UNO, MSG_SAIR_SALA, MSG_ERRO, MSG_CONFIGURAR_SALA, MSG_ADICIONAR_BOT, MSG_RECONECTAR, MSG_REVANCHE, MSG_REDIRECIONAR, MSG_ASSISTIR_SALA, MSG_CONFIRMAR
+from protocolo import empacotar, receber_quadro, receber_mensagem, CABECALHO
+from temporizador import RodaTemporizacao
+from bots import PREFIXO_BOT, criar_estrategia, executar_turno_bot
+from replay import GravadorReplay
+from historico import HistoricoPartidas, resultado_partida
+from eventos import configurar_pelo_ambiente
+from metricas import Metricas, iniciar_servidor_http
+from rastreamento import Rastreador
+from limitador import LimitadorConexao, PERMITIDA, ABUSO
+from espectadores import Plateia, ATRASO_MAXIMO
+from diretorio import AnelConsistente, separar_endereco, MSG_ANUNCIAR_NO, MSG_SAIR_NO, INTERVALO_ANUNCIO
 
-# --- CONFIGURAÇÃO DO SERVIDOR ---
+# --- CONFIGURAÇÃO PADRÃO DO SERVIDOR (cada instância de Servidor pode trocar estes valores) ---
 HOST = '0.0.0.0' # Escuta em todas as interfaces de rede disponíveis
-PORT = 5555      # Porta onde o servidor vai rodar
-
-# Cria o socket do servidor (AF_INET = IPv4, SOCK_STREAM = TCP)
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-# Permite reutilizar o endereço/porta imediatamente após fechar (evita erro "Address already in use")
-server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-# Vincula o socket ao endereço e porta
-server.bind((HOST, PORT))
-# Começa a escutar conexões
-server.listen()
-print(f"Servidor UNO rodando em {HOST}:{PORT}")
-
-# --- ESTRUTURA DE DADOS GLOBAL ---
-# Dicionário que armazena todas as salas ativas.
-# Chave: Nome da sala (str)
-# Valor: Dicionário {'estado': Objeto EstadoJogo, 'clientes': Lista de sockets conectados}
-salas = {} 
-
-def broadcast_sala(nome_sala, estado):
+PORT = int(os.environ.get('UNO_PORTA', '5555')) # Porta onde o servidor vai rodar (0 = o sistema escolhe uma livre)
+TEMPO_TURNO = 30.0 # Segundos que cada jogador tem para jogar antes da compra/passe automático
+TEMPO_PENSAR_BOT = 1.0 # Atraso ("pensando...") antes de cada jogada de bot
+TEMPO_RECONEXAO = 60.0 # Segundos que o assento de quem caiu fica reservado esperando a reconexão
+INTERVALO_SNAPSHOT = 64 # Eventos entre dois snapshots da sala (base para reconexões atrasadas)
+ACOES_JOGO = ('JOGAR', 'COMPRAR', MSG_GRITAR_UNO) # O que um jogador pode enviar durante a partida
+
+# --- CONTROLE DE ADMISSÃO ---
+# Limites do servidor; cada um pode ser trocado por variável de ambiente (ex: UNO_LIMITE_CONEXOES=5000)
+LIMITES = {
+    'conexoes': 1000,         # Conexões simultâneas (cada uma é uma thread)
+    'conexoes_por_ip': 20,    # Conexões simultâneas vindas do mesmo IP
+    'salas': 500,             # Salas existentes
+    'jogadores_por_sala': 4,  # Assentos por sala, contando os bots (a mesa do cliente desenha até 4)
+    'espectadores_por_sala': 500, # Conexões assistindo cada sala (MSG_ASSISTIR_SALA)
+    'backlog': 512,           # Fila do listen(): conexões completas esperando o accept (limitada por somaxconn)
+}
+for nome_limite in LIMITES:
+    valor_limite = os.environ.get(f'UNO_LIMITE_{nome_limite.upper()}')
+    if valor_limite:
+        LIMITES[nome_limite] = int(valor_limite)
+FRACAO_DEGRADADO = 0.8         # Acima desta fração do limite de conexões ou de salas, entra no modo degradado
+INTERVALO_LISTA_DEGRADADO = 5.0 # No modo degradado, a lista de salas só é refeita (e pedida) a cada 5 s
+# Orçamento de mensagens de cada conexão (token bucket, ver limitador.py): tipo -> (por segundo, rajada).
+# '*' vale para os demais tipos. UNO_TAXAS="GRITAR_UNO=1:2,COMPRAR=3:6" troca valores.
+TAXAS_MENSAGENS = {
+    MSG_GRITAR_UNO: (2.0, 4),    # Cada grito percorre todos os jogadores e pode gerar um broadcast
+    'COMPRAR': (5.0, 10),
+    'JOGAR': (10.0, 20),
+    MSG_LISTAR_SALAS: (2.0, 5),  # O cliente pede uma vez por segundo no lobby
+    MSG_CRIAR_SALA: (1.0, 3),
+    '*': (10.0, 20),
+}
+for item_taxa in os.environ.get('UNO_TAXAS', '').split(','):
+    if '=' in item_taxa:
+        tipo_taxa, valor_taxa = item_taxa.split('=', 1)
+        por_segundo, rajada = valor_taxa.split(':')
+        TAXAS_MENSAGENS[tipo_taxa.strip()] = (float(por_segundo), float(rajada))
+# Descartes tolerados antes de desconectar: 30 de uma vez, recuperando 1 por segundo
+TOLERANCIA_ABUSO = (1.0, 30)
+MENSAGENS_RECUSA = {
+    'servidor_cheio': 'Servidor cheio. Tente novamente em alguns instantes.',
+    'limite_ip': 'Muitas conexões abertas a partir do seu endereço.',
+    'sobrecarga': 'Servidor sobrecarregado. Tente novamente em alguns instantes.',
+}
+# Atraso mínimo (segundos) da transmissão aos espectadores; cada espectador pode pedir um atraso maior
+ATRASO_ESPECTADOR = float(os.environ.get('UNO_ATRASO_ESPECTADOR', '0'))
+# Coleta de salas ociosas: segundos sem nenhuma mudança de estado até a sala ser removida
+TTL_SALA_VAZIA = 60.0         # Ninguém na sala (ex: CRIAR_SALA sem ENTRAR_SALA)
+TTL_SALA_AGUARDANDO = 1800.0  # Sala de espera parada (jogo não iniciado)
+TTL_SALA_ENCERRADA = 300.0    # Partida terminada cujos jogadores não saíram
+INTERVALO_COLETA = 30.0       # Segundos entre duas passadas do coletor
+# Com UNO_SEMENTE definida, cada sala recebe uma semente derivada dela e do nome da sala: as mesmas
+# salas com as mesmas jogadas geram os mesmos baralhos (testes de carga e benchmarks estáveis).
+# Sem ela, cada sala sorteia a sua (que fica guardada em estado.semente de qualquer forma).
+SEMENTE_FIXA = os.environ.get('UNO_SEMENTE')
+# Com UNO_REPLAYS definida (um diretório), cada sala grava um replay binário da partida (replay.py)
+DIRETORIO_REPLAYS = os.environ.get('UNO_REPLAYS')
+# Banco SQLite com o histórico das partidas terminadas (UNO_HISTORICO vazia desliga)
+ARQUIVO_HISTORICO = os.environ.get('UNO_HISTORICO', 'historico.db')
+# Endereço do endpoint HTTP de métricas (formato Prometheus); vazio desliga
+ENDERECO_METRICAS = os.environ.get('UNO_METRICAS', '127.0.0.1:9100')
+# Drenagem (reinício a quente): as salas que restarem no fim da drenagem são salvas neste arquivo,
+# e o próximo processo as restaura ao subir (vazio desliga o salvamento)
+ARQUIVO_SALAS = os.environ.get('UNO_ESTADO_SALAS', 'salas.estado')
+# Segundos que a drenagem espera as partidas em andamento terminarem antes de salvar as salas
+PRAZO_DRENAGEM = float(os.environ.get('UNO_PRAZO_DRENAGEM', '60'))
+VERSAO_ARQUIVO_SALAS = 1
+# Fração das requisições rastreadas desde o início (vazio = desligado; ligue depois por /rastreamento/iniciar)
+AMOSTRAGEM_RASTREAMENTO = os.environ.get('UNO_RASTREAMENTO', '')
+# Vários nós: endereço ('host:porta') do diretório de salas (diretorio.py); vazio = servidor sozinho
+DIRETORIO = os.environ.get('UNO_DIRETORIO', '')
+# Endereço deste nó para os clientes (redirecionamentos); vazio = IP de HOST (127.0.0.1 se 0.0.0.0) e a porta
+ENDERECO_PUBLICO = os.environ.get('UNO_ENDERECO_PUBLICO', '')
+
+# Tipos conhecidos viram rótulo; qualquer outra coisa enviada por um cliente vira 'outro'
+# (evita que um cliente crie séries novas à vontade)
+TIPOS_MENSAGEM = {MSG_CRIAR_SALA, MSG_ENTRAR_SALA, MSG_LISTAR_SALAS, MSG_INICIAR_JOGO, MSG_GRITAR_UNO,
+                  MSG_SAIR_SALA, MSG_CONFIGURAR_SALA, MSG_ADICIONAR_BOT, MSG_RECONECTAR, MSG_REVANCHE, MSG_ASSISTIR_SALA,
+                  'JOGAR', 'COMPRAR'}
+
+# --- SALAS ---
+# Cada sala é um dicionário:
+# {'estado': Objeto EstadoJogo, 'clientes': Lista de sockets conectados,
+#  'lock': trava da sala, 'timer_turno'/'turno_agendado': prazo do turno atual,
+#  'bots': ID do bot -> estratégia, 'bot_agendado': turno com jogada de bot já agendada,
+#  'registro': lista de (ID do jogador, evento) aplicados ao estado desde o último snapshot, na ordem,
+#  'inicio_registro': eventos anteriores ao registro (já cobertos pelo snapshot, ou de antes da restauração),
+#  'bytes_registro': memória estimada do registro, mantida a cada evento anotado ou descartado,
+#  'replay': GravadorReplay da sala (ou None, se os replays estão desligados),
+#  'snapshot': (nº de eventos, pickle do estado) mais recente, 'conexoes': ID -> socket,
+#  'sessoes': ID -> token de sessão, 'desconectados': ID -> prazo da reconexão,
+#  'nomes': ID -> nome informado pelo jogador (identidade no histórico, ver nome_jogador_sala),
+#  'nome': nome da sala, 'inicio_partida': time.time() do início, 'partida_gravada': bool,
+#  'ultima_atividade': time.monotonic() da última mudança de estado,
+#  'plateia': Plateia dos espectadores (criada pelo primeiro MSG_ASSISTIR_SALA)}
+# A semente da sala fica em estado.semente. A partida inteira (para protocolo.reproduzir ou replay.py) fica
+# só no replay em disco: em memória, o registro guarda no máximo INTERVALO_SNAPSHOT eventos (revanches incluídas).
+
+def nova_sala(nome, estado, replay):
+    """Dicionário de uma sala sem ninguém dentro."""
+    return {
+        'estado': estado,
+        'clientes': [],
+        'lock': threading.RLock(), # Serializa ações de jogadores e do temporizador
+        'timer_turno': None,
+        'turno_agendado': None,
+        'bots': {},
+        'bot_agendado': None,
+        'registro': [],
+        'inicio_registro': 0,
+        'bytes_registro': 0,
+        'replay': replay,
+        'snapshot': None,
+        'conexoes': {},
+        'sessoes': {},
+        'desconectados': {},
+        'nomes': {},
+        'nome': nome,
+        'inicio_partida': None,
+        'partida_gravada': False,
+        'ultima_atividade': time.monotonic(),
+        'plateia': None
+    }
+
+def nome_jogador_sala(sala, nome, padrao):
     """
-    Envia uma mensagem para todos os jogadores conectados em uma sala específica.
-    Útil para atualizar o estado do jogo para todos ao mesmo tempo.
+    Nome com que o jogador entra na sala (até 32 caracteres), sem repetir o de outro assento:
+    o histórico identifica cada participação por ele. Se o cliente não informou um nome, usa
+    'padrao' (o IP): vários jogadores sem nome no mesmo IP (NAT, localhost) viram 'IP', 'IP#2'...
     """
-    if nome_sala not in salas: return
-    
-    sala = salas[nome_sala]
-    # Serializa a mensagem apenas uma vez para eficiência (pickle é custoso)
-    data = pickle.dumps(estado)
-    
-    for cliente in sala['clientes']:
-        try:
-            cliente.send(data)
-        except:
-            # Se falhar ao enviar (cliente caiu), ignora. 
-            # A remoção do cliente será tratada no loop principal dele (handle_client).
-            pass
+    if not isinstance(nome, str) or not nome.strip():
+        nome = padrao
+    nome = nome.strip()[:32]
+    usados = set(sala['nomes'].values())
+    candidato, n = nome, 2
+    while candidato in usados:
+        candidato = f'{nome}#{n}'
+        n += 1
+    return candidato
+
+def tamanho_evento(evento):
+    """Memória estimada de um evento no registro: o dicionário, a tupla (ID, evento) e a posição na lista."""
+    return sys.getsizeof(evento) + 64
+
+def tirar_snapshot(sala):
+    """
+    Guarda o estado atual (já serializado) como base para reconexões e descarta do registro os eventos
+    anteriores a ele: quem está atrás do snapshot recebe o snapshot, então eles não servem mais.
+    """
+    # A posição é a do estado (estado.eventos): um bot aplica todas as ações do turno antes de anotá-las
+    estado = sala['estado']
+    sala['snapshot'] = (estado.eventos, pickle.dumps(estado))
+    registro = sala['registro']
+    # Só sai o que já foi anotado (as ações restantes do bot entram depois, nas posições seguintes)
+    descartados = min(estado.eventos - sala['inicio_registro'], len(registro))
+    if descartados > 0:
+        sala['bytes_registro'] -= sum(tamanho_evento(evento) for _, evento in registro[:descartados])
+        del registro[:descartados]
+        sala['inicio_registro'] += descartados
+
+def resposta_reconexao(sala, player_id, token, eventos_cliente):
+    """
+    Monta a resposta de MSG_RECONECTAR: só os eventos que o cliente ainda não viu, aplicados sobre
+    o estado que ele já tem. Se ele não tem estado (ou está atrás do último snapshot), vai o
+    snapshot mais recente e os eventos posteriores a ele. As posições contam todos os eventos da
+    sala (estado.eventos), inclusive os anteriores a uma restauração.
+    """
+    estado = sala['estado']
+    registro = sala['registro']
+    if sala['snapshot'] is None: # Sala restaurada: o snapshot só é feito quando alguém precisa
+        tirar_snapshot(sala)
+    posicao_snapshot, snapshot = sala['snapshot']
+    resposta = {'tipo': 'RECONECTADO', 'id': player_id, 'token': token, 'versao': estado.versao,
+                'acoes_confirmadas': dict(estado.acoes_confirmadas), 'snapshot': None}
+    if isinstance(eventos_cliente, int) and posicao_snapshot <= eventos_cliente <= estado.eventos:
+        inicio = eventos_cliente
+    else:
+        resposta['snapshot'] = snapshot
+        inicio = posicao_snapshot
+    resposta['eventos'] = registro[inicio - sala['inicio_registro']:]
+    return resposta
+
+def sala_vazia(sala):
+    """Sala sem nenhum jogador conectado e sem assentos esperando reconexão."""
+    return not sala['clientes'] and not sala['desconectados']
 
-def handle_client(conn, addr):
+def memoria_sala(sala):
     """
-    Função executada em uma thread separada para cada cliente conectado.
-    Gerencia todo o ciclo de vida da conexão desse cliente.
+    Estimativa (bytes) do que a sala mantém em memória: estado, registro de eventos e snapshot (chamar
+    com a trava da sala). O estado conta como o tamanho do snapshot (o mesmo estado, no máximo
+    INTERVALO_SNAPSHOT eventos atrás) e o registro pela soma mantida em anotar_evento: a passada do
+    coletor não serializa nada, exceto o primeiro snapshot de uma sala restaurada.
     """
-    print(f"Nova conexão: {addr}")
-    sala_atual = None # Nome da sala onde o cliente está (None se estiver no lobby)
-    player_id = None  # ID único do jogador (usamos o endereço IP:Porta como ID)
+    if sala['snapshot'] is None:
+        tirar_snapshot(sala)
+    return 2 * len(sala['snapshot'][1]) + sala['bytes_registro']
+
+def motivo_coleta(sala, agora):
+    """Motivo para coletar a sala ('vazia', 'aguardando', 'encerrada') ou None se ela deve ficar."""
+    estado = sala['estado']
+    if sala_vazia(sala):
+        motivo, ttl = 'vazia', TTL_SALA_VAZIA
+    elif estado.vencedor is not None:
+        motivo, ttl = 'encerrada', TTL_SALA_ENCERRADA
+    elif not estado.jogo_iniciado:
+        motivo, ttl = 'aguardando', TTL_SALA_AGUARDANDO
+    else:
+        return None # Partida em andamento: o prazo de turno garante que ela anda (e termina)
+    return motivo if agora - sala['ultima_atividade'] >= ttl else None
+
+def exportar_sala(sala, agora):
+    """Dados de uma sala para o arquivo de drenagem (chamar com a trava da sala)."""
+    return {
+        'nome': sala['nome'],
+        'estado': sala['estado'].compactar(),
+        'bots': {id_bot: estrategia.nome for id_bot, estrategia in sala['bots'].items()},
+        'sessoes': dict(sala['sessoes']),
+        'nomes': dict(sala['nomes']),
+        'inicio_partida': sala['inicio_partida'],
+        'partida_gravada': sala['partida_gravada'],
+        'ociosa': agora - sala['ultima_atividade'],
+    }
+
+class Servidor:
+    """
+    Um servidor UNO completo: socket de escuta, salas, sessões, roda de temporização, executor,
+    histórico, métricas e rastreamento. iniciar() e parar() não bloqueiam; executar() é o modo
+    linha de comando (bloqueia até a drenagem ou Ctrl+C).
+    Os parâmetros têm como padrão as constantes (e variáveis de ambiente) do topo do arquivo;
+    'limites' e 'taxas' só precisam das chaves que mudam (ex: limites={'salas': 20000}).
+    'log' recebe um eventos.RegistroEventos já aberto (ex: RegistroEventos(None) descarta tudo), que
+    continua aberto depois de parar(); sem ele, cada servidor abre o seu pelas variáveis UNO_LOG*.
+    """
+    def __init__(self, host=HOST, porta=PORT, limites=None, taxas=None, tempo_turno=TEMPO_TURNO,
+                 tempo_pensar_bot=TEMPO_PENSAR_BOT, tempo_reconexao=TEMPO_RECONEXAO, semente=SEMENTE_FIXA,
+                 diretorio_replays=DIRETORIO_REPLAYS, arquivo_historico=ARQUIVO_HISTORICO,
+                 endereco_metricas=ENDERECO_METRICAS, arquivo_salas=ARQUIVO_SALAS,
+                 amostragem_rastreamento=AMOSTRAGEM_RASTREAMENTO, diretorio=DIRETORIO,
+                 endereco_publico=ENDERECO_PUBLICO, log=None):
+        self.host = host
+        self.porta = porta # Trocada pela porta real em iniciar() (porta 0)
+        self.limites = {**LIMITES, **(limites or {})}
+        self.taxas = {**TAXAS_MENSAGENS, **(taxas or {})}
+        self.tempo_turno = tempo_turno
+        self.tempo_pensar_bot = tempo_pensar_bot
+        self.tempo_reconexao = tempo_reconexao
+        self.semente = semente
+        self.diretorio_replays = diretorio_replays
+        self.arquivo_historico = arquivo_historico
+        self.endereco_metricas = endereco_metricas # Trocado pelo endereço real em iniciar() (porta 0)
+        self.arquivo_salas = arquivo_salas
+        self.diretorio = diretorio
+        self.endereco_publico = endereco_publico # Preenchido em iniciar(), se vazio
+        # Log estruturado (JSONL), um por servidor; ver eventos.py para nível, amostragem e rotação.
+        # Sem um log injetado, cria o de servidor.jsonl pelas variáveis UNO_LOG* e o fecha em parar()
+        self.log_proprio = log is None
+        self.log = configurar_pelo_ambiente('servidor.jsonl') if log is None else log
+
+        # Nome da sala -> sala (ver nova_sala)
+        self.salas = {}
+        # Token de sessão -> (nome da sala, ID do jogador). Entregue no ENTROU e usado em MSG_RECONECTAR.
+        self.sessoes = {}
+
+        # Uma única roda de temporização para os prazos de turno de todas as salas. Os callbacks apenas
+        # repassam o trabalho (que envia dados pela rede) para um executor pequeno e compartilhado.
+        self.roda = RodaTemporizacao(log=self.log)
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='uno-tarefas')
+        # Resultados das partidas vão para uma fila; uma thread própria grava no SQLite em lotes
+        self.historico = None # Aberto em iniciar()
+
+        # --- ADMISSÃO DE CONEXÕES ---
+        self.lock_conexoes = threading.Lock()
+        self.conexoes_abertas = 0
+        self.conexoes_por_ip = {} # IP -> conexões abertas
+        self.degradado = False    # Modo degradado: perto dos limites, o lobby é atualizado com menos frequência
+        self.lista_cache = (0.0, None) # (instante, resposta de LISTAR_SALAS já empacotada), usada no modo degradado
+        self.memoria_salas = 0    # Memória estimada das salas restantes, medida na última passada do coletor
+
+        # --- VÁRIOS NÓS (ver diretorio.py) ---
+        self.anel = AnelConsistente() # Nós ativos, segundo o último anúncio ao diretório
+        self.salas_remotas = {}       # Nome -> (endereço do nó, resumo da sala), das salas dos outros nós
+        self.diretorio_ok = None      # Resultado do último anúncio (loga só as mudanças)
+
+        # --- CICLO DE VIDA ---
+        self.socket = None
+        self.thread_accept = None
+        self.servidor_http = None
+        self.clientes = {}        # Socket -> thread de cada conexão aberta (lobby e salas)
+        self.drenando = False     # Drenagem em andamento: salas novas são recusadas
+        self.encerrado = threading.Event() # parar() foi chamado: o socket de escuta foi fechado
+        self.parado = False
+
+        # --- MÉTRICAS ---
+        self.metricas = Metricas()
+        self.descrever_metricas()
+
+        # --- RASTREAMENTO (spans por fase e perfil sob demanda; ver rastreamento.py) ---
+        self.rastreador = Rastreador()
+        if amostragem_rastreamento:
+            self.rastreador.iniciar(float(amostragem_rastreamento))
+
+    def descrever_metricas(self):
+        metricas = self.metricas
+        metricas.descrever('uno_conexoes_total', 'counter', 'Conexões TCP aceitas')
+        metricas.descrever('uno_desconexoes_total', 'counter', 'Conexões TCP encerradas')
+        metricas.descrever('uno_mensagens_total', 'counter', 'Mensagens recebidas dos clientes, por tipo')
+        metricas.descrever('uno_tratamento_segundos', 'histogram', 'Tempo para tratar cada mensagem recebida, por tipo')
+        metricas.descrever('uno_broadcast_total', 'counter', 'Estados publicados por broadcast_sala')
+        metricas.descrever('uno_broadcast_destinatarios_total', 'counter', 'Envios feitos pelos broadcasts (fan-out)')
+        metricas.descrever('uno_broadcast_serializacao_segundos', 'histogram', 'Tempo do pickle do estado em broadcast_sala')
+        metricas.descrever('uno_broadcast_envio_segundos', 'histogram', 'Tempo dos sendall para todos os clientes da sala')
+        metricas.descrever('uno_bytes_recebidos_total', 'counter', 'Bytes recebidos dos clientes (com cabeçalho)')
+        metricas.descrever('uno_bytes_enviados_total', 'counter', 'Bytes enviados aos clientes (com cabeçalho)')
+        metricas.descrever('uno_falhas_envio_total', 'counter', 'Envios que falharam e foram ignorados no broadcast')
+        metricas.descrever('uno_recusas_total', 'counter', 'Conexões e salas recusadas pelo controle de admissão, por motivo')
+        metricas.descrever('uno_mensagens_descartadas_total', 'counter', 'Mensagens descartadas pelo limite de taxa, por tipo')
+        metricas.descrever('uno_desconexoes_abuso_total', 'counter', 'Conexões encerradas por passar do limite de taxa de forma persistente')
+        metricas.descrever('uno_salas_coletadas_total', 'counter', 'Salas ociosas removidas pelo coletor, por motivo')
+        metricas.descrever('uno_bytes_coletados_total', 'counter', 'Memória estimada liberada pelo coletor de salas')
+        metricas.descrever('uno_visoes_total', 'counter', 'Visões públicas empacotadas para as plateias (uma por versão)')
+        metricas.descrever('uno_espectador_envios_total', 'counter', 'Envios de visões aos espectadores (fan-out)')
+        metricas.descrever('uno_espectadores_lentos_total', 'counter', 'Espectadores desconectados por não acompanharem a transmissão')
+        metricas.descrever('uno_redirecionamentos_total', 'counter', 'Pedidos de sala redirecionados ao nó dono, por tipo')
+        metricas.medidor('uno_conexoes_ativas', 'Conexões TCP abertas no momento', lambda: {(): self.conexoes_abertas})
+        metricas.medidor('uno_degradado', '1 se o servidor está no modo degradado', lambda: {(): int(self.degradado)})
+        metricas.medidor('uno_drenando', '1 se o servidor está drenando (reinício a quente)', lambda: {(): int(self.drenando)})
+        metricas.medidor('uno_salas', 'Salas existentes, por situação', self.contar_salas)
+        metricas.medidor('uno_memoria_salas_bytes', 'Memória estimada das salas (última coleta)',
+                         lambda: {(): self.memoria_salas})
+        metricas.medidor('uno_espectadores', 'Espectadores conectados (todas as salas)',
+                         lambda: {(): sum(len(sala['plateia']) for sala in list(self.salas.values()) if sala['plateia'])})
+        metricas.medidor('uno_nos_anel', 'Nós no anel de salas (1 sem diretório)', lambda: {(): len(self.anel.nos)})
+        metricas.medidor('uno_threads', 'Threads vivas no processo', lambda: {(): threading.active_count()})
+
+    def contar_salas(self):
+        """Salas por situação, para o medidor uno_salas."""
+        contagem = {'aguardando': 0, 'jogando': 0, 'encerrada': 0}
+        for sala in list(self.salas.values()):
+            estado = sala['estado']
+            situacao = 'encerrada' if estado.vencedor is not None else 'jogando' if estado.jogo_iniciado else 'aguardando'
+            contagem[situacao] += 1
+        return {(('status', situacao),): n for situacao, n in contagem.items()}
+
+    def rotulo_tipo(self, msg):
+        """Conta a mensagem e devolve o seu tipo (ou 'outro') para os rótulos das métricas."""
+        tipo = msg.get('tipo') if isinstance(msg, dict) else None
+        tipo = tipo if tipo in TIPOS_MENSAGEM else 'outro'
+        self.metricas.contar('uno_mensagens_total', tipo=tipo)
+        return tipo
+
+    def submeter(self, funcao, *args):
+        """Executa funcao(*args) no executor (callback da roda de temporização para o trabalho que envia dados)."""
+        return self.executor.submit(self.executar_tarefa, funcao, *args)
 
-    try:
+    def executar_tarefa(self, funcao, *args):
+        """Roda uma tarefa do executor levando a exceção para o log (o Future a guardaria em silêncio)."""
+        try:
+            funcao(*args)
+        except Exception as e:
+            self.log.erro('erro_tarefa', tarefa=funcao.__name__, erro=repr(e), pilha=traceback.format_exc())
+
+    # --- CICLO DE VIDA ---
+    def iniciar(self):
+        """
+        Abre o socket de escuta e sobe as threads do servidor (accept, roda de temporização, HTTP de
+        métricas). Não bloqueia. Com porta 0, a porta escolhida pelo sistema fica em self.porta.
+        """
+        # Cria o socket do servidor (AF_INET = IPv4, SOCK_STREAM = TCP)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Permite reutilizar o endereço/porta imediatamente após fechar (evita erro "Address already in use")
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Vincula o socket ao endereço e porta
+        self.socket.bind((self.host, self.porta))
+        # Começa a escutar conexões (fila maior que o padrão: absorve rajadas de reconexão sem recusar no SYN)
+        self.socket.listen(self.limites['backlog'])
+        self.porta = self.socket.getsockname()[1]
+        if not self.endereco_publico:
+            self.endereco_publico = f"{'127.0.0.1' if self.host in ('', '0.0.0.0') else self.host}:{self.porta}"
+        self.anel = AnelConsistente([self.endereco_publico]) # Sozinho até o primeiro anúncio
+        print(f"Servidor UNO rodando em {self.host}:{self.porta}")
+        self.log.info('servidor_iniciado', host=self.host, porta=self.porta)
+
+        if self.arquivo_historico:
+            self.historico = HistoricoPartidas(self.arquivo_historico, log=self.log)
+        self.roda.iniciar() # Thread única dos prazos de turno de todas as salas
+        self.roda.agendar(INTERVALO_COLETA, self.submeter, self.coletar_salas)
+        restauradas = self.restaurar_salas(self.arquivo_salas) # Salas salvas pela drenagem do processo anterior
+        if restauradas:
+            print(f"{restauradas} sala(s) restaurada(s) de {self.arquivo_salas}")
+        if self.endereco_metricas:
+            host_metricas, porta_metricas = self.endereco_metricas.rsplit(':', 1)
+            self.servidor_http = iniciar_servidor_http(self.metricas, host_metricas, int(porta_metricas),
+                                                       rotas={**self.rastreador.rotas_http(), **self.rotas_drenagem()})
+            self.endereco_metricas = f"{host_metricas}:{self.servidor_http.server_address[1]}"
+            print(f"Métricas em http://{self.endereco_metricas}/metrics")
+        if self.diretorio:
+            self.submeter(self.anunciar_no) # Primeiro anúncio já (os seguintes a cada INTERVALO_ANUNCIO)
+        self.thread_accept = threading.Thread(target=self.aceitar_conexoes, name=f'uno-accept-{self.porta}')
+        self.thread_accept.start()
+        return self
+
+    def parar(self):
+        """
+        Para o servidor: fecha o socket de escuta, encerra as conexões (e espera as threads delas),
+        remove as salas (sem salvá-las: para isso, drenar()) e para a roda, o executor, o HTTP de
+        métricas e o histórico. Pode ser chamado mais de uma vez.
+        """
+        with self.lock_conexoes:
+            if self.parado:
+                return
+            self.parado = True
+        self.fechar_escuta()
+        if self.thread_accept and self.thread_accept is not threading.current_thread():
+            self.thread_accept.join()
+        with self.lock_conexoes:
+            clientes = list(self.clientes.items())
+        for conn, _ in clientes:
+            try:
+                conn.shutdown(socket.SHUT_RDWR) # O handle_client de cada um recebe o fim da conexão e encerra
+            except OSError:
+                pass
+        limite = time.monotonic() + 2.0
+        for _, thread in clientes:
+            if thread is not threading.current_thread():
+                thread.join(max(0.0, limite - time.monotonic()))
+        for nome, sala in list(self.salas.items()):
+            with sala['lock']:
+                if self.salas.get(nome) is sala:
+                    self.remover_sala(nome)
+        self.roda.parar()
+        self.executor.shutdown(wait=True)
+        if self.diretorio:
+            self.sair_do_diretorio()
+        if self.servidor_http:
+            self.servidor_http.shutdown()
+            self.servidor_http.server_close()
+        if self.historico:
+            self.historico.fechar()
+        self.log.info('servidor_parado', host=self.host, porta=self.porta)
+        if self.log_proprio:
+            self.log.fechar() # Grava o que ainda está na fila
+
+    def executar(self):
+        """Linha de comando: inicia e bloqueia até a drenagem terminar (SIGTERM ou /drenar) ou Ctrl+C."""
+        self.iniciar()
+        if threading.current_thread() is threading.main_thread(): # signal só pode ser configurado na thread principal
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self.drenar, name='drenagem').start())
+        try:
+            while not self.encerrado.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            self.parar()
+        if self.thread_accept:
+            self.thread_accept.join()
+
+    def fechar_escuta(self):
+        """Fecha o socket de escuta: o loop de accept termina."""
+        self.encerrado.set()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR) # Acorda o accept bloqueado (só close não acorda no Linux)
+        except OSError:
+            pass
+        self.socket.close()
+
+    def aceitar_conexoes(self):
+        """Loop (thread própria) que aceita novas conexões."""
         while True:
-            # --- LOOP DO LOBBY (Antes de entrar numa sala) ---
-            if not sala_atual:
-                data = conn.recv(4096)
-                if not data: break # Conexão fechada pelo cliente
-                req = pickle.loads(data)
-                
-                # 1. Listar Salas
-                if req['tipo'] == MSG_LISTAR_SALAS:
-                    # Monta uma lista com informações básicas de todas as salas
-                    lista = []
-                    for nome, info in salas.items():
-                        estado = info['estado']
-                        lista.append({
-                            'nome': nome,
-                            'jogadores': len(info['clientes']),
-                            'status': 'Jogando' if estado.jogo_iniciado else 'Aguardando'
-                        })
-                    conn.send(pickle.dumps({'tipo': MSG_LISTAR_SALAS, 'salas': lista}))
-
-                # 2. Criar Sala
-                elif req['tipo'] == MSG_CRIAR_SALA:
-                    nome = req['nome']
-                    if nome in salas:
-                        conn.send(pickle.dumps({'tipo': MSG_ERRO, 'msg': 'Sala já existe!'}))
-                    else:
-                        # Cria nova sala com estado inicial padrão
-                        salas[nome] = {
-                            'estado': EstadoJogo(), 
-                            'clientes': []
-                        }
-                        conn.send(pickle.dumps({'tipo': 'SUCESSO_CRIAR'}))
-                        # O cliente deve enviar ENTRAR_SALA em seguida automaticamente
-
-                # 3. Entrar em Sala
-                elif req['tipo'] == MSG_ENTRAR_SALA:
-                    nome = req['nome']
-                    if nome in salas:
-                        sala = salas[nome]
-                        estado = sala['estado']
-                        
-                        # Validações
-                        if len(sala['clientes']) >= 4:
-                            conn.send(pickle.dumps({'tipo': MSG_ERRO, 'msg': 'Sala cheia!'}))
+            try:
+                conn, addr = self.socket.accept()
+            except OSError as e:
+                if self.encerrado.is_set():
+                    break # parar() ou drenagem: o socket foi fechado de propósito
+                # Ex: sem descritores de arquivo livres (EMFILE); espera as conexões atuais liberarem
+                self.log.erro('erro_accept', erro=repr(e))
+                time.sleep(0.1)
+                continue
+            # Recusa cedo (com uma mensagem clara) quem passaria dos limites, antes de criar a thread
+            motivo = self.admitir_conexao(addr[0])
+            if motivo:
+                self.recusar_conexao(conn, addr, motivo)
+                continue
+            # Cria uma nova thread para cada cliente
+            thread = threading.Thread(target=self.handle_client, args=(conn, addr))
+            with self.lock_conexoes:
+                self.clientes[conn] = thread
+            try:
+                thread.start()
+            except RuntimeError: # Sem recursos para mais uma thread
+                with self.lock_conexoes:
+                    self.clientes.pop(conn, None)
+                self.liberar_conexao(addr[0])
+                self.recusar_conexao(conn, addr, 'sobrecarga')
+
+    # --- ADMISSÃO DE CONEXÕES ---
+    def admitir_conexao(self, ip):
+        """Reserva a vaga de uma conexão nova. Retorna None se ela foi admitida, senão o motivo da recusa."""
+        with self.lock_conexoes:
+            if self.conexoes_abertas >= self.limites['conexoes']:
+                return 'servidor_cheio'
+            if self.conexoes_por_ip.get(ip, 0) >= self.limites['conexoes_por_ip']:
+                return 'limite_ip'
+            self.conexoes_abertas += 1
+            self.conexoes_por_ip[ip] = self.conexoes_por_ip.get(ip, 0) + 1
+        self.atualizar_degradado()
+        return None
+
+    def liberar_conexao(self, ip):
+        """Devolve a vaga de uma conexão encerrada."""
+        with self.lock_conexoes:
+            self.conexoes_abertas -= 1
+            restantes = self.conexoes_por_ip.pop(ip) - 1
+            if restantes:
+                self.conexoes_por_ip[ip] = restantes
+        self.atualizar_degradado()
+
+    def recusar_conexao(self, conn, addr, motivo):
+        """Responde a recusa com uma mensagem de erro e fecha a conexão, sem criar thread para ela."""
+        self.metricas.contar('uno_recusas_total', motivo=motivo)
+        self.log.aviso('conexao_recusada', endereco=addr, motivo=motivo)
+        try:
+            conn.settimeout(0.5) # Um cliente que não lê não pode travar o accept
+            conn.sendall(empacotar({'tipo': MSG_ERRO, 'msg': MENSAGENS_RECUSA[motivo]}))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def atualizar_degradado(self):
+        """Entra (ou sai) do modo degradado conforme a ocupação de conexões e salas."""
+        sob_pressao = (self.conexoes_abertas >= FRACAO_DEGRADADO * self.limites['conexoes']
+                       or len(self.salas) >= FRACAO_DEGRADADO * self.limites['salas'])
+        if sob_pressao != self.degradado:
+            self.degradado = sob_pressao
+            self.log.aviso('modo_degradado' if sob_pressao else 'modo_normal',
+                      conexoes=self.conexoes_abertas, salas=len(self.salas))
+
+    def enviar_lista_salas(self, conn):
+        """
+        Responde MSG_LISTAR_SALAS. No modo degradado, a lista (já empacotada) só é refeita a cada
+        INTERVALO_LISTA_DEGRADADO, e a resposta pede aos clientes que atualizem com essa frequência.
+        """
+        agora = time.monotonic()
+        if self.degradado and agora - self.lista_cache[0] < INTERVALO_LISTA_DEGRADADO:
+            dados = self.lista_cache[1]
+        else:
+            # Monta uma lista com informações básicas de todas as salas (deste nó e, com o diretório, dos outros)
+            lista = self.resumo_salas()
+            lista += [sala for nome, (_, sala) in list(self.salas_remotas.items()) if nome not in self.salas]
+            resposta = {'tipo': MSG_LISTAR_SALAS, 'salas': lista}
+            if self.degradado:
+                resposta['intervalo'] = INTERVALO_LISTA_DEGRADADO
+            dados = empacotar(resposta)
+            if self.degradado:
+                self.lista_cache = (agora, dados)
+        conn.sendall(dados)
+        self.metricas.contar('uno_bytes_enviados_total', len(dados))
+
+    def descartar_mensagem(self, conn, addr, tipo, situacao):
+        """Conta uma mensagem barrada pelo limite de taxa. Retorna True se a conexão deve ser encerrada (abuso)."""
+        self.metricas.contar('uno_mensagens_descartadas_total', tipo=tipo)
+        if situacao != ABUSO:
+            return False
+        self.metricas.contar('uno_desconexoes_abuso_total')
+        self.log.aviso('abuso_desconectado', endereco=addr, tipo=tipo)
+        try:
+            self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Desconectado: mensagens demais em pouco tempo.'})
+        except OSError:
+            pass
+        return True
+
+    def desserializar(self, dados):
+        """Converte um quadro recebido do cliente (receber_quadro) em mensagem, contando os bytes."""
+        self.metricas.contar('uno_bytes_recebidos_total', CABECALHO.size + len(dados))
+        with self.rastreador.span('desserializar', bytes=len(dados)):
+            return pickle.loads(dados)
+
+    def enviar(self, conn, obj):
+        """Envia uma mensagem a um cliente, contando os bytes."""
+        dados = empacotar(obj)
+        conn.sendall(dados)
+        self.metricas.contar('uno_bytes_enviados_total', len(dados))
+
+    # --- SALAS ---
+    def semente_sala(self, nome_sala):
+        """Semente de uma sala nova: derivada de UNO_SEMENTE, se definida, ou sorteada."""
+        if self.semente is None:
+            return None # EstadoJogo sorteia
+        resumo = hashlib.blake2b(f'{self.semente}:{nome_sala}'.encode(), digest_size=8).digest()
+        return int.from_bytes(resumo, 'big')
+
+    def criar_replay(self, nome_sala, estado):
+        """Abre o replay de uma sala nova no diretório de replays (se os replays estão ligados)."""
+        if not self.diretorio_replays:
+            return None
+        os.makedirs(self.diretorio_replays, exist_ok=True)
+        nome_arquivo = re.sub(r'[^A-Za-z0-9_-]', '_', nome_sala)[:40]
+        base = os.path.join(self.diretorio_replays,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}-{nome_arquivo}-{estado.semente:016x}")
+        return GravadorReplay(base, estado)
+
+    def registrar(self, sala, id_jogador, evento):
+        """
+        Aplica um evento (entrada, saída, configuração, início ou ação de jogo) ao estado da sala
+        e, se ele mudou algo, o acrescenta ao registro da sala. Retorna True se o estado mudou.
+        """
+        with self.rastreador.span('aplicar', tipo=evento['tipo']):
+            alterou = sala['estado'].aplicar_evento(id_jogador, evento)
+        if alterou:
+            with self.rastreador.span('anotar'):
+                self.anotar_evento(sala, id_jogador, evento)
+        return alterou
+
+    def anotar_evento(self, sala, id_jogador, evento):
+        """Guarda um evento já aplicado ao estado no registro da sala e no replay."""
+        sala['registro'].append((id_jogador, evento))
+        sala['bytes_registro'] += tamanho_evento(evento)
+        if sala['replay']:
+            sala['replay'].gravar(id_jogador, evento, sala['estado'])
+        if (sala['inicio_registro'] + len(sala['registro'])) % INTERVALO_SNAPSHOT == 0:
+            tirar_snapshot(sala)
+        estado = sala['estado']
+        if evento['tipo'] == MSG_INICIAR_JOGO:
+            sala['inicio_partida'] = time.time()
+            sala['partida_gravada'] = False # Nova partida (a primeira ou uma revanche)
+        elif estado.vencedor is not None and not sala['partida_gravada']:
+            sala['partida_gravada'] = True
+            self.log.info('partida_encerrada', sala=sala['nome'], vencedor=estado.vencedor, turnos=estado.turnos)
+            if self.historico:
+                self.historico.registrar_partida(resultado_partida(sala['nome'], estado, sala['inicio_partida'], time.time(),
+                                                                   sala['nomes']))
+
+    def encerrar_sessao(self, sala, player_id):
+        """Invalida o token de sessão do jogador (saiu de vez da sala)."""
+        token = sala['sessoes'].pop(player_id, None)
+        self.sessoes.pop(token, None)
+        sala['nomes'].pop(player_id, None)
+
+    def expirar_reconexao(self, nome_sala, sala, player_id):
+        """O jogador que caiu não voltou a tempo: libera o assento."""
+        with sala['lock']:
+            if self.salas.get(nome_sala) is not sala: return
+            if sala['desconectados'].pop(player_id, None) is None:
+                return # Já reconectou
+            self.encerrar_sessao(sala, player_id)
+            self.log.info('reconexao_expirada', sala=nome_sala, jogador=player_id)
+            if sala_vazia(sala):
+                self.remover_sala(nome_sala)
+            elif self.registrar(sala, player_id, {'tipo': MSG_SAIR_SALA}):
+                self.broadcast_sala(nome_sala, sala['estado'])
+
+    def agendar_turno(self, nome_sala, sala, estado):
+        """(Re)agenda o prazo do turno atual da sala, se o turno mudou desde o último agendamento."""
+        ativo = estado.jogo_iniciado and estado.vencedor is None and estado.tempo_turno
+        if ativo and sala['turno_agendado'] == estado.turnos:
+            return # O prazo do turno atual já está correndo
+        if sala['timer_turno']:
+            sala['timer_turno'].cancelar()
+            sala['timer_turno'] = None
+        if ativo:
+            sala['turno_agendado'] = estado.turnos
+            sala['timer_turno'] = self.roda.agendar(estado.tempo_turno, self.submeter,
+                                                    self.expirar_turno, nome_sala, sala, estado.turnos)
+
+    def agendar_bot(self, nome_sala, sala, estado):
+        """Se a vez é de um bot, agenda a jogada dele (uma vez por turno) no executor compartilhado."""
+        if not estado.jogo_iniciado or estado.vencedor is not None:
+            return
+        id_vez = estado.jogadores_conectados[estado.jogador_atual]
+        if id_vez in sala['bots'] and sala['bot_agendado'] != estado.turnos:
+            sala['bot_agendado'] = estado.turnos
+            self.roda.agendar(self.tempo_pensar_bot, self.submeter, self.jogar_bot, nome_sala, sala, estado.turnos)
+
+    def jogar_bot(self, nome_sala, sala, turno):
+        """Executa a jogada do bot da vez direto sobre o EstadoJogo (sem rede) e avisa a sala."""
+        with self.rastreador.requisicao('bot', sala=nome_sala, turno=turno), sala['lock']:
+            if self.salas.get(nome_sala) is not sala: return # Sala já foi removida
+            estado = sala['estado']
+            if estado.turnos != turno or estado.vencedor is not None:
+                return
+            id_bot = estado.jogadores_conectados[estado.jogador_atual]
+            estrategia = sala['bots'].get(id_bot)
+            if not estrategia: return
+            with self.rastreador.span('aplicar', jogador=id_bot):
+                aplicadas = executar_turno_bot(estado, id_bot, estrategia)
+            with self.rastreador.span('anotar'):
+                for acao in aplicadas:
+                    self.anotar_evento(sala, id_bot, acao)
+            if aplicadas:
+                self.broadcast_sala(nome_sala, estado)
+
+    def expirar_turno(self, nome_sala, sala, turno):
+        """O jogador da vez não jogou a tempo: o servidor compra (e joga, se possível) por ele."""
+        with self.rastreador.requisicao('prazo_turno', sala=nome_sala, turno=turno), sala['lock']:
+            if self.salas.get(nome_sala) is not sala: return # Sala já foi removida
+            estado = sala['estado']
+            if estado.turnos != turno or not estado.jogo_iniciado or estado.vencedor is not None:
+                return # O jogador agiu a tempo
+            id_vez = estado.jogadores_conectados[estado.jogador_atual]
+            self.log.info('tempo_esgotado', sala=nome_sala, jogador=id_vez, turno=turno)
+            if self.registrar(sala, id_vez, {'tipo': 'COMPRAR', 'jogar': True}):
+                self.broadcast_sala(nome_sala, estado)
+
+    def remover_sala(self, nome_sala):
+        """Destrói a sala e cancela o prazo de turno pendente."""
+        sala = self.salas.pop(nome_sala, None)
+        if sala and sala['timer_turno']:
+            sala['timer_turno'].cancelar()
+        if sala and sala['replay']:
+            sala['replay'].fechar()
+        if sala and sala['plateia']:
+            sala['plateia'].encerrar(empacotar({'tipo': MSG_ERRO, 'msg': 'A sala foi encerrada.'}))
+        if sala:
+            for temporizador in sala['desconectados'].values():
+                temporizador.cancelar()
+            for token in sala['sessoes'].values():
+                self.sessoes.pop(token, None)
+            self.atualizar_degradado()
+
+    def coletar_salas(self):
+        """
+        Passada do coletor (a cada INTERVALO_COLETA, no executor): remove as salas ociosas além do TTL,
+        desconecta quem ainda estava nelas e atualiza a estimativa de memória das salas.
+        """
+        try:
+            agora = time.monotonic()
+            removidas = {}
+            liberados = restantes = 0
+            for nome, sala in list(self.salas.items()):
+                with sala['lock']:
+                    if self.salas.get(nome) is not sala: continue
+                    tamanho = memoria_sala(sala)
+                    motivo = motivo_coleta(sala, agora)
+                    if motivo is None:
+                        restantes += tamanho
+                        continue
+                    conexoes = list(sala['clientes'])
+                    self.remover_sala(nome)
+                # O handle_client de cada um recebe o fim da conexão e encerra (a sala já não existe)
+                for conn in conexoes:
+                    try:
+                        conn.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                removidas[motivo] = removidas.get(motivo, 0) + 1
+                liberados += tamanho
+                self.metricas.contar('uno_salas_coletadas_total', motivo=motivo)
+                self.log.info('sala_coletada', sala=nome, motivo=motivo, bytes=tamanho, conexoes=len(conexoes),
+                         ociosa=round(agora - sala['ultima_atividade']))
+            self.memoria_salas = restantes
+            if removidas:
+                self.metricas.contar('uno_bytes_coletados_total', liberados)
+                self.log.info('coleta_salas', removidas=removidas, bytes_liberados=liberados,
+                         salas=len(self.salas), bytes_salas=restantes)
+        finally:
+            if not self.encerrado.is_set():
+                self.roda.agendar(INTERVALO_COLETA, self.submeter, self.coletar_salas)
+
+    # --- DRENAGEM E REINÍCIO A QUENTE ---
+    def restaurar_sala(self, dados, agora):
+        """
+        Recria uma sala salva pela drenagem. Os jogadores humanos voltam como desconectados: o assento
+        fica reservado por tempo_reconexao para a reconexão com o mesmo token de sessão, e o prazo de
+        turno e os bots seguem jogando enquanto isso.
+        """
+        nome = dados['nome']
+        estado = EstadoJogo.descompactar(dados['estado'])
+        estado.tempo_turno = self.tempo_turno # Configuração do processo novo
+        sala = nova_sala(nome, estado, self.criar_replay(nome, estado)) # Replay novo, começando pelo estado restaurado
+        sala.update({
+            # Bots com a mesma estratégia; o gerador recomeça de uma semente derivada da posição atual
+            'bots': {id_bot: criar_estrategia(nome_estrategia, f'{estado.semente}:{id_bot[1]}:{estado.eventos}')
+                     for id_bot, nome_estrategia in dados['bots'].items()},
+            'inicio_registro': estado.eventos, # O registro recomeça aqui; as posições continuam as mesmas
+            'sessoes': dados['sessoes'],
+            'nomes': dados.get('nomes', {}), # Arquivos de versões anteriores não têm os nomes
+            'inicio_partida': dados['inicio_partida'],
+            'partida_gravada': dados['partida_gravada'],
+            'ultima_atividade': agora - dados['ociosa']
+        }) # O snapshot de reconexão é feito quando alguém precisa (resposta_reconexao, memoria_sala)
+        for id_jogador, token in sala['sessoes'].items():
+            self.sessoes[token] = (nome, id_jogador)
+        for id_jogador in estado.jogadores_conectados:
+            if id_jogador not in sala['bots']:
+                sala['desconectados'][id_jogador] = self.roda.agendar(
+                    self.tempo_reconexao, self.submeter, self.expirar_reconexao, nome, sala, id_jogador)
+        self.salas[nome] = sala
+        self.agendar_turno(nome, sala, estado)
+        self.agendar_bot(nome, sala, estado)
+
+    def salvar_salas(self, caminho):
+        """
+        Retira todas as salas do servidor e as grava em 'caminho' (pickle do formato compacto, com troca
+        atômica do arquivo). Cada sala é exportada e removida sob a própria trava: depois disso nenhuma
+        ação, prazo de turno ou bot a altera mais. Retorna quantas salas foram salvas.
+        """
+        agora = time.monotonic()
+        exportadas = []
+        gc.disable() # Milhares de dicionários novos de uma vez: sem passadas do coletor de ciclos no meio
+        try:
+            for nome, sala in list(self.salas.items()):
+                with sala['lock']:
+                    if self.salas.get(nome) is not sala: continue
+                    exportadas.append(exportar_sala(sala, agora))
+                    self.remover_sala(nome)
+            if caminho and exportadas:
+                temporario = caminho + '.tmp'
+                with open(temporario, 'wb') as arquivo:
+                    pickle.dump({'versao': VERSAO_ARQUIVO_SALAS, 'salas': exportadas}, arquivo, pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, caminho)
+        finally:
+            gc.enable()
+        return len(exportadas)
+
+    def restaurar_salas(self, caminho):
+        """Restaura as salas salvas pela drenagem do processo anterior e apaga o arquivo. Retorna quantas."""
+        if not caminho or not os.path.exists(caminho):
+            return 0
+        inicio = time.perf_counter()
+        gc.disable()
+        try:
+            with open(caminho, 'rb') as arquivo:
+                dados = pickle.load(arquivo)
+            if dados.get('versao') != VERSAO_ARQUIVO_SALAS:
+                self.log.erro('restauracao_ignorada', arquivo=caminho, versao=dados.get('versao'))
+                return 0
+            agora = time.monotonic()
+            for dados_sala in dados['salas']:
+                self.restaurar_sala(dados_sala, agora)
+        finally:
+            gc.enable()
+        os.remove(caminho) # Restaurado uma única vez: um novo reinício não ressuscita salas antigas
+        self.atualizar_degradado()
+        self.log.info('salas_restauradas', salas=len(dados['salas']), arquivo=caminho,
+                 segundos=round(time.perf_counter() - inicio, 3))
+        return len(dados['salas'])
+
+    def partidas_em_andamento(self):
+        return any(sala['estado'].jogo_iniciado and sala['estado'].vencedor is None
+                   for sala in list(self.salas.values()))
+
+    def drenar(self, prazo=PRAZO_DRENAGEM):
+        """
+        Reinício a quente: recusa salas novas, espera até 'prazo' segundos as partidas em andamento
+        terminarem, fecha o socket do servidor, salva as salas que restaram em arquivo_salas e para o
+        servidor (encerrando as conexões). Os clientes que estavam numa sala reconectam (com o token
+        de sessão) ao próximo processo, que restaura as salas ao subir. Retorna False se já havia
+        uma drenagem.
+        """
+        with self.lock_conexoes:
+            if self.drenando or self.parado:
+                return False
+            self.drenando = True
+        # Com o diretório, as salas novas passam já para os outros nós (os anúncios levam 'drenando')
+        self.anel = AnelConsistente(no for no in self.anel.nos if no != self.endereco_publico)
+        self.log.aviso('drenagem_iniciada', salas=len(self.salas), prazo=prazo)
+        limite = time.monotonic() + prazo
+        while self.partidas_em_andamento() and time.monotonic() < limite:
+            time.sleep(0.5)
+
+        self.fechar_escuta()
+        inicio = time.perf_counter()
+        salvas = self.salvar_salas(self.arquivo_salas)
+        duracao = time.perf_counter() - inicio
+        # Só agora (com o arquivo gravado) as conexões caem e os clientes começam a reconectar
+        conexoes = len(self.clientes)
+        self.parar()
+        self.log.aviso('drenagem_concluida', salas_salvas=salvas, arquivo=self.arquivo_salas,
+                  segundos=round(duracao, 3), conexoes=conexoes)
+        print(f"Drenagem concluída: {salvas} sala(s) salva(s) em {self.arquivo_salas} ({duracao:.3f}s)")
+        return True
+
+    def rotas_drenagem(self):
+        """Rota HTTP (servidor de métricas) que inicia a drenagem: /drenar?prazo=segundos."""
+        def iniciar(parametros):
+            prazo = float(parametros.get('prazo', PRAZO_DRENAGEM))
+            if self.drenando:
+                return 'text/plain', b"drenagem ja em andamento\n"
+            threading.Thread(target=self.drenar, args=(prazo,), name='drenagem').start()
+            return 'text/plain', f"drenagem iniciada (prazo {prazo:.0f}s)\n".encode()
+        return {'/drenar': iniciar}
+
+    # --- ESPECTADORES ---
+    def assistir_sala(self, conn, nome, atraso):
+        """
+        Coloca a conexão na plateia da sala (criada aqui, com a visão atual, para o primeiro espectador).
+        O atraso pedido fica entre ATRASO_ESPECTADOR e ATRASO_MAXIMO, em segundos inteiros (um grupo de
+        transmissão por atraso). Retorna False (e avisa o cliente) se não foi possível.
+        """
+        sala = self.salas.get(nome)
+        if sala is None:
+            self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Sala não encontrada!'})
+            return False
+        with sala['lock']:
+            if self.salas.get(nome) is not sala:
+                self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Sala não encontrada!'})
+                return False
+            plateia = sala['plateia']
+            if plateia is not None and len(plateia) >= self.limites['espectadores_por_sala']:
+                self.metricas.contar('uno_recusas_total', motivo='limite_espectadores')
+                self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Plateia cheia!'})
+                return False
+            try:
+                atraso = round(min(max(float(atraso or 0), ATRASO_ESPECTADOR), ATRASO_MAXIMO))
+            except (TypeError, ValueError):
+                atraso = round(ATRASO_ESPECTADOR)
+            # A confirmação vai antes de entrar na plateia: depois disso só a transmissão escreve na conexão
+            self.enviar(conn, {'tipo': 'ASSISTINDO', 'nome': nome, 'atraso': atraso})
+            if plateia is None:
+                plateia = sala['plateia'] = Plateia(self.roda, self.submeter, self.metricas)
+                plateia.publicar(empacotar(sala['estado'].visao_publica()))
+                self.metricas.contar('uno_visoes_total')
+            plateia.adicionar(conn, atraso)
+        self.log.info('espectador', sala=nome, atraso=atraso, espectadores=len(plateia))
+        return True
+
+    def deixar_plateia(self, nome, conn):
+        sala = self.salas.get(nome)
+        if sala is not None and sala['plateia'] is not None:
+            sala['plateia'].remover(conn)
+
+    # --- VÁRIOS NÓS (DIRETÓRIO DE SALAS) ---
+    def resumo_salas(self):
+        """Salas deste nó como aparecem no lobby (LISTAR_SALAS e anúncios ao diretório)."""
+        lista = []
+        for nome, info in list(self.salas.items()):
+            estado = info['estado']
+            lista.append({
+                'nome': nome,
+                'jogadores': len(info['clientes']),
+                'status': 'Jogando' if estado.jogo_iniciado else 'Aguardando'
+            })
+        return lista
+
+    def anunciar_no(self):
+        """
+        Anuncia este nó e as suas salas ao diretório (no executor, a cada INTERVALO_ANUNCIO) e guarda a
+        resposta: o anel com os nós ativos e as salas dos outros nós. Se o diretório não responde, o
+        nó segue com o último anel conhecido.
+        """
+        try:
+            with socket.create_connection(separar_endereco(self.diretorio), timeout=1.0) as conn:
+                conn.sendall(empacotar({'tipo': MSG_ANUNCIAR_NO, 'endereco': self.endereco_publico,
+                                        'salas': self.resumo_salas(), 'drenando': self.drenando}))
+                resposta = receber_mensagem(conn)
+            nos = set(resposta['nos'])
+            if self.drenando:
+                nos.discard(self.endereco_publico) # Salas novas vão para os outros nós
+            else:
+                nos.add(self.endereco_publico) # A resposta pode ter sido montada antes do primeiro anúncio
+            if tuple(sorted(nos)) != self.anel.nos:
+                self.anel = AnelConsistente(nos)
+                self.log.info('anel_atualizado', no=self.endereco_publico, nos=sorted(nos))
+            self.salas_remotas = {sala['nome']: (no, sala) for no, lista in resposta['salas'].items()
+                                  if no != self.endereco_publico for sala in lista}
+            if not self.diretorio_ok:
+                self.log.info('diretorio_conectado', diretorio=self.diretorio, no=self.endereco_publico)
+            self.diretorio_ok = True
+        except (OSError, EOFError, TypeError, KeyError) as e: # TypeError: conexão fechada sem resposta
+            if self.diretorio_ok is not False:
+                self.log.aviso('diretorio_indisponivel', diretorio=self.diretorio, erro=repr(e))
+            self.diretorio_ok = False
+        finally:
+            if not self.encerrado.is_set():
+                self.roda.agendar(INTERVALO_ANUNCIO, self.submeter, self.anunciar_no)
+
+    def sair_do_diretorio(self):
+        """Avisa o diretório que este nó parou (sem esperar o TTL_NO)."""
+        try:
+            with socket.create_connection(separar_endereco(self.diretorio), timeout=1.0) as conn:
+                conn.sendall(empacotar({'tipo': MSG_SAIR_NO, 'endereco': self.endereco_publico}))
+        except OSError:
+            pass
+
+    def no_da_sala(self, nome):
+        """Endereço do nó onde a sala está (ou deve ser criada), ou None se é este nó."""
+        if nome in self.salas:
+            return None
+        if nome in self.salas_remotas: # Sala existente fica onde foi criada, mesmo que o anel tenha mudado
+            return self.salas_remotas[nome][0]
+        no = self.anel.no_da_sala(nome)
+        return None if no in (None, self.endereco_publico) else no
+
+    def redirecionar(self, conn, req, no):
+        """Manda o cliente repetir o pedido no nó dono da sala (uma vez só: o pedido vai marcado)."""
+        self.metricas.contar('uno_redirecionamentos_total', tipo=req['tipo'])
+        self.enviar(conn, {'tipo': MSG_REDIRECIONAR, 'endereco': separar_endereco(no),
+                           'pedido': {**req, 'redirecionado': True}})
+
+    def broadcast_sala(self, nome_sala, estado):
+        """
+        Envia uma mensagem para todos os jogadores conectados em uma sala específica.
+        Útil para atualizar o estado do jogo para todos ao mesmo tempo.
+        """
+        if nome_sala not in self.salas: return
+
+        sala = self.salas[nome_sala]
+        estado.versao += 1 # Nova versão oficial (usada pelos clientes para reconciliar previsões)
+        sala['ultima_atividade'] = time.monotonic()
+        self.agendar_turno(nome_sala, sala, estado)
+        self.agendar_bot(nome_sala, sala, estado)
+        # Serializa a mensagem apenas uma vez para eficiência (pickle é custoso)
+        inicio = time.perf_counter()
+        with self.rastreador.span('serializar', sala=nome_sala, versao=estado.versao):
+            data = empacotar(estado)
+        serializado = time.perf_counter()
+
+        enviados = 0
+        with self.rastreador.span('enviar', sala=nome_sala, destinatarios=len(sala['clientes']), bytes=len(data)):
+            for cliente in sala['clientes']:
+                try:
+                    cliente.sendall(data)
+                    enviados += 1
+                except:
+                    # Se falhar ao enviar (cliente caiu), ignora.
+                    # A remoção do cliente será tratada no loop principal dele (handle_client).
+                    self.metricas.contar('uno_falhas_envio_total')
+
+        # Espectadores: a visão pública é empacotada uma vez e o mesmo buffer vai para toda a plateia
+        if sala['plateia'] is not None:
+            with self.rastreador.span('visao', sala=nome_sala, espectadores=len(sala['plateia'])):
+                sala['plateia'].publicar(empacotar(estado.visao_publica()))
+            self.metricas.contar('uno_visoes_total')
+
+        metricas = self.metricas
+        metricas.observar('uno_broadcast_serializacao_segundos', serializado - inicio)
+        metricas.observar('uno_broadcast_envio_segundos', time.perf_counter() - serializado)
+        metricas.contar('uno_broadcast_total')
+        metricas.contar('uno_broadcast_destinatarios_total', len(sala['clientes']))
+        metricas.contar('uno_bytes_enviados_total', len(data) * enviados)
+
+    def handle_client(self, conn, addr):
+        """
+        Função executada em uma thread separada para cada cliente conectado.
+        Gerencia todo o ciclo de vida da conexão desse cliente.
+        """
+        self.log.info('conexao', endereco=addr)
+        self.metricas.contar('uno_conexoes_total')
+        salas = self.salas
+        sala_atual = None # Nome da sala onde o cliente está (None se estiver no lobby)
+        limitador = LimitadorConexao(self.taxas, TOLERANCIA_ABUSO) # Só esta thread usa (sem trava)
+        player_id = None  # ID único do jogador (usamos o endereço IP:Porta como ID)
+        assistindo = None # Nome da sala que o cliente assiste como espectador (None se não assiste)
+
+        try:
+            while True:
+                # --- LOOP DO ESPECTADOR (Assistindo uma sala) ---
+                # Só a transmissão da sala escreve nesta conexão: fora SAIR_SALA, as mensagens são ignoradas
+                if assistindo:
+                    dados = receber_quadro(conn)
+                    if dados is None: break
+
+                    msg = self.desserializar(dados)
+                    tipo = self.rotulo_tipo(msg)
+                    situacao = limitador.verificar(tipo)
+                    if situacao == ABUSO:
+                        self.deixar_plateia(assistindo, conn) # Antes do aviso de erro, que usa a conexão
+                        assistindo = None
+                    if situacao != PERMITIDA:
+                        if self.descartar_mensagem(conn, addr, tipo, situacao):
+                            break
+                        continue
+                    if tipo == MSG_SAIR_SALA: # Volta ao lobby
+                        self.deixar_plateia(assistindo, conn)
+                        assistindo = None
+
+                # --- LOOP DO LOBBY (Antes de entrar numa sala) ---
+                elif not sala_atual:
+                    dados = receber_quadro(conn)
+                    if dados is None: break # Conexão fechada pelo cliente
+
+                    with self.rastreador.requisicao('mensagem', endereco=addr):
+                        req = self.desserializar(dados)
+                        tipo = self.rotulo_tipo(req)
+                        situacao = limitador.verificar(tipo)
+                        if situacao != PERMITIDA:
+                            if self.descartar_mensagem(conn, addr, tipo, situacao):
+                                break
                             continue
-                            
-                        if estado.jogo_iniciado:
-                            conn.send(pickle.dumps({'tipo': MSG_ERRO, 'msg': 'Jogo já começou!'}))
+                        with self.metricas.medir('uno_tratamento_segundos', tipo=tipo), self.rastreador.span('tratar', tipo=tipo):
+                            # 1. Listar Salas
+                            if req['tipo'] == MSG_LISTAR_SALAS:
+                                self.enviar_lista_salas(conn)
+
+                            # 2. Criar Sala
+                            elif req['tipo'] == MSG_CRIAR_SALA:
+                                nome = req['nome']
+                                destino = None if req.get('redirecionado') else self.no_da_sala(nome)
+                                if destino:
+                                    self.redirecionar(conn, req, destino)
+                                elif nome in salas or nome in self.salas_remotas:
+                                    # Também as salas de outros nós: enquanto os anéis dos nós divergem (logo
+                                    # depois de um nó entrar ou sair), dois nós podem se achar donos do mesmo nome
+                                    self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Sala já existe!'})
+                                elif self.drenando:
+                                    self.metricas.contar('uno_recusas_total', motivo='drenagem')
+                                    self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Servidor reiniciando: não aceita salas novas agora.'})
+                                elif len(salas) >= self.limites['salas']:
+                                    self.metricas.contar('uno_recusas_total', motivo='limite_salas')
+                                    self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Limite de salas do servidor atingido. Entre em uma sala existente.'})
+                                else:
+                                    # Cria nova sala com estado inicial padrão
+                                    estado = EstadoJogo(self.semente_sala(nome))
+                                    estado.tempo_turno = self.tempo_turno
+                                    sala = nova_sala(nome, estado, self.criar_replay(nome, estado))
+                                    tirar_snapshot(sala)
+                                    salas[nome] = sala
+                                    self.atualizar_degradado()
+                                    self.log.info('sala_criada', sala=nome, semente=estado.semente, endereco=addr)
+                                    self.enviar(conn, {'tipo': 'SUCESSO_CRIAR', 'nome': nome})
+                                    # O cliente deve enviar ENTRAR_SALA em seguida automaticamente (nesta conexão)
+
+                            # 3. Entrar em Sala
+                            elif req['tipo'] == MSG_ENTRAR_SALA:
+                                nome = req['nome']
+                                destino = None if req.get('redirecionado') else self.no_da_sala(nome)
+                                if destino:
+                                    self.redirecionar(conn, req, destino)
+                                elif nome in salas:
+                                    sala = salas[nome]
+                                    estado = sala['estado']
+
+                                    with sala['lock']: # Evita corrida com outras entradas/saídas e com o temporizador
+                                        # Validações
+                                        if salas.get(nome) is not sala: # Removida (ex: pelo coletor) antes do lock
+                                            self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Sala não encontrada!'})
+                                            continue
+
+                                        if len(estado.jogadores_conectados) >= self.limites['jogadores_por_sala']:
+                                            self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Sala cheia!'})
+                                            continue
+
+                                        if estado.jogo_iniciado:
+                                            self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Jogo já começou!'})
+                                            continue
+
+                                        # Sucesso: Adiciona cliente à sala
+                                        sala_atual = nome
+                                        player_id = addr
+                                        sala['clientes'].append(conn)
+                                        sala['conexoes'][player_id] = conn
+                                        token = secrets.token_hex(16)
+                                        sala['sessoes'][player_id] = token
+                                        self.sessoes[token] = (nome, player_id)
+                                        sala['nomes'][player_id] = nome_jogador_sala(sala, req.get('jogador'), addr[0])
+
+                                        # Atualiza o estado do jogo: senta o jogador (o primeiro vira anfitrião)
+                                        self.registrar(sala, player_id, {'tipo': MSG_ENTRAR_SALA})
+
+                                        # Envia confirmação para o cliente com seu ID e o token para reconectar se cair
+                                        self.enviar(conn, {'tipo': 'ENTROU', 'id': player_id, 'token': token})
+                                        # Envia o estado atualizado para TODOS na sala (para verem o novo jogador)
+                                        self.broadcast_sala(sala_atual, estado)
+
+                                else:
+                                    self.enviar(conn, {'tipo': MSG_ERRO, 'msg': 'Sala não encontrada!'})
+
+                            # 4. Reconectar (a conexão anterior caiu no meio da partida)
+                            elif req['tipo'] == MSG_RECONECTAR:
+                                nome, id_antigo = self.sessoes.get(req.get('token'), (None, None))
+                                sala = salas.get(nome)
+                                if sala is None:
+                                    self.enviar(conn, {'tipo': 'RECONEXAO_RECUSADA', 'msg': 'Sessão expirada.'})
+                                    continue
+                                with sala['lock']:
+                                    if salas.get(nome) is not sala or id_antigo not in sala['estado'].jogadores_conectados:
+                                        self.enviar(conn, {'tipo': 'RECONEXAO_RECUSADA', 'msg': 'Sessão expirada.'})
+                                        continue
+                                    temporizador = sala['desconectados'].pop(id_antigo, None)
+                                    if temporizador:
+                                        temporizador.cancelar()
+                                    # A conexão antiga pode ainda não ter sido dada como morta (queda sem FIN):
+                                    # assume o lugar dela, e a thread antiga só fecha o socket
+                                    antiga = sala['conexoes'].get(id_antigo)
+                                    if antiga is not None:
+                                        if antiga in sala['clientes']:
+                                            sala['clientes'].remove(antiga)
+                                        try:
+                                            antiga.shutdown(socket.SHUT_RDWR)
+                                        except OSError:
+                                            pass
+                                    sala_atual = nome
+                                    player_id = id_antigo
+                                    sala['clientes'].append(conn)
+                                    sala['conexoes'][player_id] = conn
+                                    resposta = resposta_reconexao(sala, player_id, req['token'], req.get('eventos'))
+                                    self.enviar(conn, resposta)
+                                    self.log.info('reconexao', sala=nome, jogador=player_id, endereco=addr,
+                                             eventos=len(resposta['eventos']), snapshot=resposta['snapshot'] is not None)
+
+                            # 5. Assistir (espectador: recebe só a visão pública, mesmo com a partida em andamento)
+                            elif req['tipo'] == MSG_ASSISTIR_SALA:
+                                nome = req['nome']
+                                destino = None if req.get('redirecionado') else self.no_da_sala(nome)
+                                if destino:
+                                    self.redirecionar(conn, req, destino)
+                                elif self.assistir_sala(conn, nome, req.get('atraso')):
+                                    assistindo = nome
+
+                # --- LOOP DO JOGO (Dentro de uma sala) ---
+                else:
+                    dados = receber_quadro(conn)
+                    if dados is None: break
+
+                    with self.rastreador.requisicao('mensagem', sala=sala_atual, jogador=player_id):
+                        acao = self.desserializar(dados)
+                        tipo = self.rotulo_tipo(acao) # Antes de tudo: 'acao' pode nem ser um dicionário
+                        self.log.debug('acao', sala=sala_atual, jogador=player_id, tipo=tipo)
+                        situacao = limitador.verificar(tipo)
+                        if situacao != PERMITIDA:
+                            if self.descartar_mensagem(conn, addr, tipo, situacao):
+                                break
                             continue
+                        with self.metricas.medir('uno_tratamento_segundos', tipo=tipo), self.rastreador.span('tratar', tipo=tipo):
+                            sala = salas.get(sala_atual)
+                            if sala is None: break # Sala removida (coletor ou drenagem): a conexão é encerrada
+                            estado = sala['estado']
 
-                        # Sucesso: Adiciona cliente à sala
-                        sala_atual = nome
-                        player_id = addr
-                        sala['clientes'].append(conn)
-                        
-                        # Atualiza o estado do jogo
-                        estado.jogadores_conectados.append(player_id)
-                        estado.maos[player_id] = [] # Inicializa mão vazia
-                        
-                        # Define o primeiro jogador como anfitrião (Host)
-                        if estado.host_id is None:
-                            estado.host_id = player_id
-                        
-                        # Distribui as 7 cartas iniciais para este jogador
-                        for _ in range(7):
-                            estado.comprar_carta(player_id)
-                        
-                        # Envia confirmação para o cliente com seu ID
-                        conn.send(pickle.dumps({'tipo': 'ENTROU', 'id': player_id}))
-                        # Envia o estado atualizado para TODOS na sala (para verem o novo jogador)
-                        broadcast_sala(sala_atual, estado)
-
-                    else:
-                        conn.send(pickle.dumps({'tipo': MSG_ERRO, 'msg': 'Sala não encontrada!'}))
-
-            # --- LOOP DO JOGO (Dentro de uma sala) ---
-            else:
-                data = conn.recv(4096)
-                if not data: break
-                acao = pickle.loads(data)
-                
-                sala = salas[sala_atual]
-                estado = sala['estado']
-                
-                # 4. Sair da Sala (Voltar ao Lobby)
-                if acao['tipo'] == MSG_SAIR_SALA:
-                    # Remove jogador da lista de clientes da sala
+                            with sala['lock']: # Uma ação por vez em cada sala (jogadores e temporizador)
+                                if salas.get(sala_atual) is not sala: break # Removida enquanto esperava a trava
+                                # 6. Sair da Sala (Voltar ao Lobby)
+                                if acao['tipo'] == MSG_SAIR_SALA:
+                                    # Remove jogador da lista de clientes da sala
+                                    if conn in sala['clientes']:
+                                        sala['clientes'].remove(conn)
+                                    sala['conexoes'].pop(player_id, None)
+                                    self.encerrar_sessao(sala, player_id)
+
+                                    # Remove jogador do estado do jogo (e passa a liderança se era o anfitrião)
+                                    self.registrar(sala, player_id, {'tipo': MSG_SAIR_SALA})
+
+                                    # Se a sala ficar vazia, ela é destruída
+                                    if sala_vazia(sala):
+                                        self.remover_sala(sala_atual)
+                                    else:
+                                        # Avisa os outros que alguém saiu
+                                        self.broadcast_sala(sala_atual, estado)
+
+                                    # Reseta variáveis locais para voltar ao loop do lobby
+                                    sala_atual = None
+                                    player_id = None
+                                    continue
+
+                                # Registra a última ação processada deste jogador, aplicada ou não (o cliente
+                                # usa isso para descartar as jogadas que já previu localmente)
+                                seq = acao.get('seq')
+                                if seq is not None:
+                                    estado.acoes_confirmadas[player_id] = seq
+                                versao = estado.versao
+
+                                # 7. Revanche (Apenas Anfitrião, depois do fim da partida): a sala volta à
+                                # espera com os mesmos jogadores e bots, reaproveitando o mesmo EstadoJogo
+                                if acao['tipo'] == MSG_REVANCHE:
+                                    if player_id == estado.host_id and self.registrar(sala, player_id, {'tipo': MSG_REVANCHE}):
+                                        self.broadcast_sala(sala_atual, estado)
+
+                                # 8. Processamento de Ações de Jogo
+                                elif estado.jogo_iniciado:
+                                    # Aplica a ação com as regras do protocolo (JOGAR, COMPRAR, GRITAR_UNO),
+                                    # incluindo as ações compostas e os passes automáticos: um único broadcast por passo.
+                                    # Eventos da sala (entrar, configurar...) enviados no meio da partida são ignorados
+                                    alterou = acao['tipo'] in ACOES_JOGO and self.registrar(sala, player_id, acao)
+
+                                    # Se houve mudança no estado, envia para todos
+                                    if alterou:
+                                        self.broadcast_sala(sala_atual, estado)
+
+                                # 9. Configuração da Sala (Apenas Anfitrião antes do jogo começar)
+                                elif not estado.jogo_iniciado and player_id == estado.host_id:
+                                    if acao['tipo'] == MSG_INICIAR_JOGO:
+                                        # Verifica se tem jogadores suficientes (minimo 2, contando os bots)
+                                        num_jogadores = len(estado.jogadores_conectados)
+
+                                        if self.registrar(sala, player_id, {'tipo': MSG_INICIAR_JOGO}):
+                                            self.broadcast_sala(sala_atual, estado)
+                                        else:
+                                            self.log.debug('inicio_recusado', sala=sala_atual, jogadores=num_jogadores)
+
+                                    elif acao['tipo'] == MSG_ADICIONAR_BOT:
+                                        if len(estado.jogadores_conectados) < self.limites['jogadores_por_sala']:
+                                            id_bot = (PREFIXO_BOT, len(sala['bots']) + 1)
+                                            sala['bots'][id_bot] = criar_estrategia(acao.get('estrategia'),
+                                                                                    f'{estado.semente}:{id_bot[1]}')
+                                            self.registrar(sala, id_bot, {'tipo': MSG_ENTRAR_SALA}) # Bot entra como um jogador
+                                            self.broadcast_sala(sala_atual, estado)
+
+                                    elif acao['tipo'] == MSG_CONFIGURAR_SALA:
+                                        # Só aceita opções conhecidas (valores booleanos)
+                                        self.registrar(sala, player_id, {'tipo': MSG_CONFIGURAR_SALA,
+                                                                         'opcoes': dict(acao.get('opcoes', {}))})
+                                        self.broadcast_sala(sala_atual, estado)
+
+                                # Ação com seq que não gerou broadcast (recusada ou sem efeito): a confirmação vai
+                                # só para quem enviou, e o cliente desfaz a previsão já, sem esperar TEMPO_MAX_PREVISAO
+                                if seq is not None and estado.versao == versao:
+                                    self.enviar(conn, {'tipo': MSG_CONFIRMAR, 'seq': seq})
+
+        except Exception as e:
+            self.log.erro('erro_cliente', endereco=addr, sala=sala_atual, jogador=player_id, erro=repr(e))
+
+        finally:
+            # --- LIMPEZA AO DESCONECTAR ---
+            # A conexão caiu sem SAIR_SALA: o assento (e a mão) fica reservado por tempo_reconexao
+            # esperando o jogador voltar com o token de sessão; enquanto isso o prazo de turno joga por ele
+            sala = salas.get(sala_atual)
+            if sala is not None:
+                with sala['lock']:
                     if conn in sala['clientes']:
                         sala['clientes'].remove(conn)
-                    
-                    # Remove jogador do estado do jogo
-                    if player_id in estado.jogadores_conectados:
-                        estado.jogadores_conectados.remove(player_id)
-                        if player_id in estado.maos:
-                            del estado.maos[player_id]
-                        
-                        # Se o anfitrião saiu, passa a liderança para o próximo
-                        if estado.host_id == player_id and estado.jogadores_conectados:
-                            estado.host_id = estado.jogadores_conectados[0]
-                    
-                    # Se a sala ficar vazia, ela é destruída
-                    if not sala['clientes']:
-                        del salas[sala_atual]
-                    else:
-                        # Avisa os outros que alguém saiu
-                        broadcast_sala(sala_atual, estado)
-                        
-                    # Reseta variáveis locais para voltar ao loop do lobby
-                    sala_atual = None
-                    player_id = None
-                    continue
-
-                # 5. Processamento de Ações de Jogo
-                if estado.jogo_iniciado:
-                    alterou = False # Flag para saber se precisamos reenviar o estado
-                    
-                    # Ações do Jogador da Vez (Jogar ou Comprar)
-                    if estado.jogadores_conectados[estado.jogador_atual] == player_id:
-                        if acao['tipo'] == 'JOGAR':
-                            cor = acao.get('cor_escolhida')
-                            # Tenta jogar a carta (validação feita dentro de jogar_carta)
-                            alterou = estado.jogar_carta(player_id, acao['indice'], cor)
-                        elif acao['tipo'] == 'COMPRAR':
-                            estado.comprar_carta(player_id)
-                            estado.avancar_turno() # Passa a vez após comprar
-                            alterou = True
-                    
-                    # Ações Globais (Qualquer um pode fazer a qualquer momento)
-                    if acao['tipo'] == MSG_GRITAR_UNO:
-                        # Caso 1: O próprio jogador grita UNO (para se proteger)
-                        if len(estado.maos[player_id]) == 1:
-                            if player_id not in estado.uno_safe:
-                                estado.uno_safe.append(player_id)
-                                alterou = True
-                        
-                        # Caso 2: Alguém grita UNO para denunciar outro (Counter-UNO)
-                        for pid in estado.jogadores_conectados:
-                            if pid != player_id:
-                                # Se alguém tem 1 carta e NÃO está safe (esqueceu de gritar)
-                                if len(estado.maos[pid]) == 1 and pid not in estado.uno_safe:
-                                    # Penalidade: Compra 2 cartas
-                                    estado.comprar_carta(pid)
-                                    estado.comprar_carta(pid)
-                                    alterou = True
-
-                    # Se houve mudança no estado, envia para todos
-                    if alterou:
-                        broadcast_sala(sala_atual, estado)
-                
-                # 6. Configuração da Sala (Apenas Anfitrião antes do jogo começar)
-                elif not estado.jogo_iniciado and player_id == estado.host_id:
-                    if acao['tipo'] == MSG_INICIAR_JOGO:
-                        # Verifica se tem jogadores suficientes (minimo 2)
-                        num_jogadores = len(sala['clientes'])
-                        
-                        if num_jogadores >= 2:
-                            estado.jogo_iniciado = True
-                            broadcast_sala(sala_atual, estado)
-                        else:
-                            print(f"Tentativa de iniciar com {num_jogadores} jogadores. Mínimo: 2")
-
-    except Exception as e:
-        print(f"Erro com cliente {addr}: {e}")
-    
-    finally:
-        # --- LIMPEZA AO DESCONECTAR ---
-        # Garante que o jogador seja removido corretamente se a conexão cair
-        if sala_atual in salas:
-            sala = salas[sala_atual]
-            estado = sala['estado']
-            
-            if conn in sala['clientes']:
-                sala['clientes'].remove(conn)
-            
-            if player_id is not None and player_id in estado.jogadores_conectados:
-                estado.jogadores_conectados.remove(player_id)
-                if player_id in estado.maos:
-                    del estado.maos[player_id]
-                
-                if estado.host_id == player_id and estado.jogadores_conectados:
-                    estado.host_id = estado.jogadores_conectados[0]
-                
-                broadcast_sala(sala_atual, estado)
-            
-            if not sala['clientes']:
-                del salas[sala_atual]
-                print(f"Sala {sala_atual} removida (vazia).")
-        
-        conn.close()
-        print(f"Conexão fechada: {addr}")
-
-def start():
-    """Função principal que aceita novas conexões."""
-    while True:
-        conn, addr = server.accept()
-        # Cria uma nova thread para cada cliente
-        thread = threading.Thread(target=handle_client, args=(conn, addr))
-        thread.start()
-
-# Inicia o servidor
-start()
+
+                    # Se outra conexão já assumiu o assento (reconexão), não há mais nada a fazer
+                    if player_id is not None and sala['conexoes'].get(player_id) is conn:
+                        del sala['conexoes'][player_id]
+                        sala['desconectados'][player_id] = self.roda.agendar(
+                            self.tempo_reconexao, self.submeter, self.expirar_reconexao, sala_atual, sala, player_id)
+
+                    if sala_vazia(sala) and salas.get(sala_atual) is sala:
+                        self.remover_sala(sala_atual)
+                        self.log.info('sala_removida', sala=sala_atual)
+
+            if assistindo:
+                self.deixar_plateia(assistindo, conn)
+            with self.lock_conexoes:
+                self.clientes.pop(conn, None)
+            conn.close()
+            self.liberar_conexao(addr[0])
+            self.metricas.contar('uno_desconexoes_total')
+            self.log.info('desconexao', endereco=addr, sala=sala_atual, jogador=player_id)
+
+if __name__ == '__main__':
+    # Inicia o servidor
+    Servidor().executar()
@@ -0,0 +1,225 @@
+"""
+ARQUIVO: simulador.py
+FUNÇÃO: Simular partidas completas de UNO sem rede e sem interface, usando todos os núcleos.
+DESCRIÇÃO: Joga N partidas com protocolo.EstadoJogo e as estratégias de bots.py, distribuídas
+em um ProcessPoolExecutor. Os resultados são agregados conforme os lotes terminam (taxa de
+vitória por estratégia e por assento, média de turnos, embaralhamentos e reciclagens do
+descarte) e o progresso pode ser salvo em um checkpoint para retomar execuções longas.
+
+USO:
+    python3 simulador.py --partidas 100000 --politicas gulosa,aleatoria,gulosa,aleatoria
+    python3 simulador.py --partidas 1000000 --checkpoint noite.json        # retoma se existir
+    python3 simulador.py --partidas 5000 --opcoes comprar_ate_jogavel --saida partidas.jsonl
+"""
+
+import argparse  # Argumentos de linha de comando
+import json      # Checkpoint e saída por partida (JSONL)
+import os        # Escrita atômica do checkpoint
+import sys       # Saída de progresso
+import time      # Intervalo entre checkpoints e velocidade
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from protocolo import EstadoJogo, OPCOES_PADRAO
+from bots import ESTRATEGIAS, PREFIXO_BOT, criar_estrategia, executar_turno_bot
+
+def simular_partida(semente, politicas, opcoes, max_turnos):
+    """Joga uma partida completa entre bots e retorna um dicionário com o resultado."""
+    estado = EstadoJogo(semente) # Cada partida é reproduzível pela sua semente
+    estado.configurar(opcoes)
+    estrategias = {}
+    for assento, nome in enumerate(politicas):
+        pid = (PREFIXO_BOT, assento)
+        estrategias[pid] = criar_estrategia(nome, f'{semente}:{assento}')
+        estado.entrar(pid)
+    estado.iniciar()
+
+    while estado.vencedor is None and estado.turnos < max_turnos:
+        id_vez = estado.jogadores_conectados[estado.jogador_atual]
+        if not executar_turno_bot(estado, id_vez, estrategias[id_vez]):
+            break # Nenhuma ação possível (não deveria acontecer com as estratégias padrão)
+
+    assento = estado.vencedor[1] if estado.vencedor is not None else None
+    return {
+        'semente': semente,
+        'vencedor': assento,
+        'turnos': estado.turnos,
+        'embaralhamentos': estado.embaralhamentos,
+        'reciclagens': estado.reciclagens,
+    }
+
+def simular_lote(indice_lote, tamanho_lote, semente_base, politicas, opcoes, max_turnos):
+    """Tarefa executada em cada processo: um lote de partidas com sementes consecutivas."""
+    inicio = semente_base + indice_lote * tamanho_lote
+    return indice_lote, [simular_partida(inicio + i, politicas, opcoes, max_turnos)
+                         for i in range(tamanho_lote)]
+
+class Agregado:
+    """Estatísticas acumuladas de todas as partidas já concluídas."""
+    def __init__(self, politicas):
+        self.politicas = politicas
+        self.partidas = 0
+        self.sem_vencedor = 0                     # Partidas que bateram no limite de turnos
+        self.vitorias_assento = [0] * len(politicas)
+        self.soma_turnos = 0
+        self.soma_embaralhamentos = 0
+        self.soma_reciclagens = 0
+        self.partidas_com_reciclagem = 0
+
+    def adicionar(self, r):
+        self.partidas += 1
+        if r['vencedor'] is None:
+            self.sem_vencedor += 1
+        else:
+            self.vitorias_assento[r['vencedor']] += 1
+        self.soma_turnos += r['turnos']
+        self.soma_embaralhamentos += r['embaralhamentos']
+        self.soma_reciclagens += r['reciclagens']
+        if r['reciclagens']:
+            self.partidas_com_reciclagem += 1
+
+    def para_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def de_dict(cls, dados):
+        agregado = cls(dados['politicas'])
+        agregado.__dict__.update(dados)
+        return agregado
+
+    def relatorio(self):
+        """Texto final com as taxas de vitória e as médias por partida."""
+        n = max(self.partidas, 1)
+        linhas = [f"Partidas: {self.partidas} (sem vencedor: {self.sem_vencedor})", "",
+                  f"{'assento':<8}{'estratégia':<14}{'vitórias':>10}{'taxa':>9}"]
+        for assento, nome in enumerate(self.politicas):
+            v = self.vitorias_assento[assento]
+            linhas.append(f"{assento:<8}{nome:<14}{v:>10}{v / n:>9.1%}")
+
+        # Taxa de vitória por estratégia (normalizada pelo número de assentos que ela ocupa)
+        linhas.append("")
+        for nome in sorted(set(self.politicas)):
+            assentos = [i for i, p in enumerate(self.politicas) if p == nome]
+            v = sum(self.vitorias_assento[i] for i in assentos)
+            linhas.append(f"{nome}: {v / n:.1%} das partidas ({v / n / len(assentos):.1%} por assento)")
+
+        linhas.append("")
+        linhas.append(f"Turnos por partida:          {self.soma_turnos / n:.1f}")
+        linhas.append(f"Embaralhamentos por partida: {self.soma_embaralhamentos / n:.2f}")
+        linhas.append(f"Reciclagens do descarte:     {self.soma_reciclagens / n:.2f} por partida, "
+                      f"em {self.partidas_com_reciclagem / n:.1%} das partidas")
+        return "\n".join(linhas)
+
+def salvar_checkpoint(caminho, config, agregado, lotes_feitos, saida):
+    """
+    Grava o checkpoint de forma atômica (arquivo temporário + rename). Com --saida, guarda também até
+    onde o arquivo JSONL corresponde aos lotes do checkpoint (a retomada corta o que passar disso).
+    """
+    offset_saida = None
+    if saida:
+        saida.flush()
+        offset_saida = saida.tell()
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w') as f:
+        json.dump({'config': config, 'agregado': agregado.para_dict(),
+                   'lotes_feitos': sorted(lotes_feitos), 'offset_saida': offset_saida}, f)
+    os.replace(temporario, caminho)
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de partidas de UNO entre bots (multiprocesso).")
+    parser.add_argument('--partidas', type=int, default=10000)
+    parser.add_argument('--politicas', default='gulosa,aleatoria',
+                        help=f"estratégia de cada assento, separadas por vírgula ({', '.join(ESTRATEGIAS)})")
+    parser.add_argument('--opcoes', default='', help="opções de regra ligadas, separadas por vírgula "
+                        f"({', '.join(OPCOES_PADRAO)})")
+    parser.add_argument('--processos', type=int, default=os.cpu_count())
+    parser.add_argument('--lote', type=int, default=50, help="partidas por tarefa enviada a um processo")
+    parser.add_argument('--semente', type=int, default=0, help="semente da primeira partida")
+    parser.add_argument('--max-turnos', type=int, default=5000, help="limite de turnos por partida")
+    parser.add_argument('--checkpoint', help="arquivo JSON de checkpoint (retoma se já existir)")
+    parser.add_argument('--saida', help="grava o resultado de cada partida neste arquivo JSONL")
+    args = parser.parse_args()
+
+    politicas = args.politicas.split(',')
+    for nome in politicas:
+        if nome not in ESTRATEGIAS:
+            parser.error(f"estratégia desconhecida: {nome}")
+    if not 2 <= len(politicas) <= 4:
+        parser.error("use de 2 a 4 assentos")
+    opcoes = {nome: True for nome in args.opcoes.split(',') if nome}
+    for nome in opcoes:
+        if nome not in OPCOES_PADRAO:
+            parser.error(f"opção desconhecida: {nome}")
+
+    config = {'partidas': args.partidas, 'politicas': politicas, 'opcoes': opcoes, 'lote': args.lote,
+              'semente': args.semente, 'max_turnos': args.max_turnos}
+    agregado = Agregado(politicas)
+    lotes_feitos = set()
+    offset_saida = None
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        with open(args.checkpoint) as f:
+            dados = json.load(f)
+        if dados['config'] != config:
+            parser.error("o checkpoint foi gerado com outros parâmetros")
+        agregado = Agregado.de_dict(dados['agregado'])
+        lotes_feitos = set(dados['lotes_feitos'])
+        offset_saida = dados.get('offset_saida')
+        print(f"Retomando checkpoint: {agregado.partidas} partidas já concluídas")
+
+    num_lotes = -(-args.partidas // args.lote)
+    pendentes = (i for i in range(num_lotes) if i not in lotes_feitos)
+    if args.saida and offset_saida is not None and os.path.exists(args.saida) \
+            and os.path.getsize(args.saida) > offset_saida:
+        # Lotes que terminaram depois do último checkpoint (execução morta) serão refeitos: sem
+        # cortar o arquivo, as partidas deles apareceriam duas vezes
+        os.truncate(args.saida, offset_saida)
+    saida = open(args.saida, 'a') if args.saida else None
+    inicio = time.perf_counter()
+    ja_feitas = agregado.partidas
+    ultimo_checkpoint = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=args.processos) as pool:
+        def submeter(indice):
+            tamanho = min(args.lote, args.partidas - indice * args.lote)
+            return pool.submit(simular_lote, indice, tamanho, args.semente, politicas, opcoes, args.max_turnos)
+
+        # Mantém só alguns lotes em voo por processo, em vez de criar todos os futures de uma vez
+        em_voo = set()
+        for indice in pendentes:
+            em_voo.add(submeter(indice))
+            if len(em_voo) >= args.processos * 2:
+                break
+        try:
+            while em_voo:
+                prontos, em_voo = wait(em_voo, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    indice, resultados = futuro.result()
+                    for r in resultados:
+                        agregado.adicionar(r)
+                        if saida:
+                            saida.write(json.dumps(r) + '\n')
+                    lotes_feitos.add(indice)
+                    proximo = next(pendentes, None)
+                    if proximo is not None:
+                        em_voo.add(submeter(proximo))
+
+                decorrido = time.perf_counter() - inicio
+                taxa = (agregado.partidas - ja_feitas) / decorrido if decorrido else 0
+                sys.stdout.write(f"\r{agregado.partidas}/{args.partidas} partidas ({taxa:.0f}/s)")
+                sys.stdout.flush()
+                if args.checkpoint and time.monotonic() - ultimo_checkpoint > 10:
+                    salvar_checkpoint(args.checkpoint, config, agregado, lotes_feitos, saida)
+                    ultimo_checkpoint = time.monotonic()
+        except KeyboardInterrupt:
+            print("\nInterrompido; salvando o que já terminou.")
+            pool.shutdown(cancel_futures=True)
+        finally:
+            if args.checkpoint:
+                salvar_checkpoint(args.checkpoint, config, agregado, lotes_feitos, saida)
+            if saida:
+                saida.close()
+
+    print("\n")
+    print(agregado.relatorio())
+
+if __name__ == '__main__':
+    main()
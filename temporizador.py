@@ -0,0 +1,103 @@
+"""
+ARQUIVO: temporizador.py
+FUNÇÃO: Agendar tarefas com atraso (timeouts de turno, jogadas de bots, limpezas) para todas as
+salas usando uma única thread.
+DESCRIÇÃO: Implementa uma roda de temporização (hashed timing wheel). O tempo é dividido em
+"ticks" e cada tarefa é colocada no compartimento (slot) do tick em que deve disparar; tarefas
+mais longas que uma volta completa da roda guardam quantas voltas ainda faltam.
+Agendar e cancelar custam O(1) e, a cada tick, só o compartimento atual é percorrido. Assim o
+custo fica constante mesmo com dezenas de milhares de salas, sem uma thread (ou threading.Timer)
+por sala.
+"""
+
+import threading # Thread única que gira a roda
+import time      # Relógio monotônico usado para medir os ticks
+import traceback # Pilha das exceções das tarefas, para o log
+
+class Temporizador:
+    """Tarefa agendada na roda. Pode ser cancelada a qualquer momento com cancelar()."""
+    __slots__ = ('funcao', 'args', 'voltas', 'cancelado')
+
+    def __init__(self, funcao, args, voltas):
+        self.funcao = funcao
+        self.args = args
+        self.voltas = voltas      # Voltas completas da roda que ainda faltam antes de disparar
+        self.cancelado = False
+
+    def cancelar(self):
+        """Cancelamento preguiçoso: a tarefa é descartada quando a roda passar pelo slot dela."""
+        self.cancelado = True
+
+class RodaTemporizacao:
+    """
+    Roda de temporização com 'num_slots' compartimentos de 'tick' segundos cada.
+    Os callbacks rodam na thread da roda e devem ser rápidos (trabalho pesado deve ser
+    repassado para um executor). As exceções deles vão para 'log' (eventos.RegistroEventos), se houver.
+    """
+    def __init__(self, tick=0.1, num_slots=512, log=None):
+        self.tick = tick
+        self.log = log
+        self.num_slots = num_slots
+        self.slots = [[] for _ in range(num_slots)]
+        self.posicao = 0                  # Slot que será processado no próximo tick
+        self.lock = threading.Lock()      # Protege os slots (agendamentos vêm de várias threads)
+        self.rodando = False
+        self.thread = None
+
+    def iniciar(self):
+        """Inicia a thread da roda (uma única vez)."""
+        if self.rodando: return
+        self.rodando = True
+        self.thread = threading.Thread(target=self._girar, name='roda-temporizacao', daemon=True)
+        self.thread.start()
+
+    def parar(self):
+        """Para a thread da roda; tarefas pendentes não disparam mais."""
+        self.rodando = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def agendar(self, atraso, funcao, *args):
+        """Agenda funcao(*args) para daqui a 'atraso' segundos. Retorna o Temporizador."""
+        ticks = max(1, int(round(atraso / self.tick)))
+        with self.lock:
+            voltas, deslocamento = divmod(ticks - 1, self.num_slots)
+            tarefa = Temporizador(funcao, args, voltas)
+            self.slots[(self.posicao + deslocamento) % self.num_slots].append(tarefa)
+        return tarefa
+
+    def _girar(self):
+        """Loop da thread: avança um slot por tick, recuperando ticks atrasados se preciso."""
+        proximo = time.monotonic() + self.tick
+        while self.rodando:
+            espera = proximo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            proximo += self.tick
+            for tarefa in self._avancar():
+                try:
+                    tarefa.funcao(*tarefa.args)
+                except Exception as e:
+                    if self.log is None:
+                        print(f"Erro em tarefa agendada {tarefa.funcao.__name__}: {e}")
+                    else:
+                        self.log.erro('erro_tarefa_agendada', tarefa=tarefa.funcao.__name__, erro=repr(e),
+                                      pilha=traceback.format_exc())
+
+    def _avancar(self):
+        """Processa o slot atual e retorna as tarefas que venceram neste tick."""
+        with self.lock:
+            slot = self.slots[self.posicao]
+            vencidas = []
+            restantes = []
+            for tarefa in slot:
+                if tarefa.cancelado:
+                    continue
+                if tarefa.voltas > 0:
+                    tarefa.voltas -= 1
+                    restantes.append(tarefa)
+                else:
+                    vencidas.append(tarefa)
+            self.slots[self.posicao] = restantes
+            self.posicao = (self.posicao + 1) % self.num_slots
+        return vencidas
@@ -0,0 +1,57 @@
+"""
+Configuração do pytest para os testes unitários (testes/test_*.py). Os demais arquivos desta
+pasta são o protótipo antigo do jogo e não são coletados.
+Os testes cobrem os módulos puros (regras, replay, limitador, histórico...) sem socket: rodam com
+    python3 -m pytest testes
+"""
+
+import os
+import sys
+
+import pytest
+
+# Os módulos do jogo ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocolo import EstadoJogo, MSG_ENTRAR_SALA, MSG_CONFIGURAR_SALA, MSG_INICIAR_JOGO
+from bots import PREFIXO_BOT, criar_estrategia, executar_turno_bot
+
+@pytest.fixture
+def jogar_partida():
+    """
+    Joga uma partida entre bots como o servidor faz (aplicar_evento + registro da sala) e retorna
+    (estado final, registro de (ID do jogador, evento)). 'a_cada_evento(estado, id, evento)' é
+    chamada depois de cada evento aplicado; 'estado' permite jogar sobre um EstadoJogo já criado
+    (ex: o de uma sala do servidor).
+    """
+    def jogar(semente, politicas=('gulosa', 'aleatoria', 'gulosa'), opcoes=None, max_turnos=3000,
+              a_cada_evento=None, estado=None):
+        estado = estado if estado is not None else EstadoJogo(semente)
+        registro = []
+        def anotar(id_jogador, evento):
+            registro.append((id_jogador, evento))
+            if a_cada_evento:
+                a_cada_evento(estado, id_jogador, evento)
+
+        estrategias = {}
+        for assento, nome in enumerate(politicas):
+            id_bot = (PREFIXO_BOT, assento + 1)
+            estrategias[id_bot] = criar_estrategia(nome, f'{semente}:{assento}')
+            assert estado.aplicar_evento(id_bot, {'tipo': MSG_ENTRAR_SALA})
+            anotar(id_bot, {'tipo': MSG_ENTRAR_SALA})
+        anfitriao = estado.host_id
+        if opcoes:
+            evento = {'tipo': MSG_CONFIGURAR_SALA, 'opcoes': dict(opcoes)}
+            assert estado.aplicar_evento(anfitriao, evento)
+            anotar(anfitriao, evento)
+        assert estado.aplicar_evento(anfitriao, {'tipo': MSG_INICIAR_JOGO})
+        anotar(anfitriao, {'tipo': MSG_INICIAR_JOGO})
+
+        while estado.vencedor is None and estado.turnos < max_turnos:
+            id_vez = estado.jogadores_conectados[estado.jogador_atual]
+            aplicadas = executar_turno_bot(estado, id_vez, estrategias[id_vez])
+            assert aplicadas, "o bot da vez sempre tem uma ação"
+            for acao in aplicadas:
+                anotar(id_vez, acao)
+        return estado, registro
+    return jogar
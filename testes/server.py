@@ -2,10 +2,17 @@ import socket
 import threading
 import time
 import json
+import os
+import sys
 from logic import UnoGame, Card
 from network import send_json, recv_json
 from security import AuthManager
 
+# Log estruturado compartilhado com o servidor principal (eventos.py, na pasta acima)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from eventos import configurar_pelo_ambiente
+log = configurar_pelo_ambiente('server_testes.jsonl')
+
 # Configurações
 HOST = '0.0.0.0'
 PORT = 5555
@@ -24,6 +31,7 @@ class GameServer:
         self.game_started = False
         
         print(f"[SERVIDOR] Iniciado em {HOST}:{PORT}")
+        log.info('servidor_iniciado', host=HOST, porta=PORT)
 
     def broadcast(self, message_dict, exclude=None):
         """Envia mensagem para todos os clientes conectados."""
@@ -38,11 +46,11 @@ class GameServer:
         if client in self.clients:
             self.clients.remove(client)
             if client in self.players:
-                print(f"[SERVIDOR] {self.players[client]['name']} desconectou.")
+                log.info('desconexao', jogador=self.players[client]['name'])
                 del self.players[client]
 
     def handle_client(self, conn, addr):
-        print(f"[CONEXÃO] Nova conexão de {addr}")
+        log.info('conexao', endereco=addr)
         client_name = f"Player_{len(self.clients)+1}"
         
         # 1. Handshake de Autenticação (Simulado)
@@ -66,7 +74,7 @@ class GameServer:
                 return
                 
         except Exception as e:
-            print(f"Erro na auth: {e}")
+            log.erro('erro_autenticacao', endereco=addr, erro=repr(e))
             conn.close()
             return
 
@@ -107,7 +115,7 @@ class GameServer:
 
                 elif msg['type'] == 'CHAT':
                     # Relay de mensagem criptografada (O servidor não desencripta E2E)
-                    print(f"[CHAT RELAY] De {client_name}: {msg['content'][:10]}...")
+                    log.debug('chat_relay', jogador=client_name, tamanho=len(msg['content']))
                     self.broadcast({
                         "type": "CHAT",
                         "sender": client_name,
@@ -116,7 +124,7 @@ class GameServer:
                     }, exclude=conn)
 
             except Exception as e:
-                print(f"[ERRO] {e}")
+                log.erro('erro_cliente', jogador=client_name, erro=repr(e))
                 break
 
         self.remove_client(conn)
@@ -0,0 +1,99 @@
+"""Drenagem e reinício a quente: formato compacto do estado e salas salvas e restauradas."""
+
+import pickle
+
+import pytest
+
+from bots import PREFIXO_BOT, criar_estrategia
+from eventos import RegistroEventos
+from protocolo import EstadoJogo
+from servidor import Servidor, nova_sala, exportar_sala
+
+# Nos testes, o assento 1 faz o papel do humano (volta como desconectado) e os outros são bots
+HUMANO = (PREFIXO_BOT, 1)
+TOKEN = 'token-do-humano'
+
+def mesmo_estado(a, b):
+    return repr(vars(a)) == repr(vars(b))
+
+@pytest.fixture
+def novo_servidor():
+    """Cria servidores sem replays, histórico, métricas nem diretório, e os para no fim do teste."""
+    criados = []
+    def criar(**parametros):
+        servidor = Servidor(host='127.0.0.1', porta=0, diretorio_replays=None, arquivo_historico='',
+                            endereco_metricas='', diretorio=None, log=RegistroEventos(None),
+                            tempo_turno=60.0, tempo_pensar_bot=60.0, **parametros) # Nada joga durante o teste
+        criados.append(servidor)
+        return servidor
+    yield criar
+    for servidor in criados:
+        if servidor.socket:
+            servidor.parar()
+        else:
+            servidor.executor.shutdown()
+
+def sala_em_andamento(jogar_partida, semente, turnos=15):
+    estado, _ = jogar_partida(semente, max_turnos=turnos)
+    assert estado.jogo_iniciado and estado.vencedor is None
+    estado.tempo_turno = 30.0 # O do processo antigo; a restauração usa o do novo
+    sala = nova_sala(f'sala {semente}', estado, None)
+    sala['bots'] = {id_jogador: criar_estrategia('gulosa') for id_jogador in estado.jogadores_conectados[1:]}
+    sala['sessoes'] = {HUMANO: TOKEN}
+    sala['nomes'] = {HUMANO: 'ana'}
+    return sala
+
+@pytest.mark.parametrize('turnos', [0, 15, 3000])
+def test_compactar_ida_e_volta(jogar_partida, turnos):
+    if turnos:
+        estado, _ = jogar_partida(11, max_turnos=turnos)
+    else:
+        estado = EstadoJogo(11) # Sala sem ninguém e sem mesa
+    dados = estado.compactar()
+    assert mesmo_estado(EstadoJogo.descompactar(pickle.loads(pickle.dumps(dados))), estado)
+    if estado.baralho or estado.descarte:
+        assert len(pickle.dumps(dados)) < len(pickle.dumps(estado))
+
+def test_estado_descompactado_continua_a_partida(jogar_partida):
+    # O restaurado e o original, recebendo os mesmos eventos, terminam iguais
+    _, registro = jogar_partida(12)
+    original = EstadoJogo(12)
+    for id_jogador, evento in registro[:40]:
+        original.aplicar_evento(id_jogador, evento)
+    restaurado = EstadoJogo.descompactar(original.compactar())
+    for id_jogador, evento in registro[40:]:
+        assert original.aplicar_evento(id_jogador, evento) == restaurado.aplicar_evento(id_jogador, evento)
+    assert restaurado.vencedor is not None and mesmo_estado(restaurado, original)
+
+def test_restaurar_sala_exportada(jogar_partida, novo_servidor):
+    sala = sala_em_andamento(jogar_partida, 13)
+    dados = pickle.loads(pickle.dumps(exportar_sala(sala, 0.0))) # Como vai para o arquivo
+    servidor = novo_servidor()
+    servidor.restaurar_sala(dados, 0.0)
+    restaurada = servidor.salas[sala['nome']]
+    assert restaurada['estado'].tempo_turno == 60.0
+    sala['estado'].tempo_turno = 60.0
+    assert mesmo_estado(restaurada['estado'], sala['estado'])
+    assert restaurada['inicio_registro'] == sala['estado'].eventos and restaurada['registro'] == []
+    assert {id_bot: bot.nome for id_bot, bot in restaurada['bots'].items()} == dados['bots']
+    assert restaurada['nomes'] == {HUMANO: 'ana'}
+    # O humano volta como desconectado, com o assento reservado para o mesmo token
+    assert list(restaurada['desconectados']) == [HUMANO]
+    assert servidor.sessoes[TOKEN] == (sala['nome'], HUMANO)
+
+def test_salvar_e_restaurar_arquivo(jogar_partida, novo_servidor, tmp_path):
+    caminho = str(tmp_path / 'salas.estado')
+    antigo = novo_servidor()
+    salas = [sala_em_andamento(jogar_partida, semente) for semente in (21, 22, 23)]
+    for sala in salas:
+        antigo.salas[sala['nome']] = sala
+    assert antigo.salvar_salas(caminho) == 3
+    assert antigo.salas == {}
+
+    novo = novo_servidor(arquivo_salas=caminho).iniciar() # Restaura ao subir e apaga o arquivo
+    assert not (tmp_path / 'salas.estado').exists()
+    assert sorted(novo.salas) == sorted(sala['nome'] for sala in salas)
+    for sala in salas:
+        sala['estado'].tempo_turno = novo.tempo_turno
+        assert mesmo_estado(novo.salas[sala['nome']]['estado'], sala['estado'])
+    assert novo.restaurar_salas(caminho) == 0 # Um segundo reinício não ressuscita as salas
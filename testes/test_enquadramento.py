@@ -0,0 +1,48 @@
+"""Enquadramento das mensagens: tamanho prefixado, mensagens parciais e o tamanho máximo."""
+
+import socket
+import threading
+
+import pytest
+
+from protocolo import (BufferMensagens, CABECALHO, TAMANHO_MAXIMO_MENSAGEM, empacotar, receber_mensagem,
+                       receber_quadro)
+
+@pytest.fixture
+def par():
+    a, b = socket.socketpair()
+    b.settimeout(1.0)
+    yield a, b
+    a.close()
+    b.close()
+
+def test_mensagens_pelo_socket(par):
+    a, b = par
+    grande = {'tipo': 'X', 'dados': b'y' * 300000} # Maior que um recv
+    # Maior que o buffer do socket: o envio precisa de outra thread enquanto esta lê
+    envio = threading.Thread(target=a.sendall, args=(empacotar({'tipo': 'A'}) + empacotar(grande),))
+    envio.start()
+    assert receber_mensagem(b) == {'tipo': 'A'}
+    assert receber_mensagem(b) == grande
+    envio.join()
+    a.close()
+    assert receber_quadro(b) is None
+
+def test_tamanho_acima_do_maximo_encerra(par):
+    a, b = par
+    a.sendall(b'\xff\xff\xff\xff' + b'x') # Nada de reservar 4 GB: a conexão é dada como encerrada
+    assert receber_quadro(b) is None
+    a.sendall(CABECALHO.pack(TAMANHO_MAXIMO_MENSAGEM + 1))
+    assert receber_quadro(b) is None
+
+def test_buffer_junta_partes_e_separa_mensagens():
+    buffer = BufferMensagens()
+    dados = empacotar('um') + empacotar('dois') + empacotar('três')
+    corte = len(empacotar('um')) + 3
+    assert buffer.alimentar(dados[:corte]) == [empacotar('um')[CABECALHO.size:]]
+    assert len(buffer.alimentar(dados[corte:])) == 2
+    assert buffer.buffer == bytearray()
+
+def test_buffer_recusa_tamanho_acima_do_maximo():
+    with pytest.raises(ValueError):
+        BufferMensagens().alimentar(CABECALHO.pack(TAMANHO_MAXIMO_MENSAGEM + 1))
@@ -0,0 +1,106 @@
+"""Plateia: o mesmo buffer para todos, grupos com atraso e desconexão de espectadores lentos."""
+
+import socket
+
+import pytest
+
+import espectadores
+from espectadores import Plateia
+from metricas import Metricas
+
+class RodaManual:
+    """Roda de temporização que só anota os agendamentos; o teste dispara as tarefas."""
+    def __init__(self):
+        self.tarefas = []
+
+    def agendar(self, atraso, funcao, *args):
+        self.tarefas.append((atraso, funcao, args))
+
+    def disparar(self):
+        tarefas, self.tarefas = self.tarefas, []
+        for _, funcao, args in tarefas:
+            funcao(*args)
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = {'agora': 1000.0}
+    monkeypatch.setattr(espectadores.time, 'monotonic', lambda: relogio['agora'])
+    return relogio
+
+@pytest.fixture
+def par():
+    """Cria pares de sockets (lado da plateia, lado do espectador) e fecha todos no fim."""
+    abertos = []
+    def criar():
+        servidor, espectador = socket.socketpair()
+        espectador.settimeout(1.0)
+        abertos.extend((servidor, espectador))
+        return servidor, espectador
+    yield criar
+    for sock in abertos:
+        sock.close()
+
+def nova_plateia():
+    roda = RodaManual()
+    return Plateia(roda, lambda funcao, *args: funcao(*args), Metricas()), roda
+
+def recebido(sock):
+    sock.setblocking(False)
+    try:
+        return sock.recv(65536)
+    except BlockingIOError:
+        return b''
+    finally:
+        sock.settimeout(1.0)
+
+def test_sem_atraso_recebe_na_hora(relogio, par):
+    plateia, roda = nova_plateia()
+    plateia.publicar(b'v0')
+    conexoes = [par() for _ in range(3)]
+    for lado_plateia, _ in conexoes:
+        plateia.adicionar(lado_plateia, 0)
+    plateia.publicar(b'v1')
+    assert [recebido(espectador) for _, espectador in conexoes] == [b'v0v1', b'v0v1', b'v0v1']
+    assert len(plateia) == 3 and roda.tarefas == []
+    assert plateia.metricas.total('uno_espectador_envios_total') == 6
+
+def test_grupo_com_atraso(relogio, par):
+    plateia, roda = nova_plateia()
+    lado_plateia, espectador = par()
+    plateia.publicar(b'v0')
+    relogio['agora'] += 1
+    plateia.publicar(b'v1')
+    plateia.adicionar(lado_plateia, 2) # Nenhuma visão tem 2 s ainda: espera a v0 vencer
+    assert recebido(espectador) == b''
+    assert [atraso for atraso, _, _ in roda.tarefas] == [1.0]
+    relogio['agora'] += 1
+    roda.disparar()
+    assert recebido(espectador) == b'v0'
+    relogio['agora'] += 1
+    roda.disparar()
+    assert recebido(espectador) == b'v1'
+    plateia.remover(lado_plateia)
+    plateia.publicar(b'v2')
+    assert len(plateia) == 0 and roda.tarefas == [] # O grupo vazio deixa de existir
+
+def test_espectador_lento_e_desconectado(relogio, par):
+    plateia, _ = nova_plateia()
+    lento, espectador_lento = par()
+    rapido, espectador_rapido = par()
+    plateia.adicionar(lento, 0)
+    plateia.adicionar(rapido, 0)
+    visao = b'x' * 4096
+    for _ in range(200): # O espectador lento nunca lê: o buffer do socket enche
+        plateia.publicar(visao)
+        recebido(espectador_rapido)
+    assert len(plateia) == 1
+    assert plateia.metricas.total('uno_espectadores_lentos_total') == 1
+
+def test_encerrar_manda_a_ultima_mensagem_e_fecha(relogio, par):
+    plateia, _ = nova_plateia()
+    lado_plateia, espectador = par()
+    plateia.adicionar(lado_plateia, 0)
+    plateia.encerrar(b'fim')
+    assert espectador.recv(16) == b'fim'
+    assert espectador.recv(16) == b'' # Conexão encerrada
+    assert len(plateia) == 0
@@ -0,0 +1,62 @@
+"""Histórico de partidas: identidade estável dos jogadores e totais só dos humanos."""
+
+from historico import HistoricoPartidas, nome_id, resultado_partida
+from protocolo import EstadoJogo, MSG_ENTRAR_SALA, MSG_INICIAR_JOGO
+from servidor import nova_sala, nome_jogador_sala
+
+def partida_terminada(jogadores, vencedor):
+    """EstadoJogo iniciado com esses jogadores e o vencedor marcado (sem jogar as cartas)."""
+    estado = EstadoJogo(7)
+    for id_jogador in jogadores:
+        assert estado.aplicar_evento(id_jogador, {'tipo': MSG_ENTRAR_SALA})
+    assert estado.aplicar_evento(jogadores[0], {'tipo': MSG_INICIAR_JOGO})
+    estado.vencedor = vencedor
+    return estado
+
+def test_identidade_dos_jogadores():
+    nomes = {('10.0.0.1', 50001): 'ana'}
+    assert nome_id(('10.0.0.1', 50001), 'mesa', nomes) == 'ana'
+    assert nome_id(('10.0.0.2', 50002), 'mesa', nomes) == '10.0.0.2:50002' # Sem nome: o próprio ID
+    assert nome_id(('BOT', 1), 'mesa', nomes) == 'mesa/BOT:1'
+    assert nome_id(('BOT', 1), 'outra', nomes) != nome_id(('BOT', 1), 'mesa', nomes)
+
+def test_resultado_partida():
+    ana = ('10.0.0.1', 50001)
+    estado = partida_terminada([ana, ('BOT', 1)], ana)
+    resultado = resultado_partida('mesa', estado, 10.0, 25.0, {ana: 'ana'})
+    assert resultado['vencedor'] == 'ana' and resultado['duracao'] == 15.0
+    assert [(j[0], j[1], j[2], j[5]) for j in resultado['jogadores']] == [('ana', 0, True, True),
+                                                                         ('mesa/BOT:1', 1, False, False)]
+
+def test_totais_por_nome_e_sem_bots(tmp_path):
+    historico = HistoricoPartidas(str(tmp_path / 'historico.db'))
+    # A mesma pessoa em duas conexões (portas diferentes) soma no mesmo total
+    for sala, porta, vence_ana in (('mesa1', 50001, True), ('mesa2', 50002, False)):
+        ana = ('10.0.0.1', porta)
+        estado = partida_terminada([ana, ('BOT', 1)], ana if vence_ana else ('BOT', 1))
+        historico.registrar_partida(resultado_partida(sala, estado, 0.0, 60.0, {ana: 'ana'}))
+    historico.fechar() # Grava a fila antes das consultas
+    totais = historico.estatisticas('ana')
+    assert (totais['partidas'], totais['vitorias'], totais['taxa_vitoria']) == (2, 1, 0.5)
+    assert [linha['jogador'] for linha in historico.ranking()] == ['ana']
+    # Os bots ficam só nas participações
+    assert historico.estatisticas('mesa2/BOT:1') is None
+    assert [p['venceu'] for p in historico.ultimas_partidas('mesa2/BOT:1')] == [1]
+    assert [p['sala'] for p in historico.ultimas_partidas('ana')] == ['mesa2', 'mesa1']
+
+def test_nomes_unicos_na_sala():
+    sala = nova_sala('mesa', EstadoJogo(1), None)
+    for porta, nome in ((1, 'ana'), (2, 'ana'), (3, None), (4, '  '), (5, 7)):
+        sala['nomes'][('127.0.0.1', porta)] = nome_jogador_sala(sala, nome, '127.0.0.1')
+    assert list(sala['nomes'].values()) == ['ana', 'ana#2', '127.0.0.1', '127.0.0.1#2', '127.0.0.1#3']
+
+def test_jogadores_sem_nome_no_mesmo_ip(tmp_path):
+    # Dois clientes sem nome atrás do mesmo IP: a partida é gravada com os dois
+    historico = HistoricoPartidas(str(tmp_path / 'historico.db'))
+    a, b = ('127.0.0.1', 50001), ('127.0.0.1', 50002)
+    sala = nova_sala('mesa', partida_terminada([a, b], b), None)
+    for id_jogador in (a, b):
+        sala['nomes'][id_jogador] = nome_jogador_sala(sala, None, id_jogador[0])
+    historico.registrar_partida(resultado_partida('mesa', sala['estado'], 0.0, 1.0, sala['nomes']))
+    historico.fechar()
+    assert [linha['jogador'] for linha in historico.ranking()] == ['127.0.0.1#2', '127.0.0.1']
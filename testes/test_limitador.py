@@ -0,0 +1,56 @@
+"""Balde de fichas e limitador por conexão, com relógio controlado (sem esperar tempo real)."""
+
+import pytest
+
+import limitador
+from limitador import BaldeFichas, LimitadorConexao, PERMITIDA, DESCARTADA, ABUSO
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Relógio monotônico falso do limitador: relogio['agora'] é o instante atual."""
+    relogio = {'agora': 100.0}
+    monkeypatch.setattr(limitador.time, 'monotonic', lambda: relogio['agora'])
+    return relogio
+
+def test_balde_comeca_cheio_e_esvazia():
+    balde = BaldeFichas(taxa=2, capacidade=3, agora=0.0)
+    assert [balde.consumir(0.0) for _ in range(4)] == [True, True, True, False]
+
+def test_balde_reabastece_na_taxa():
+    balde = BaldeFichas(taxa=2, capacidade=3, agora=0.0)
+    for _ in range(3):
+        balde.consumir(0.0)
+    assert not balde.consumir(0.25) # Meia ficha
+    assert balde.consumir(0.5)      # Meia + meia = 1 ficha
+    assert not balde.consumir(0.5)
+    assert balde.consumir(1.0) and not balde.consumir(1.0)
+
+def test_balde_nao_passa_da_capacidade():
+    balde = BaldeFichas(taxa=10, capacidade=3, agora=0.0)
+    balde.consumir(0.0)
+    resultados = [balde.consumir(60.0) for _ in range(4)] # Um minuto parado não acumula 600 fichas
+    assert resultados == [True, True, True, False]
+
+def test_limitador_permite_descarta_e_acusa_abuso(relogio):
+    conexao = LimitadorConexao({'*': (1, 2)}, tolerancia=(1, 3))
+    resultados = [conexao.verificar('JOGAR') for _ in range(6)]
+    assert resultados == [PERMITIDA] * 2 + [DESCARTADA] * 3 + [ABUSO]
+    relogio['agora'] += 1 # Uma ficha de volta em cada balde
+    assert conexao.verificar('JOGAR') == PERMITIDA
+    assert conexao.verificar('JOGAR') == DESCARTADA
+
+def test_baldes_separados_por_tipo(relogio):
+    conexao = LimitadorConexao({'CHAT': (1, 1), '*': (1, 2)}, tolerancia=(1, 10))
+    assert conexao.verificar('CHAT') == PERMITIDA
+    assert conexao.verificar('CHAT') == DESCARTADA
+    # Esgotar o CHAT não afeta os outros tipos, e os tipos sem orçamento próprio usam o '*' (cada um o seu balde)
+    assert [conexao.verificar('JOGAR') for _ in range(3)] == [PERMITIDA, PERMITIDA, DESCARTADA]
+    assert [conexao.verificar('COMPRAR') for _ in range(3)] == [PERMITIDA, PERMITIDA, DESCARTADA]
+    assert conexao.baldes['CHAT'].capacidade == 1 and conexao.baldes['COMPRAR'].capacidade == 2
+
+def test_tolerancia_e_compartilhada_entre_tipos(relogio):
+    conexao = LimitadorConexao({'*': (0, 1)}, tolerancia=(0, 1))
+    assert conexao.verificar('JOGAR') == PERMITIDA
+    assert conexao.verificar('CHAT') == PERMITIDA
+    assert conexao.verificar('JOGAR') == DESCARTADA
+    assert conexao.verificar('CHAT') == ABUSO
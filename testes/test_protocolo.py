@@ -0,0 +1,55 @@
+"""Regras do EstadoJogo e o índice de jogabilidade (contagem_maos)."""
+
+from protocolo import EstadoJogo, MSG_ENTRAR_SALA, MSG_INICIAR_JOGO
+
+def contagem_esperada(mao):
+    """Índice recalculado do zero a partir da mão (o que contagem_maos deve conter)."""
+    contagem = {}
+    for carta in mao:
+        contagem[carta.cor] = contagem.get(carta.cor, 0) + 1
+        contagem[carta.valor] = contagem.get(carta.valor, 0) + 1
+    return contagem
+
+def conferir_indice(estado, *_):
+    for id_jogador, mao in estado.maos.items():
+        contagem = {chave: n for chave, n in estado.contagem_maos[id_jogador].items() if n}
+        assert contagem == contagem_esperada(mao), id_jogador
+        if estado.jogo_iniciado and estado.descarte:
+            assert estado.tem_jogada(id_jogador) == any(estado.pode_jogar(carta) for carta in mao)
+
+def test_indice_acompanha_as_maos_durante_a_partida(jogar_partida):
+    for semente in range(5):
+        estado, _ = jogar_partida(semente, a_cada_evento=conferir_indice)
+        assert estado.vencedor is not None
+
+def test_indice_com_compra_ate_jogavel_e_passe_automatico(jogar_partida):
+    opcoes = {'comprar_ate_jogavel': True, 'passe_automatico': True}
+    for semente in range(5):
+        jogar_partida(semente, ('aleatoria', 'aleatoria'), opcoes, a_cada_evento=conferir_indice)
+
+def test_mesa_so_e_montada_no_inicio():
+    estado = EstadoJogo(7)
+    for porta in (1, 2):
+        estado.aplicar_evento(('h', porta), {'tipo': MSG_ENTRAR_SALA})
+    assert estado.baralho == [] and all(mao == [] for mao in estado.maos.values())
+    assert estado.aplicar_evento(('h', 1), {'tipo': MSG_INICIAR_JOGO})
+    assert all(len(mao) == 7 for mao in estado.maos.values())
+    assert len(estado.descarte) == 1
+    assert len(estado.baralho) + 14 + 1 == 108
+    assert estado.compradas == {} # A distribuição não conta como compra
+
+def test_comprar_sem_mesa_nao_faz_nada():
+    estado = EstadoJogo(7)
+    estado.adicionar_jogador(('h', 1))
+    assert estado.comprar_carta(('h', 1)) is False
+    assert estado.maos[('h', 1)] == []
+
+def test_jogada_fora_da_vez_e_recusada():
+    estado = EstadoJogo(3)
+    for porta in (1, 2):
+        estado.entrar(('h', porta))
+    estado.iniciar()
+    fora = estado.jogadores_conectados[1 - estado.jogador_atual]
+    assert not estado.aplicar_acao(fora, {'tipo': 'JOGAR', 'indice': 0})
+    assert not estado.aplicar_acao(fora, {'tipo': 'COMPRAR'})
+    assert len(estado.maos[fora]) == 7
@@ -0,0 +1,102 @@
+"""Resposta de MSG_RECONECTAR: só os eventos que faltam ou o snapshot mais recente e os seguintes."""
+
+import pickle
+
+import pytest
+
+from eventos import RegistroEventos
+from protocolo import EstadoJogo, reproduzir
+from servidor import (INTERVALO_SNAPSHOT, Servidor, nova_sala, tirar_snapshot, resposta_reconexao, memoria_sala,
+                      tamanho_evento)
+
+@pytest.fixture
+def criar_sala(jogar_partida):
+    """
+    Joga uma partida numa sala, anotando cada evento como o servidor (Servidor.anotar_evento, que
+    tira os snapshots e descarta o registro anterior a eles). Retorna (sala, registro completo).
+    'a_cada_evento(sala)' é chamada depois de cada evento anotado.
+    """
+    servidor = Servidor(diretorio_replays=None, arquivo_historico='', endereco_metricas='', diretorio=None,
+                        log=RegistroEventos(None)) # Sem iniciar(): nenhuma porta nem thread
+    def criar(semente, a_cada_evento=None):
+        estado = EstadoJogo(semente)
+        sala = nova_sala('s', estado, None)
+        tirar_snapshot(sala) # Feito na criação da sala
+        completo = []
+        def anotar(estado, id_jogador, evento):
+            completo.append((id_jogador, evento))
+            servidor.anotar_evento(sala, id_jogador, evento)
+            if a_cada_evento:
+                a_cada_evento(sala)
+        jogar_partida(semente, estado=estado, a_cada_evento=anotar)
+        return sala, completo
+    yield criar
+    servidor.executor.shutdown()
+
+def estado_do_cliente(sala, completo, posicao_cliente, resposta):
+    """O que o cliente monta com a resposta (como processar_mensagem em cliente.py)."""
+    if resposta['snapshot']:
+        estado = pickle.loads(resposta['snapshot'])
+    else:
+        estado = reproduzir(sala['estado'].semente, completo[:posicao_cliente])
+    for id_jogador, evento in resposta['eventos']:
+        estado.aplicar_evento(id_jogador, evento)
+    return estado
+
+def mesmo_estado(a, b):
+    return repr(vars(a)) == repr(vars(b))
+
+def test_cliente_recente_recebe_so_os_eventos_que_faltam(criar_sala):
+    sala, completo = criar_sala(3)
+    total = sala['estado'].eventos
+    posicao_snapshot = sala['snapshot'][0]
+    for posicao in (posicao_snapshot, total - 1, total):
+        resposta = resposta_reconexao(sala, ('h', 1), 'token', posicao)
+        assert resposta['snapshot'] is None
+        assert resposta['eventos'] == completo[posicao:]
+        assert mesmo_estado(estado_do_cliente(sala, completo, posicao, resposta), sala['estado'])
+
+def test_cliente_sem_estado_ou_atrasado_recebe_o_snapshot(criar_sala):
+    sala, completo = criar_sala(4)
+    assert sala['estado'].eventos > INTERVALO_SNAPSHOT # Partida longa o bastante para ter snapshot
+    posicao_snapshot = sala['snapshot'][0]
+    for posicao in (None, 0, posicao_snapshot - 1, sala['estado'].eventos + 1, 'lixo'):
+        resposta = resposta_reconexao(sala, ('h', 1), 'token', posicao)
+        assert resposta['snapshot'] is not None
+        assert resposta['eventos'] == completo[posicao_snapshot:]
+        assert mesmo_estado(estado_do_cliente(sala, completo, posicao, resposta), sala['estado'])
+
+def test_registro_em_memoria_fica_limitado(criar_sala):
+    # Só os eventos desde o último snapshot ficam na sala, com a memória somada a cada evento
+    def conferir(sala):
+        registro = sala['registro']
+        assert len(registro) < INTERVALO_SNAPSHOT
+        # Um bot aplica todas as ações do turno antes de anotá-las: o estado pode estar à frente
+        assert sala['inicio_registro'] + len(registro) <= sala['estado'].eventos
+        assert sala['bytes_registro'] == sum(tamanho_evento(evento) for _, evento in registro)
+    sala, completo = criar_sala(13, a_cada_evento=conferir)
+    assert len(completo) > 2 * INTERVALO_SNAPSHOT
+    assert sala['inicio_registro'] + len(sala['registro']) == sala['estado'].eventos == len(completo)
+    assert memoria_sala(sala) == 2 * len(sala['snapshot'][1]) + sala['bytes_registro']
+
+def test_resposta_leva_sessao_versao_e_confirmacoes(criar_sala):
+    sala, _ = criar_sala(5)
+    sala['estado'].acoes_confirmadas[('h', 1)] = 12
+    resposta = resposta_reconexao(sala, ('h', 1), 'abc', None)
+    assert (resposta['tipo'], resposta['id'], resposta['token']) == ('RECONECTADO', ('h', 1), 'abc')
+    assert resposta['versao'] == sala['estado'].versao
+    assert resposta['acoes_confirmadas'] == {('h', 1): 12}
+    sala['estado'].acoes_confirmadas.clear() # A resposta é uma cópia
+    assert resposta['acoes_confirmadas'] == {('h', 1): 12}
+
+def test_sala_restaurada_sem_registro_anterior(criar_sala):
+    # Sala restaurada da drenagem: o registro começa na restauração e ainda não há snapshot
+    original, _ = criar_sala(6)
+    estado = EstadoJogo.descompactar(original['estado'].compactar())
+    sala = nova_sala('s', estado, None)
+    sala['inicio_registro'] = estado.eventos
+    resposta = resposta_reconexao(sala, ('h', 1), 'token', estado.eventos)
+    assert resposta['snapshot'] is None and resposta['eventos'] == []
+    assert sala['snapshot'][0] == estado.eventos
+    resposta = resposta_reconexao(sala, ('h', 1), 'token', 0) # Anterior à restauração
+    assert mesmo_estado(pickle.loads(resposta['snapshot']), original['estado'])
@@ -0,0 +1,72 @@
+"""Formato binário dos replays: registros de 8 bytes, snapshots e leitura por evento ou turno."""
+
+import struct
+
+import pytest
+
+from protocolo import EstadoJogo, MSG_ENTRAR_SALA, MSG_SAIR_SALA, MSG_CONFIGURAR_SALA, MSG_GRITAR_UNO, reproduzir
+from replay import REGISTRO, GravadorReplay, LeitorReplay, codificar_evento, decodificar_evento
+
+def gravar(base, semente, registro, intervalo=8):
+    """Grava um registro de eventos como o servidor (evento aplicado, depois gravado)."""
+    estado = EstadoJogo(semente)
+    gravador = GravadorReplay(str(base), estado, intervalo)
+    for id_jogador, evento in registro:
+        assert estado.aplicar_evento(id_jogador, evento)
+        gravador.gravar(id_jogador, evento, estado)
+    gravador.fechar()
+    return estado
+
+@pytest.mark.parametrize('evento', [
+    {'tipo': 'JOGAR', 'indice': 3},
+    {'tipo': 'JOGAR', 'indice': 40, 'cor_escolhida': 'AZUL'},
+    {'tipo': 'COMPRAR', 'jogar': True},
+    {'tipo': 'COMPRAR', 'jogar': False},
+    {'tipo': MSG_GRITAR_UNO},
+    {'tipo': MSG_ENTRAR_SALA},
+    {'tipo': MSG_CONFIGURAR_SALA, 'opcoes': {'comprar_ate_jogavel': True, 'passe_automatico': False}},
+])
+def test_codificacao_ida_e_volta(evento):
+    dados = codificar_evento(7, evento)
+    assert len(dados) == REGISTRO.size == 8
+    assert decodificar_evento(dados) == (7, evento)
+
+def test_limite_do_numero_do_jogador():
+    assert decodificar_evento(codificar_evento(0xFFFF, {'tipo': MSG_SAIR_SALA}))[0] == 0xFFFF
+    with pytest.raises(struct.error):
+        codificar_evento(0x10000, {'tipo': MSG_SAIR_SALA})
+
+def test_sala_com_mais_de_256_jogadores(tmp_path):
+    # Cada reentrada ganha um ID novo: com 1 byte, o 257º jogador quebrava a gravação
+    registro = []
+    for porta in range(300):
+        registro += [(('h', porta), {'tipo': MSG_ENTRAR_SALA}), (('h', porta), {'tipo': MSG_SAIR_SALA})]
+    gravar(tmp_path / 'r', 1, registro)
+    leitor = LeitorReplay(str(tmp_path / 'r'))
+    assert len(leitor) == 600
+    assert leitor.jogadores()[leitor.evento(599)[0]] == ('h', 299)
+    leitor.fechar()
+
+def test_leitura_em_qualquer_ponto(tmp_path, jogar_partida):
+    final, registro = jogar_partida(9)
+    gravar(tmp_path / 'r', 9, registro)
+    leitor = LeitorReplay(str(tmp_path / 'r'))
+    assert leitor.semente == 9 and len(leitor) == len(registro)
+    for n in sorted({0, 1, 7, 8, 9, len(registro) // 2, len(registro)}):
+        assert repr(vars(leitor.estado_em(n))) == repr(vars(reproduzir(9, registro[:n])))
+    assert repr(vars(leitor.estado_em(len(leitor)))) == repr(vars(final))
+    # Primeiro estado que chega ao turno (um PULAR ou +2 avança dois turnos num evento só)
+    turnos = [reproduzir(9, registro[:n]).turnos for n in range(len(registro) + 1)]
+    for turno in (0, 5, final.turnos // 2, final.turnos):
+        esperado = next(t for t in turnos if t >= turno)
+        assert leitor.estado_no_turno(turno).turnos == esperado
+    leitor.fechar()
+
+def test_replay_de_outra_versao_e_recusado(tmp_path):
+    gravar(tmp_path / 'r', 1, [(('h', 1), {'tipo': MSG_ENTRAR_SALA})])
+    caminho = tmp_path / 'r.acoes'
+    dados = bytearray(caminho.read_bytes())
+    dados[4:6] = (2).to_bytes(2, 'big') # Versão 2: jogador em 1 byte
+    caminho.write_bytes(bytes(dados))
+    with pytest.raises(ValueError):
+        LeitorReplay(str(tmp_path / 'r'))
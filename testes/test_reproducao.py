@@ -0,0 +1,38 @@
+"""Semente por sala e reprodução da partida pelo registro de eventos (protocolo.reproduzir)."""
+
+from protocolo import EstadoJogo, reproduzir
+
+def resumo(estado):
+    """Atributos do estado comparáveis entre duas instâncias (as cartas pelo repr)."""
+    return {chave: repr(valor) for chave, valor in vars(estado).items()}
+
+def test_reproduzir_chega_ao_mesmo_estado(jogar_partida):
+    for semente in (1, 2, 2**63 + 5):
+        estado, registro = jogar_partida(semente)
+        assert resumo(reproduzir(semente, registro)) == resumo(estado)
+
+def test_reproduzir_no_meio_da_partida(jogar_partida):
+    estados = []
+    estado, registro = jogar_partida(11, a_cada_evento=lambda e, *_: estados.append(resumo(e)))
+    for n in (1, len(registro) // 2, len(registro)):
+        assert resumo(reproduzir(11, registro[:n])) == estados[n - 1]
+
+def test_reproduzir_com_opcoes_de_regra(jogar_partida):
+    opcoes = {'comprar_ate_jogavel': True, 'passe_automatico': True}
+    estado, registro = jogar_partida(5, ('aleatoria', 'gulosa'), opcoes)
+    assert resumo(reproduzir(5, registro)) == resumo(estado)
+
+def test_mesma_semente_mesma_partida(jogar_partida):
+    (a, registro_a), (b, registro_b) = jogar_partida(42), jogar_partida(42)
+    assert registro_a == registro_b
+    assert resumo(a) == resumo(b)
+
+def test_embaralhamento_depende_da_semente():
+    baralhos = []
+    for semente in (1, 2):
+        estado = EstadoJogo(semente)
+        estado.entrar(('h', 1))
+        estado.entrar(('h', 2))
+        estado.iniciar()
+        baralhos.append(repr(estado.baralho))
+    assert baralhos[0] != baralhos[1]